@@ -5,7 +5,8 @@ from sqlalchemy import pool
 
 from alembic import context
 
-from app.database import Base
+from app.config import settings
+from app.database import Base, sync_database_url
 from app.models import Order, OrderItem, ShippingAddress, PaymentInfo, OrderStep
 
 import sys
@@ -22,13 +23,13 @@ config = context.config
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
 if config.config_file_name is not None:
-    fileConfig(config.config_file_name)
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
 
-# add your model's MetaData object here
-# for 'autogenerate' support
-# from myapp import mymodel
-# target_metadata = mymodel.Base.metadata
-target_metadata = None
+# The database URL comes from the application settings unless one is set
+# explicitly (e.g. alembic -x or Config.set_main_option in tests). Async
+# driver URLs are mapped to their blocking counterparts for migrations.
+if not config.get_main_option("sqlalchemy.url"):
+    config.set_main_option("sqlalchemy.url", sync_database_url(settings.DATABASE_URL))
 
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
@@ -0,0 +1,104 @@
+"""Initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-16 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+order_status = sa.Enum("PENDING", "PROCESSING", "COMPLETED", "FAILED", name="orderstatus")
+step_status = sa.Enum("PENDING", "COMPLETED", "FAILED", "COMPENSATED", name="stepstatus")
+
+
+def upgrade() -> None:
+    op.create_table(
+        "orders",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("customer_id", sa.String(), nullable=True),
+        sa.Column("total_amount", sa.Float(), nullable=True),
+        sa.Column("status", order_status, nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_orders_id", "orders", ["id"])
+    op.create_index("ix_orders_customer_id", "orders", ["customer_id"])
+
+    op.create_table(
+        "order_items",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("order_id", sa.String(), nullable=True),
+        sa.Column("product_id", sa.String(), nullable=True),
+        sa.Column("name", sa.String(), nullable=True),
+        sa.Column("price", sa.Float(), nullable=True),
+        sa.Column("quantity", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["order_id"], ["orders.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_order_items_id", "order_items", ["id"])
+    op.create_index("ix_order_items_product_id", "order_items", ["product_id"])
+
+    op.create_table(
+        "shipping_addresses",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("order_id", sa.String(), nullable=True),
+        sa.Column("street", sa.String(), nullable=True),
+        sa.Column("city", sa.String(), nullable=True),
+        sa.Column("state", sa.String(), nullable=True),
+        sa.Column("postal_code", sa.String(), nullable=True),
+        sa.Column("country", sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(["order_id"], ["orders.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("order_id"),
+    )
+    op.create_index("ix_shipping_addresses_id", "shipping_addresses", ["id"])
+
+    op.create_table(
+        "payment_info",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("order_id", sa.String(), nullable=True),
+        sa.Column("payment_method", sa.String(), nullable=True),
+        sa.Column("payment_id", sa.String(), nullable=True),
+        sa.Column("transaction_id", sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(["order_id"], ["orders.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("order_id"),
+    )
+    op.create_index("ix_payment_info_id", "payment_info", ["id"])
+
+    op.create_table(
+        "order_steps",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("order_id", sa.String(), nullable=True),
+        sa.Column("step_name", sa.String(), nullable=True),
+        sa.Column("status", step_status, nullable=True),
+        sa.Column("execution_order", sa.Integer(), nullable=True),
+        sa.Column("reference_id", sa.String(), nullable=True),
+        sa.Column("error_message", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["order_id"], ["orders.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_order_steps_id", "order_steps", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_table("order_steps")
+    op.drop_table("payment_info")
+    op.drop_table("shipping_addresses")
+    op.drop_table("order_items")
+    op.drop_table("orders")
+    order_status.drop(op.get_bind(), checkfirst=True)
+    step_status.drop(op.get_bind(), checkfirst=True)
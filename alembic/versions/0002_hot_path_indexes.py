@@ -0,0 +1,67 @@
+"""Hot-path indexes for order detail, customer history and stale saga scans
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Indexes on primary keys duplicate the primary key index itself
+REDUNDANT_PRIMARY_KEY_INDEXES = {
+    "ix_orders_id": "orders",
+    "ix_order_items_id": "order_items",
+    "ix_shipping_addresses_id": "shipping_addresses",
+    "ix_payment_info_id": "payment_info",
+    "ix_order_steps_id": "order_steps",
+}
+
+
+def upgrade() -> None:
+    for index_name, table_name in REDUNDANT_PRIMARY_KEY_INDEXES.items():
+        op.drop_index(index_name, table_name=table_name)
+
+    # Order detail: children of one order
+    op.create_index("ix_order_items_order_id", "order_items", ["order_id"])
+    op.create_index(
+        "ix_order_steps_order_id_execution_order",
+        "order_steps",
+        ["order_id", "execution_order"],
+    )
+
+    # Customer history, newest first, paged by (created_at, id); replaces
+    # the single-column customer_id index
+    op.drop_index("ix_orders_customer_id", table_name="orders")
+    op.create_index(
+        "ix_orders_customer_id_created_at",
+        "orders",
+        ["customer_id", "created_at", "id"],
+    )
+
+    # Stale saga scan: PROCESSING orders by last heartbeat
+    op.create_index(
+        "ix_orders_status_updated_at",
+        "orders",
+        ["status", "updated_at", "id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_orders_status_updated_at", table_name="orders")
+    op.drop_index("ix_orders_customer_id_created_at", table_name="orders")
+    op.create_index("ix_orders_customer_id", "orders", ["customer_id"])
+    op.drop_index("ix_order_steps_order_id_execution_order", table_name="order_steps")
+    op.drop_index("ix_order_items_order_id", table_name="order_items")
+
+    for index_name, table_name in REDUNDANT_PRIMARY_KEY_INDEXES.items():
+        op.create_index(index_name, table_name, ["id"])
@@ -0,0 +1,190 @@
+"""Store primary and foreign keys as 16-byte binary UUIDs
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-16 11:00:00.000000
+
+On PostgreSQL the key columns are converted in place to the native ``UUID``
+type. Other backends (SQLite) cannot change a column's type, so each table
+is renamed aside, recreated with 16-byte binary key columns and its rows
+copied over in chunks, converting the 36-character id strings. Existing ids
+keep their value, only their storage changes; new rows get time-ordered
+UUIDv7 keys from the application.
+"""
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COPY_CHUNK_SIZE = 1000
+
+
+def _enum(name: str, *values: str) -> sa.Enum:
+    # The enum types already exist on PostgreSQL; don't create them again
+    return sa.Enum(*values, name=name).with_variant(
+        postgresql.ENUM(*values, name=name, create_type=False), "postgresql"
+    )
+
+
+order_status = _enum("orderstatus", "PENDING", "PROCESSING", "COMPLETED", "FAILED")
+step_status = _enum("stepstatus", "PENDING", "COMPLETED", "FAILED", "COMPENSATED")
+
+
+class _BinaryUUID(sa.TypeDecorator):
+    """``app.ids.GUID`` as of this revision, frozen: string ids in, 16 bytes stored."""
+
+    impl = sa.LargeBinary(16)
+    cache_ok = True
+
+    def process_bind_param(self, value: Any, dialect) -> Optional[bytes]:
+        if value is None:
+            return None
+        return uuid.UUID(bytes=value).bytes if isinstance(value, bytes) else uuid.UUID(value).bytes
+
+    def process_result_value(self, value: Any, dialect) -> Optional[str]:
+        return None if value is None else str(uuid.UUID(bytes=bytes(value)))
+
+
+def _columns(id_type) -> Dict[str, List[sa.Column]]:
+    """Column definitions of every table, parents first, with ``id_type`` keys."""
+    def key():
+        return sa.Column("id", id_type, primary_key=True)
+
+    def parent():
+        return sa.Column("order_id", id_type, sa.ForeignKey("orders.id"), nullable=True)
+
+    return {
+        "orders": [
+            key(),
+            sa.Column("customer_id", sa.String(), nullable=True),
+            sa.Column("total_amount", sa.Float(), nullable=True),
+            sa.Column("status", order_status, nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+        ],
+        "order_items": [
+            key(),
+            parent(),
+            sa.Column("product_id", sa.String(), nullable=True),
+            sa.Column("name", sa.String(), nullable=True),
+            sa.Column("price", sa.Float(), nullable=True),
+            sa.Column("quantity", sa.Integer(), nullable=True),
+        ],
+        "shipping_addresses": [
+            key(),
+            parent(),
+            sa.Column("street", sa.String(), nullable=True),
+            sa.Column("city", sa.String(), nullable=True),
+            sa.Column("state", sa.String(), nullable=True),
+            sa.Column("postal_code", sa.String(), nullable=True),
+            sa.Column("country", sa.String(), nullable=True),
+            sa.UniqueConstraint("order_id"),
+        ],
+        "payment_info": [
+            key(),
+            parent(),
+            sa.Column("payment_method", sa.String(), nullable=True),
+            sa.Column("payment_id", sa.String(), nullable=True),
+            sa.Column("transaction_id", sa.String(), nullable=True),
+            sa.UniqueConstraint("order_id"),
+        ],
+        "order_steps": [
+            key(),
+            parent(),
+            sa.Column("step_name", sa.String(), nullable=True),
+            sa.Column("status", step_status, nullable=True),
+            sa.Column("execution_order", sa.Integer(), nullable=True),
+            sa.Column("reference_id", sa.String(), nullable=True),
+            sa.Column("error_message", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+        ],
+    }
+
+
+# Indexes as of revision 0002: name -> (table, columns)
+INDEXES: Dict[str, Tuple[str, List[str]]] = {
+    "ix_orders_customer_id_created_at": ("orders", ["customer_id", "created_at", "id"]),
+    "ix_orders_status_updated_at": ("orders", ["status", "updated_at", "id"]),
+    "ix_order_items_order_id": ("order_items", ["order_id"]),
+    "ix_order_items_product_id": ("order_items", ["product_id"]),
+    "ix_order_steps_order_id_execution_order": ("order_steps", ["order_id", "execution_order"]),
+}
+
+
+def _rebuild(old_id_type, new_id_type) -> None:
+    """Recreate every table with ``new_id_type`` keys, copying the rows."""
+    old_columns = _columns(old_id_type)
+    new_columns = _columns(new_id_type)
+    bind = op.get_bind()
+
+    for index_name, (table_name, _) in INDEXES.items():
+        op.drop_index(index_name, table_name=table_name)
+    for table_name in old_columns:
+        op.rename_table(table_name, f"{table_name}_legacy")
+
+    for table_name, columns in new_columns.items():
+        op.create_table(table_name, *columns)
+    for index_name, (table_name, index_columns) in INDEXES.items():
+        op.create_index(index_name, table_name, index_columns)
+
+    for table_name in old_columns:
+        source = sa.table(
+            f"{table_name}_legacy",
+            *(sa.column(c.name, c.type) for c in old_columns[table_name] if isinstance(c, sa.Column)),
+        )
+        target = sa.table(
+            table_name,
+            *(sa.column(c.name, c.type) for c in new_columns[table_name] if isinstance(c, sa.Column)),
+        )
+        result = bind.execute(sa.select(source).execution_options(yield_per=COPY_CHUNK_SIZE))
+        for rows in result.partitions():
+            bind.execute(sa.insert(target), [row._asdict() for row in rows])
+
+    for table_name in reversed(list(old_columns)):
+        op.drop_table(f"{table_name}_legacy")
+
+
+def _convert_in_place(id_type, cast: str) -> None:
+    """Change every key column to ``id_type`` with ``ALTER COLUMN ... USING``.
+
+    The foreign keys are dropped while both of their sides are converted and
+    then recreated under PostgreSQL's default names; indexes and the other
+    constraints are rebuilt by ``ALTER COLUMN`` itself.
+    """
+    children = [table_name for table_name in _columns(id_type) if table_name != "orders"]
+    for table_name in children:
+        op.drop_constraint(f"{table_name}_order_id_fkey", table_name, type_="foreignkey")
+    op.alter_column("orders", "id", type_=id_type, postgresql_using=f"id::{cast}")
+    for table_name in children:
+        op.alter_column(table_name, "id", type_=id_type, postgresql_using=f"id::{cast}")
+        op.alter_column(
+            table_name, "order_id", type_=id_type, postgresql_using=f"order_id::{cast}"
+        )
+    for table_name in children:
+        op.create_foreign_key(
+            f"{table_name}_order_id_fkey", table_name, "orders", ["order_id"], ["id"]
+        )
+
+
+def upgrade() -> None:
+    if op.get_context().dialect.name == "postgresql":
+        _convert_in_place(postgresql.UUID(), "uuid")
+    else:
+        _rebuild(sa.String(), _BinaryUUID())
+
+
+def downgrade() -> None:
+    if op.get_context().dialect.name == "postgresql":
+        _convert_in_place(sa.String(), "text")
+    else:
+        _rebuild(_BinaryUUID(), sa.String())
@@ -0,0 +1,28 @@
+"""Indexes for listing and exporting orders by (created_at, id)
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_orders_created_at", "orders", ["created_at", "id"])
+    op.create_index("ix_orders_status_created_at", "orders", ["status", "created_at", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_orders_status_created_at", table_name="orders")
+    op.drop_index("ix_orders_created_at", table_name="orders")
@@ -0,0 +1,123 @@
+import abc
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from app.config import settings
+from app.models import OrderStatus
+
+# Orders in these states never change again and are safe to cache on every node
+CACHEABLE_STATUSES = (OrderStatus.COMPLETED, OrderStatus.FAILED)
+
+
+class OrderCacheBackend(abc.ABC):
+    """Storage for serialized order responses.
+
+    Implement this interface to keep the cache in an external store shared by
+    several nodes.
+    """
+
+    @abc.abstractmethod
+    async def get(self, order_id: str) -> Optional[bytes]:
+        """Return the cached response for ``order_id``, if any."""
+        pass
+
+    @abc.abstractmethod
+    async def set(self, order_id: str, value: bytes) -> None:
+        """Store the response for ``order_id``."""
+        pass
+
+    @abc.abstractmethod
+    async def delete(self, order_id: str) -> None:
+        """Remove the response for ``order_id``."""
+        pass
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+
+class LRUCacheBackend(OrderCacheBackend):
+    """In-process LRU cache with a size bound and a time-to-live."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self.expirations = 0
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+
+    async def get(self, order_id: str) -> Optional[bytes]:
+        entry = self._entries.get(order_id)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[order_id]
+            self.expirations += 1
+            return None
+
+        self._entries.move_to_end(order_id)
+        return value
+
+    async def set(self, order_id: str, value: bytes) -> None:
+        if self.max_entries <= 0:
+            return
+
+        self._entries[order_id] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(order_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, order_id: str) -> None:
+        self._entries.pop(order_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class OrderCache:
+    """Read-through cache of serialized ``OrderResponse`` JSON.
+
+    Only terminal orders are stored, so a cached entry never goes stale;
+    the saga's unit of work still invalidates an order whenever it writes
+    order or step state. Swap ``backend`` to use an external store.
+    """
+
+    def __init__(self, backend: OrderCacheBackend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, order_id: str) -> Optional[bytes]:
+        value = await self.backend.get(order_id)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, order_id: str, status: OrderStatus, value: bytes) -> None:
+        """Store ``value`` if an order in ``status`` can no longer change."""
+        if status in CACHEABLE_STATUSES:
+            await self.backend.set(order_id, value)
+
+    async def invalidate(self, order_id: str) -> None:
+        await self.backend.delete(order_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, **self.backend.stats()}
+
+
+order_cache = OrderCache(
+    LRUCacheBackend(
+        max_entries=settings.ORDER_CACHE_MAX_ENTRIES,
+        ttl=settings.ORDER_CACHE_TTL,
+    )
+)
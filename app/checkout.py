@@ -0,0 +1,143 @@
+from datetime import datetime
+from typing import Any, Dict, List
+
+from sqlalchemy import insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.ids import new_id
+from app.models import (Order, OrderCreate, OrderItem, OrderStatus, PaymentInfo,
+                        ShippingAddress)
+from app.saga import Saga
+from app.services.resilience import AdaptiveLimiter, AIMDLimit
+from app.steps.inventory import InventoryStep
+from app.steps.payment import PaymentStep
+from app.steps.shipping import ShippingStep
+
+# Steps of the checkout saga
+CHECKOUT_STEPS = [PaymentStep, InventoryStep, ShippingStep]
+
+ADDRESS_FIELDS = ("street", "city", "state", "postal_code", "country")
+
+# Admission control for checkout sagas, shared by the synchronous endpoint,
+# batches and the worker pool. Only synchronous checkouts are shed; the
+# others already passed a bounded queue and wait for a slot.
+checkout_limiter = AdaptiveLimiter(
+    "checkout",
+    AIMDLimit(
+        initial=settings.SAGA_CONCURRENCY_LIMIT,
+        min_limit=settings.ADMISSION_MIN_LIMIT,
+        max_limit=settings.SAGA_CONCURRENCY_MAX,
+        latency_target=settings.SAGA_LATENCY_TARGET,
+        backoff=settings.ADMISSION_BACKOFF,
+    ),
+    queue_size=settings.SAGA_QUEUE_SIZE,
+    queue_timeout=settings.SAGA_QUEUE_TIMEOUT,
+    enabled=settings.ADMISSION_CONTROL_ENABLED,
+)
+
+
+def new_order(request: OrderCreate, status: OrderStatus = OrderStatus.PENDING) -> Order:
+    """Build an order, with its items, address and payment info, from a request.
+
+    Orders whose saga is run right away by the caller are created as
+    PROCESSING, so the worker pool of another process never claims them.
+    """
+    return Order(
+        customer_id=request.customer_id,
+        total_amount=sum(item.price * item.quantity for item in request.items),
+        status=status,
+        items=[
+            OrderItem(
+                product_id=item.product_id,
+                name=item.name,
+                price=item.price,
+                quantity=item.quantity,
+            )
+            for item in request.items
+        ],
+        shipping_address=ShippingAddress(**request.shipping_address.dict()),
+        payment_info=PaymentInfo(payment_method=request.payment_method),
+    )
+
+
+def build_context(order: Order) -> Dict[str, Any]:
+    """Build the saga context from an order with its relationships loaded."""
+    return {
+        "order_id": order.id,
+        "customer_id": order.customer_id,
+        "total_amount": order.total_amount,
+        "payment_method": order.payment_info.payment_method,
+        "shipping_address": {
+            field: getattr(order.shipping_address, field) for field in ADDRESS_FIELDS
+        },
+        "items": [
+            {
+                "product_id": item.product_id,
+                "name": item.name,
+                "price": item.price,
+                "quantity": item.quantity,
+            }
+            for item in order.items
+        ],
+    }
+
+
+def _row(record) -> Dict[str, Any]:
+    return {column.key: getattr(record, column.key) for column in record.__table__.columns}
+
+
+async def insert_orders(
+    db: AsyncSession, requests: List[OrderCreate], status: OrderStatus = OrderStatus.PENDING
+) -> List[Order]:
+    """Insert many orders with one multi-row INSERT per table.
+
+    Returns the orders as transient objects with ids and relationships set,
+    ready to be passed to ``run_checkout``.
+    """
+    now = datetime.utcnow()
+    orders = [new_order(request, status) for request in requests]
+    rows: Dict[type, List[Dict[str, Any]]] = {
+        Order: [], OrderItem: [], ShippingAddress: [], PaymentInfo: []
+    }
+
+    for order in orders:
+        order.id = new_id()
+        order.created_at = order.updated_at = now
+        rows[Order].append(_row(order))
+        for record in (*order.items, order.shipping_address, order.payment_info):
+            record.id = new_id()
+            record.order_id = order.id
+            rows[type(record)].append(_row(record))
+
+    for model, model_rows in rows.items():
+        if model_rows:
+            await db.execute(insert(model), model_rows)
+    await db.commit()
+    return orders
+
+
+async def claim_order(db: AsyncSession, order_id: str) -> bool:
+    """Move a PENDING order to PROCESSING; False if it was no longer pending.
+
+    Callers claim an order only once they hold a checkout slot, right before
+    running its saga: a PROCESSING order that is not updated is taken for an
+    orphaned saga by ``app.recovery``, so orders wait for a slot as PENDING.
+    The conditional UPDATE makes the claim atomic, so an order queued by
+    several processes (after a restart, or with several app workers) is run
+    by exactly one of them.
+    """
+    result = await db.execute(
+        update(Order)
+        .where(Order.id == order_id, Order.status == OrderStatus.PENDING)
+        .values(status=OrderStatus.PROCESSING, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+
+async def run_checkout(db: AsyncSession, order: Order) -> Dict[str, Any]:
+    """Run the checkout saga for a persisted order."""
+    saga = Saga(db, order, CHECKOUT_STEPS)
+    return await saga.execute(build_context(order))
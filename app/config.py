@@ -8,6 +8,139 @@ class Settings(BaseSettings):
     INVENTORY_SERVICE_URL: str = os.getenv("INVENTORY_SERVICE_URL", "http://localhost:8002")
     SHIPPING_SERVICE_URL: str = os.getenv("SHIPPING_SERVICE_URL", "http://localhost:8003")
 
+    # Downstream HTTP client pools (one long-lived client per service)
+    HTTP_MAX_CONNECTIONS: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    HTTP_KEEPALIVE_EXPIRY: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30.0"))
+    HTTP_CONNECT_TIMEOUT: float = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5.0"))
+    HTTP2_ENABLED: bool = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+    PAYMENT_SERVICE_TIMEOUT: float = float(os.getenv("PAYMENT_SERVICE_TIMEOUT", "10.0"))
+    INVENTORY_SERVICE_TIMEOUT: float = float(os.getenv("INVENTORY_SERVICE_TIMEOUT", "10.0"))
+    SHIPPING_SERVICE_TIMEOUT: float = float(os.getenv("SHIPPING_SERVICE_TIMEOUT", "10.0"))
+
+    # Per-service circuit breakers
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("CIRCUIT_BREAKER_FAILURE_THRESHOLD", "5"))
+    CIRCUIT_BREAKER_RECOVERY_TIMEOUT: float = float(os.getenv("CIRCUIT_BREAKER_RECOVERY_TIMEOUT", "30.0"))
+
+    # Timeouts adapted to observed latency; the service timeouts above are the ceiling
+    ADAPTIVE_TIMEOUT_ENABLED: bool = os.getenv("ADAPTIVE_TIMEOUT_ENABLED", "true").lower() == "true"
+    ADAPTIVE_TIMEOUT_PERCENTILE: float = float(os.getenv("ADAPTIVE_TIMEOUT_PERCENTILE", "99"))
+    ADAPTIVE_TIMEOUT_MULTIPLIER: float = float(os.getenv("ADAPTIVE_TIMEOUT_MULTIPLIER", "3.0"))
+    ADAPTIVE_TIMEOUT_MIN: float = float(os.getenv("ADAPTIVE_TIMEOUT_MIN", "1.0"))
+    LATENCY_WINDOW: int = int(os.getenv("LATENCY_WINDOW", "200"))
+    LATENCY_MIN_SAMPLES: int = int(os.getenv("LATENCY_MIN_SAMPLES", "20"))
+
+    # Retries of service calls that are safe to repeat (GETs, calls with idempotency keys)
+    SERVICE_RETRIES: int = int(os.getenv("SERVICE_RETRIES", "2"))
+
+    # Hedged retries of idempotent GETs slower than this latency percentile
+    HEDGED_READS_ENABLED: bool = os.getenv("HEDGED_READS_ENABLED", "true").lower() == "true"
+    HEDGE_PERCENTILE: float = float(os.getenv("HEDGE_PERCENTILE", "95"))
+
+    # Admission control: AIMD concurrency limits on in-flight sagas and, as a
+    # bulkhead, on the calls to each downstream service. Callers over a limit
+    # wait in a bounded queue; the rest are shed (503 with Retry-After)
+    ADMISSION_CONTROL_ENABLED: bool = os.getenv("ADMISSION_CONTROL_ENABLED", "true").lower() == "true"
+    ADMISSION_MIN_LIMIT: int = int(os.getenv("ADMISSION_MIN_LIMIT", "2"))
+    ADMISSION_BACKOFF: float = float(os.getenv("ADMISSION_BACKOFF", "0.9"))
+    SAGA_CONCURRENCY_LIMIT: int = int(os.getenv("SAGA_CONCURRENCY_LIMIT", "50"))
+    SAGA_CONCURRENCY_MAX: int = int(os.getenv("SAGA_CONCURRENCY_MAX", "500"))
+    SAGA_LATENCY_TARGET: float = float(os.getenv("SAGA_LATENCY_TARGET", "2.0"))
+    SAGA_QUEUE_SIZE: int = int(os.getenv("SAGA_QUEUE_SIZE", "100"))
+    SAGA_QUEUE_TIMEOUT: float = float(os.getenv("SAGA_QUEUE_TIMEOUT", "2.0"))
+    BULKHEAD_LIMIT: int = int(os.getenv("BULKHEAD_LIMIT", "20"))
+    BULKHEAD_MAX: int = int(os.getenv("BULKHEAD_MAX", "200"))
+    BULKHEAD_LATENCY_TARGET: float = float(os.getenv("BULKHEAD_LATENCY_TARGET", "0.5"))
+    BULKHEAD_QUEUE_SIZE: int = int(os.getenv("BULKHEAD_QUEUE_SIZE", "100"))
+    BULKHEAD_QUEUE_TIMEOUT: float = float(os.getenv("BULKHEAD_QUEUE_TIMEOUT", "1.0"))
+
+    # Coalescing of inventory reservations into batch requests (0 disables)
+    INVENTORY_BATCH_WINDOW_MS: float = float(os.getenv("INVENTORY_BATCH_WINDOW_MS", "0"))
+    INVENTORY_BATCH_MAX_SIZE: int = int(os.getenv("INVENTORY_BATCH_MAX_SIZE", "100"))
+
+    # Asynchronous checkout (Prefer: respond-async)
+    CHECKOUT_WORKERS: int = int(os.getenv("CHECKOUT_WORKERS", "4"))
+    CHECKOUT_QUEUE_SIZE: int = int(os.getenv("CHECKOUT_QUEUE_SIZE", "1000"))
+    CHECKOUT_SHUTDOWN_TIMEOUT: float = float(os.getenv("CHECKOUT_SHUTDOWN_TIMEOUT", "30.0"))
+
+    # Batch order intake (POST /orders/batch)
+    ORDER_BATCH_MAX_SIZE: int = int(os.getenv("ORDER_BATCH_MAX_SIZE", "5000"))
+    ORDER_BATCH_CONCURRENCY: int = int(os.getenv("ORDER_BATCH_CONCURRENCY", "20"))
+
+    # Order listing (GET /orders) and NDJSON export (GET /orders/export)
+    ORDER_LIST_DEFAULT_LIMIT: int = int(os.getenv("ORDER_LIST_DEFAULT_LIMIT", "50"))
+    ORDER_LIST_MAX_LIMIT: int = int(os.getenv("ORDER_LIST_MAX_LIMIT", "500"))
+    ORDER_EXPORT_BATCH_SIZE: int = int(os.getenv("ORDER_EXPORT_BATCH_SIZE", "1000"))
+
+    # Order status notifications over SSE and WebSocket: undelivered events
+    # kept per subscriber, and seconds between keep-alives on an idle stream
+    EVENT_QUEUE_SIZE: int = int(os.getenv("EVENT_QUEUE_SIZE", "100"))
+    EVENT_KEEPALIVE_INTERVAL: float = float(os.getenv("EVENT_KEEPALIVE_INTERVAL", "15.0"))
+
+    # Cache of serialized responses for completed and failed orders
+    ORDER_CACHE_MAX_ENTRIES: int = int(os.getenv("ORDER_CACHE_MAX_ENTRIES", "10000"))
+    ORDER_CACHE_TTL: float = float(os.getenv("ORDER_CACHE_TTL", "300.0"))
+
+    # Recovery of sagas interrupted by a crash
+    SAGA_RECOVERY_ENABLED: bool = os.getenv("SAGA_RECOVERY_ENABLED", "true").lower() == "true"
+    SAGA_RECOVERY_INTERVAL: float = float(os.getenv("SAGA_RECOVERY_INTERVAL", "60.0"))
+    SAGA_RECOVERY_STALE_AFTER: float = float(os.getenv("SAGA_RECOVERY_STALE_AFTER", "120.0"))
+    SAGA_RECOVERY_BATCH_SIZE: int = int(os.getenv("SAGA_RECOVERY_BATCH_SIZE", "50"))
+
+    # Idempotency-Key support on POST /orders; a key claimed by a request that
+    # has not completed within IDEMPOTENCY_LOCK_TIMEOUT seconds can be taken over
+    IDEMPOTENCY_KEY_TTL: float = float(os.getenv("IDEMPOTENCY_KEY_TTL", "86400.0"))
+    IDEMPOTENCY_LOCK_TIMEOUT: float = float(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", "60.0"))
+    IDEMPOTENCY_PURGE_INTERVAL: float = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", "300.0"))
+
+    # Read replicas for read-only endpoints (comma-separated URLs). Replicas
+    # lagging more than REPLICA_MAX_STALENESS seconds behind are not read from,
+    # and a caller's reads stay on the primary for as long after a write; the
+    # lag is measured every REPLICA_LAG_CHECK_INTERVAL seconds
+    DATABASE_REPLICA_URLS: str = os.getenv("DATABASE_REPLICA_URLS", "")
+    REPLICA_MAX_STALENESS: float = float(os.getenv("REPLICA_MAX_STALENESS", "5.0"))
+    REPLICA_LAG_CHECK_INTERVAL: float = float(os.getenv("REPLICA_LAG_CHECK_INTERVAL", "1.0"))
+    READ_YOUR_WRITES_COOKIE: str = os.getenv("READ_YOUR_WRITES_COOKIE", "last_write")
+
+    # SQLite connection profile, applied to every new connection
+    SQLITE_JOURNAL_MODE: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    SQLITE_CACHE_SIZE: int = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+    # Group commit: saga writes arriving within the window share one transaction
+    GROUP_COMMIT_ENABLED: bool = os.getenv("GROUP_COMMIT_ENABLED", "false").lower() == "true"
+    GROUP_COMMIT_WINDOW_MS: float = float(os.getenv("GROUP_COMMIT_WINDOW_MS", "2.0"))
+    GROUP_COMMIT_MAX_BATCH: int = int(os.getenv("GROUP_COMMIT_MAX_BATCH", "64"))
+
+    # Startup: DB_CREATE_ALL creates missing tables (development and tests; use
+    # Alembic otherwise); the warm-up pre-opens DB and service connections
+    DB_CREATE_ALL: bool = os.getenv("DB_CREATE_ALL", "false").lower() == "true"
+    STARTUP_WARMUP: bool = os.getenv("STARTUP_WARMUP", "true").lower() == "true"
+    DB_WARMUP_CONNECTIONS: int = int(os.getenv("DB_WARMUP_CONNECTIONS", "5"))
+
+    # Logging: records are formatted and written by a background thread when
+    # LOG_ASYNC is on; sampling and rate limits (records per second) are
+    # "logger=value" lists and only apply below WARNING
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "text")
+    LOG_ASYNC: bool = os.getenv("LOG_ASYNC", "true").lower() == "true"
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    LOG_SAMPLING: str = os.getenv("LOG_SAMPLING", "")
+    LOG_RATE_LIMITS: str = os.getenv("LOG_RATE_LIMITS", "")
+
+    # Tracing: head-sampled spans written as NDJSON in batches
+    TRACING_ENABLED: bool = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+    TRACE_SAMPLE_RATE: float = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+    TRACE_EXPORT_PATH: str = os.getenv("TRACE_EXPORT_PATH", "traces.ndjson")
+    TRACE_BATCH_SIZE: int = int(os.getenv("TRACE_BATCH_SIZE", "512"))
+    TRACE_FLUSH_INTERVAL: float = float(os.getenv("TRACE_FLUSH_INTERVAL", "5.0"))
+    TRACE_QUEUE_SIZE: int = int(os.getenv("TRACE_QUEUE_SIZE", "10000"))
+
+    # Primary key generation: "uuid7" (time-ordered) or "uuid4" (random)
+    ID_STRATEGY: str = os.getenv("ID_STRATEGY", "uuid7")
+
     class Config:
         env_file = ".env"
 
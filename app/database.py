@@ -1,20 +1,98 @@
-from sqlalchemy import create_engine
+import time
+from typing import Any, Dict
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 
 from app.config import settings
+from app.metrics import commit_timer
+
+# Async drivers used when DATABASE_URL names a backend without a driver
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+
+def async_database_url(url: str) -> str:
+    """Return ``url`` rewritten to use an asyncio-capable driver."""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.drivername)
+    if driver:
+        parsed = parsed.set(drivername=driver)
+    return parsed.render_as_string(hide_password=False)
+
+
+def sync_database_url(url: str) -> str:
+    """Return ``url`` rewritten to use the backend's default blocking driver."""
+    parsed = make_url(url)
+    if parsed.drivername in ASYNC_DRIVERS.values():
+        parsed = parsed.set(drivername=parsed.get_backend_name())
+    return parsed.render_as_string(hide_password=False)
+
+
+def sqlite_pragmas() -> Dict[str, Any]:
+    """Pragmas of the SQLite connection profile, in the order they are applied."""
+    return {
+        "journal_mode": settings.SQLITE_JOURNAL_MODE,
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        "mmap_size": settings.SQLITE_MMAP_SIZE,
+        "cache_size": settings.SQLITE_CACHE_SIZE,
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+    }
+
+
+def configure_sqlite(engine: AsyncEngine) -> None:
+    """Apply the SQLite pragmas to every connection ``engine`` opens.
 
-engine = create_engine(
-    settings.DATABASE_URL, connect_args={"check_same_thread": False}
+    WAL lets readers run alongside the writer, and with
+    ``synchronous=NORMAL`` a commit no longer syncs the disk; only WAL
+    checkpoints do. A recent commit can be lost on power failure, but the
+    database stays consistent. ``busy_timeout`` makes a writer wait for the
+    lock instead of failing with "database is locked". Does nothing for
+    other backends.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in sqlite_pragmas().items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+engine = create_async_engine(async_database_url(settings.DATABASE_URL))
+configure_sqlite(engine)
+SessionLocal = sessionmaker(
+    bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
 )
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+@event.listens_for(Session, "before_commit")
+def _start_commit_timer(session):
+    session.info["commit_started"] = time.perf_counter()
+
+
+@event.listens_for(Session, "after_commit")
+def _stop_commit_timer(session):
+    started = session.info.pop("commit_started", None)
+    if started is not None:
+        commit_timer.observe(time.perf_counter() - started)
+
+
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+def get_session_factory():
+    """Session factory for work that needs several concurrent sessions."""
+    return SessionLocal
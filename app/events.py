@@ -0,0 +1,165 @@
+"""Order status notifications, pushed to clients instead of polled.
+
+Sagas publish every order status and step status change once it has been
+committed (see ``SagaUnitOfWork``). Events go through an ``EventBackend``
+to the subscribers of the order's channel; the SSE and WebSocket endpoints
+subscribe before they load the order, send it as a snapshot and then
+follow the events until the order is final.
+
+``InMemoryEventBackend`` only reaches subscribers in the same process. With
+several nodes, implement ``EventBackend`` on a broker (Redis pub/sub, NATS,
+PostgreSQL LISTEN/NOTIFY) so that events reach every node.
+"""
+import abc
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+from app.config import settings
+from app.models import OrderStatus
+
+logger = logging.getLogger(__name__)
+
+FINAL_STATUSES = frozenset({OrderStatus.COMPLETED.value, OrderStatus.FAILED.value})
+
+
+class EventBackend(abc.ABC):
+    """Fan-out of serialized events to the subscribers of a channel."""
+
+    @abc.abstractmethod
+    async def publish(self, channel: str, message: bytes) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def subscribe(self, channel: str, queue: "asyncio.Queue[bytes]") -> None:
+        """Deliver every message published on ``channel`` into ``queue``."""
+
+    @abc.abstractmethod
+    async def unsubscribe(self, channel: str, queue: "asyncio.Queue[bytes]") -> None:
+        ...
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+
+class InMemoryEventBackend(EventBackend):
+    """Fan-out to the subscribers in this process.
+
+    A subscriber that does not keep up loses its oldest undelivered events
+    rather than blocking the publisher.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set["asyncio.Queue[bytes]"]] = {}
+        self.dropped = 0
+
+    async def publish(self, channel: str, message: bytes) -> None:
+        for queue in self._subscribers.get(channel, ()):
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(message)
+
+    async def subscribe(self, channel: str, queue: "asyncio.Queue[bytes]") -> None:
+        self._subscribers.setdefault(channel, set()).add(queue)
+
+    async def unsubscribe(self, channel: str, queue: "asyncio.Queue[bytes]") -> None:
+        queues = self._subscribers.get(channel)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[channel]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "channels": len(self._subscribers),
+            "subscribers": sum(map(len, self._subscribers.values())),
+            "dropped": self.dropped,
+        }
+
+
+class OrderEvents:
+    """Publishes order events and hands out subscriptions to them."""
+
+    def __init__(self, backend: EventBackend, queue_size: int):
+        self.backend = backend
+        self.queue_size = queue_size
+        self.published = 0
+
+    @staticmethod
+    def channel(order_id: str) -> str:
+        return f"order:{order_id}"
+
+    async def publish(self, event: Dict[str, Any]) -> None:
+        """Publish ``event``; a failing backend is only logged."""
+        try:
+            await self.backend.publish(
+                self.channel(event["order_id"]), json.dumps(event, default=str).encode()
+            )
+            self.published += 1
+        except Exception as e:
+            logger.warning("Could not publish event for order %s: %r", event["order_id"], e)
+
+    @asynccontextmanager
+    async def subscribe(self, order_id: str) -> AsyncIterator["asyncio.Queue[bytes]"]:
+        queue: "asyncio.Queue[bytes]" = asyncio.Queue(maxsize=self.queue_size)
+        await self.backend.subscribe(self.channel(order_id), queue)
+        try:
+            yield queue
+        finally:
+            await self.backend.unsubscribe(self.channel(order_id), queue)
+
+    async def follow(
+        self, queue: "asyncio.Queue[bytes]", keepalive: float
+    ) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """Events from a subscription until the order is final.
+
+        Yields None whenever no event arrived for ``keepalive`` seconds, so
+        the caller can keep the connection alive.
+        """
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), keepalive)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            event = json.loads(message)
+            yield event
+            if is_final(event):
+                return
+
+    def stats(self) -> Dict[str, int]:
+        return {"published": self.published, **self.backend.stats()}
+
+
+def order_status_event(order_id: str, status: OrderStatus, at: datetime) -> Dict[str, Any]:
+    return {"type": "order_status", "order_id": order_id, "status": status.value, "at": at.isoformat()}
+
+
+def step_status_event(
+    order_id: str, step_name: str, values: Dict[str, Any]
+) -> Dict[str, Any]:
+    event = {
+        "type": "step_status",
+        "order_id": order_id,
+        "step": step_name,
+        "status": values["status"].value,
+        "at": values["updated_at"].isoformat(),
+    }
+    for field in ("reference_id", "error_message"):
+        if field in values:
+            event[field] = values[field]
+    return event
+
+
+def is_final(event: Dict[str, Any]) -> bool:
+    """Whether no event can follow ``event`` for the same order."""
+    if event["type"] == "snapshot":
+        return event["order"]["status"] in FINAL_STATUSES
+    return event["type"] == "order_status" and event["status"] in FINAL_STATUSES
+
+
+order_events = OrderEvents(InMemoryEventBackend(), queue_size=settings.EVENT_QUEUE_SIZE)
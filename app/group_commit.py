@@ -0,0 +1,176 @@
+import asyncio
+import logging
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type
+
+from sqlalchemy import bindparam, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+Inserts = Dict[Type, List[Dict[str, Any]]]
+Updates = Dict[Tuple[Type, str, Any], Dict[str, Any]]
+
+
+def group_updates(updates: Updates) -> Iterator[Tuple[Any, List[Dict[str, Any]]]]:
+    """Group buffered updates into one executemany per (table, columns)."""
+    groups: Dict[Tuple[Type, str, Tuple[str, ...]], List[Dict[str, Any]]] = {}
+    for (model, key_column, key), values in updates.items():
+        columns = tuple(sorted(values))
+        params = {f"v_{column}": value for column, value in values.items()}
+        params["k"] = key
+        groups.setdefault((model, key_column, columns), []).append(params)
+
+    for (model, key_column, columns), params in groups.items():
+        table = model.__table__
+        statement = (
+            update(table)
+            .where(table.c[key_column] == bindparam("k"))
+            .values({column: bindparam(f"v_{column}") for column in columns})
+        )
+        yield statement, params
+
+
+async def write_changes(db: AsyncSession, inserts: Inserts, updates: Updates) -> None:
+    """Write buffered inserts and updates in one transaction."""
+    try:
+        for model, rows in inserts.items():
+            await db.execute(insert(model), rows)
+
+        for statement, params in group_updates(updates):
+            await db.execute(statement, params)
+
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+
+class GroupCommitWriter:
+    """Single writer that commits the changes of many sagas together.
+
+    On SQLite every commit takes the database write lock and syncs the
+    log, so concurrent sagas committing one by one queue up behind each
+    other. Instead, units of work hand their changes to this writer, which
+    collects what arrives within ``window`` seconds (up to ``max_batch``
+    submissions), writes it with one multi-row INSERT per table and one
+    executemany per kind of update, and commits once. ``write`` returns
+    when the changes are durable, so the guarantees of
+    ``SagaUnitOfWork.flush`` are unchanged.
+
+    If a combined transaction fails, its submissions are retried one by
+    one, so only the submission at fault sees the error.
+    """
+
+    def __init__(self, session_factory, window: float, max_batch: int):
+        self.session_factory = session_factory
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.writes = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run(), name="group-commit-writer")
+        logger.info(
+            "Started group commit writer (window %sms, max batch %s)",
+            self.window * 1000, self.max_batch,
+        )
+
+    async def stop(self) -> None:
+        """Write what is queued, then stop."""
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def write(self, inserts: Inserts, updates: Updates) -> None:
+        """Queue changes for the next group commit and wait until they are committed."""
+        done = asyncio.get_running_loop().create_future()
+        await self._queue.put((inserts, updates, done))
+        await done
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await self._commit(batch)
+            except Exception as e:
+                logger.error("Group commit failed: %s", e)
+                for _, _, done in batch:
+                    if not done.done():
+                        done.set_exception(e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _commit(self, batch) -> None:
+        inserts: Inserts = {}
+        updates: Updates = {}
+        for submitted_inserts, submitted_updates, _ in batch:
+            for model, rows in submitted_inserts.items():
+                inserts.setdefault(model, []).extend(rows)
+            for key, values in submitted_updates.items():
+                updates.setdefault(key, {}).update(values)
+
+        async with self.session_factory() as db:
+            try:
+                await write_changes(db, inserts, updates)
+                results = [None] * len(batch)
+            except Exception as e:
+                if len(batch) == 1:
+                    results = [e]
+                else:
+                    logger.warning(
+                        "Group commit of %s writes failed, retrying one by one: %s", len(batch), e
+                    )
+                    results = []
+                    for submitted_inserts, submitted_updates, _ in batch:
+                        try:
+                            await write_changes(db, submitted_inserts, submitted_updates)
+                            results.append(None)
+                        except Exception as single:
+                            results.append(single)
+
+        self.batches += 1
+        self.writes += len(batch)
+        for (_, _, done), error in zip(batch, results):
+            if done.cancelled():
+                continue
+            if error is None:
+                done.set_result(None)
+            else:
+                done.set_exception(error)
+
+
+group_commit_writer = GroupCommitWriter(
+    SessionLocal,
+    window=settings.GROUP_COMMIT_WINDOW_MS / 1000,
+    max_batch=settings.GROUP_COMMIT_MAX_BATCH,
+)
@@ -0,0 +1,159 @@
+import hashlib
+import logging
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import IdempotencyRecord
+
+logger = logging.getLogger(__name__)
+
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(*parts: str) -> str:
+    """Hash of the request a key is used with, to detect key reuse."""
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """Responses of requests made with an ``Idempotency-Key`` header.
+
+    ``begin`` claims a key before the request is processed; ``complete``
+    stores the response, compressed, for ``ttl`` seconds, and ``release``
+    gives the key up after a failure that is safe to retry. A repeat of a
+    completed request gets the stored response back instead of running
+    again.
+
+    The claim of a request in progress is a lease: ``created_at`` is the
+    time of the claim, and a claim older than ``lock_timeout`` seconds is
+    treated as abandoned by a process that died mid-request, so a retry
+    takes it over instead of getting ``409`` until the key expires.
+    """
+
+    def __init__(self, ttl: float, purge_interval: float, lock_timeout: float):
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self.lock_timeout = lock_timeout
+        self._last_purge = 0.0
+
+    async def begin(self, db: AsyncSession, key: str, fingerprint: str) -> Optional[Response]:
+        """Claim ``key`` for a new request, or return the stored response.
+
+        Raises ``HTTPException`` 409 if a request with the key is still in
+        progress, and 422 if the key was used with a different request.
+        """
+        if len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail="Idempotency-Key is too long")
+        await self._purge_expired(db)
+
+        now = datetime.utcnow()
+        try:
+            await db.execute(
+                insert(IdempotencyRecord).values(
+                    key=key,
+                    fingerprint=fingerprint,
+                    created_at=now,
+                    expires_at=now + timedelta(seconds=self.ttl),
+                )
+            )
+            await db.commit()
+            return None
+        except IntegrityError:
+            await db.rollback()
+
+        record = (
+            await db.execute(select(IdempotencyRecord).where(IdempotencyRecord.key == key))
+        ).scalar_one_or_none()
+        if record is None or record.expires_at <= now:
+            # Released or expired in the meantime
+            await db.execute(
+                delete(IdempotencyRecord).where(
+                    IdempotencyRecord.key == key, IdempotencyRecord.expires_at <= now
+                )
+            )
+            await db.commit()
+            return await self.begin(db, key, fingerprint)
+        if record.fingerprint != fingerprint:
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key was already used with a different request",
+            )
+        if record.status_code is None:
+            if await self._take_over(db, key, now):
+                logger.warning("Took over abandoned claim of Idempotency-Key %s", key)
+                return None
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key is in progress",
+                headers={"Retry-After": "1"},
+            )
+
+        logger.info("Replaying response for Idempotency-Key %s", key)
+        headers = {"Idempotent-Replayed": "true"}
+        if record.location:
+            headers["Location"] = record.location
+        return Response(
+            content=zlib.decompress(record.body),
+            status_code=record.status_code,
+            headers=headers,
+            media_type="application/json",
+        )
+
+    async def _take_over(self, db: AsyncSession, key: str, now: datetime) -> bool:
+        """Renew the claim of ``key`` if its lease ran out; False if it is still held."""
+        result = await db.execute(
+            update(IdempotencyRecord)
+            .where(
+                IdempotencyRecord.key == key,
+                IdempotencyRecord.status_code.is_(None),
+                IdempotencyRecord.created_at <= now - timedelta(seconds=self.lock_timeout),
+            )
+            .values(created_at=now, expires_at=now + timedelta(seconds=self.ttl))
+        )
+        await db.commit()
+        return result.rowcount == 1
+
+    async def complete(
+        self, db: AsyncSession, key: str, status_code: int, body: bytes,
+        location: Optional[str] = None,
+    ) -> None:
+        """Store the response of the request that claimed ``key``."""
+        await db.execute(
+            update(IdempotencyRecord)
+            .where(IdempotencyRecord.key == key)
+            .values(status_code=status_code, location=location, body=zlib.compress(body))
+        )
+        await db.commit()
+
+    async def release(self, db: AsyncSession, key: str) -> None:
+        """Give up ``key`` so the request can be retried."""
+        await db.rollback()
+        await db.execute(delete(IdempotencyRecord).where(IdempotencyRecord.key == key))
+        await db.commit()
+
+    async def _purge_expired(self, db: AsyncSession) -> None:
+        if time.monotonic() - self._last_purge < self.purge_interval:
+            return
+        self._last_purge = time.monotonic()
+        result = await db.execute(
+            delete(IdempotencyRecord).where(IdempotencyRecord.expires_at <= datetime.utcnow())
+        )
+        if result.rowcount:
+            await db.commit()
+            logger.info("Purged %s expired idempotency keys", result.rowcount)
+
+
+idempotency_store = IdempotencyStore(
+    ttl=settings.IDEMPOTENCY_KEY_TTL,
+    purge_interval=settings.IDEMPOTENCY_PURGE_INTERVAL,
+    lock_timeout=settings.IDEMPOTENCY_LOCK_TIMEOUT,
+)
@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+import uuid
+from typing import Any, Optional
+
+from sqlalchemy.dialects import mysql, postgresql
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+from app.config import settings
+
+
+class _UUID7Generator:
+    """Time-ordered UUIDs (RFC 9562 version 7).
+
+    The first 48 bits are the Unix time in milliseconds, so keys generated
+    later sort after earlier ones and inserts land at the right edge of the
+    primary key index instead of at random pages. The 12-bit ``rand_a``
+    field is a counter seeded at random each millisecond, which keeps keys
+    monotonic within one process even when many are created in the same
+    millisecond.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._counter = 0
+
+    def __call__(self) -> uuid.UUID:
+        with self._lock:
+            now_ms = time.time_ns() // 1_000_000
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._counter = int.from_bytes(os.urandom(2), "big") & 0x7FF
+            else:
+                self._counter += 1
+                if self._counter > 0xFFF:
+                    # Counter exhausted: borrow the next millisecond
+                    self._last_ms += 1
+                    self._counter = 0
+            timestamp, counter = self._last_ms, self._counter
+
+        rand_b = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+        value = (
+            (timestamp & ((1 << 48) - 1)) << 80
+            | 0x7 << 76
+            | counter << 64
+            | 0b10 << 62
+            | rand_b
+        )
+        return uuid.UUID(int=value)
+
+
+uuid7 = _UUID7Generator()
+
+ID_STRATEGIES = {
+    "uuid7": uuid7,
+    "uuid4": uuid.uuid4,
+}
+
+
+def new_id() -> str:
+    """Generate a primary key with the configured ``ID_STRATEGY``."""
+    return str(ID_STRATEGIES[settings.ID_STRATEGY]())
+
+
+# Namespace of the idempotency keys sent to downstream services
+IDEMPOTENCY_NAMESPACE = uuid.UUID("6f1c3e0a-5b7d-4e2a-9c1f-8d4b2a7e6c30")
+
+
+def idempotency_key(*parts: str) -> str:
+    """Deterministic idempotency key for a downstream call.
+
+    The same parts, e.g. an order id and a step name, always give the same
+    key, so a retried call is recognized by the service as a repeat.
+    """
+    return str(uuid.uuid5(IDEMPOTENCY_NAMESPACE, ":".join(parts)))
+
+
+def parse_id(value: str) -> Optional[str]:
+    """Return ``value`` in canonical form, or None if it is not a valid id."""
+    try:
+        return str(uuid.UUID(value))
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+class GUID(TypeDecorator):
+    """UUID column stored compactly, exposed to Python as a string.
+
+    PostgreSQL uses its native 16-byte ``UUID`` type, MySQL ``BINARY(16)``
+    and other backends (SQLite) a 16-byte blob. Values are bound from and
+    returned as canonical hyphenated strings, so the ORM models and the API
+    keep working with ``str`` ids.
+    """
+
+    impl = LargeBinary(16)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(postgresql.UUID(as_uuid=True))
+        if dialect.name in ("mysql", "mariadb"):
+            return dialect.type_descriptor(mysql.BINARY(16))
+        return dialect.type_descriptor(LargeBinary(16))
+
+    def process_bind_param(self, value: Any, dialect) -> Any:
+        if value is None:
+            return None
+        if not isinstance(value, uuid.UUID):
+            value = uuid.UUID(bytes=value) if isinstance(value, bytes) else uuid.UUID(value)
+        if dialect.name == "postgresql":
+            return value
+        return value.bytes
+
+    def process_result_value(self, value: Any, dialect) -> Optional[str]:
+        if value is None:
+            return None
+        if isinstance(value, uuid.UUID):
+            return str(value)
+        return str(uuid.UUID(bytes=bytes(value)))
@@ -0,0 +1,199 @@
+"""Logging setup: records are queued on the calling thread and formatted and
+written by a background thread, as plain text or one JSON object per line.
+
+Loggers take %-style arguments, so a message is only formatted when a record
+is actually written, and never on the event loop. Records below WARNING can
+be sampled and rate limited per logger.
+"""
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from app.config import settings
+from app.tracing import current_span
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Attributes every LogRecord has; anything else was passed in ``extra``
+_RECORD_ATTRIBUTES = frozenset(
+    logging.LogRecord("", 0, "", 0, "", (), None).__dict__
+) | {"message", "asctime", "trace_id", "span_id"}
+
+
+def parse_logger_limits(value: str) -> Dict[str, float]:
+    """Parse ``"app.saga=0.1,app.services=0.5"`` into ``{logger: value}``."""
+    limits = {}
+    for item in value.split(","):
+        if item.strip():
+            name, _, limit = item.partition("=")
+            limits[name.strip()] = float(limit)
+    return limits
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats a record as one JSON object, including its ``extra`` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "trace_id", None):
+            entry["trace_id"] = record.trace_id
+            entry["span_id"] = record.span_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TraceContextFilter(logging.Filter):
+    """Tags records with the active span, read on the thread that logs."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        span = current_span()
+        if span is not None:
+            record.trace_id = span.trace_id
+            record.span_id = span.span_id
+        return True
+
+
+class _TokenBucket:
+    __slots__ = ("rate", "tokens", "updated")
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Samples and rate limits records below WARNING, per logger.
+
+    ``sample_rates`` and ``rate_limits`` (records per second) are keyed by
+    logger name and apply to child loggers too; the most specific name
+    wins. Warnings and errors always pass. Suppressed records are counted
+    in ``suppressed``.
+    """
+
+    def __init__(self, sample_rates: Dict[str, float], rate_limits: Dict[str, float]):
+        super().__init__()
+        self.sample_rates = sample_rates
+        self.rate_limits = rate_limits
+        self.suppressed = 0
+        self._rules: Dict[str, tuple] = {}
+        self._buckets: Dict[str, _TokenBucket] = {}
+
+    def _rule(self, name: str) -> tuple:
+        rule = self._rules.get(name)
+        if rule is None:
+            rule = self._rules[name] = (
+                self._lookup(self.sample_rates, name),
+                self._lookup(self.rate_limits, name),
+            )
+        return rule
+
+    @staticmethod
+    def _lookup(limits: Dict[str, float], name: str) -> Optional[str]:
+        while True:
+            if name in limits:
+                return name
+            if "." not in name:
+                return "" if "" in limits else None
+            name = name.rsplit(".", 1)[0]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        sampled, limited = self._rule(record.name)
+        if sampled is not None and random.random() >= self.sample_rates[sampled]:
+            self.suppressed += 1
+            return False
+        if limited is not None:
+            bucket = self._buckets.get(limited)
+            if bucket is None:
+                bucket = self._buckets[limited] = _TokenBucket(self.rate_limits[limited])
+            if not bucket.take():
+                self.suppressed += 1
+                return False
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Queues records without formatting them; drops them when the queue is full.
+
+    The standard ``QueueHandler`` formats each message before queueing it,
+    on the thread that logs; here the listener's handler does it. Records
+    are not copied, so objects passed as arguments must not be mutated
+    after they are logged.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging() -> Optional[logging.handlers.QueueListener]:
+    """Install the root handler described by the ``LOG_*`` settings.
+
+    Returns the started listener when logging is asynchronous; stopping it
+    drains the queue.
+    """
+    root = logging.getLogger()
+    root.setLevel(settings.LOG_LEVEL.upper())
+
+    output = logging.StreamHandler(sys.stderr)
+    if settings.LOG_FORMAT == "json":
+        output.setFormatter(JSONFormatter())
+    else:
+        output.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    filters = [TraceContextFilter()]
+    if settings.LOG_SAMPLING or settings.LOG_RATE_LIMITS:
+        filters.append(SamplingFilter(
+            parse_logger_limits(settings.LOG_SAMPLING),
+            parse_logger_limits(settings.LOG_RATE_LIMITS),
+        ))
+
+    listener = None
+    if settings.LOG_ASYNC:
+        handler = NonBlockingQueueHandler(queue.Queue(settings.LOG_QUEUE_SIZE))
+        listener = logging.handlers.QueueListener(handler.queue, output)
+        listener.start()
+    else:
+        handler = output
+    for log_filter in filters:
+        handler.addFilter(log_filter)
+
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    return listener
@@ -1,124 +1,508 @@
+import asyncio
+import json
 import logging
-from typing import List
-
-from fastapi import Depends, FastAPI, HTTPException
-from sqlalchemy.orm import Session
-
-from app import models
-from app.database import Base, engine, get_db
-from app.models import (AddressCreate, ItemCreate, Order, OrderCreate,
-                        OrderItem, OrderResponse, OrderStatus, ShippingAddress)
-from app.saga import Saga
-from app.steps.inventory import InventoryStep
-from app.steps.payment import PaymentStep
-from app.steps.shipping import ShippingStep
-
-# Create database tables
-Base.metadata.create_all(bind=engine)
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
+from contextlib import AsyncExitStack, asynccontextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from fastapi import Body, Depends, FastAPI, Header, HTTPException, Query, Request, WebSocket
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.background import BackgroundTask
+
+from app.cache import order_cache
+from app.checkout import (checkout_limiter, claim_order, insert_orders, new_order,
+                          run_checkout)
+from app.config import settings
+from app.database import engine, get_db, get_session_factory
+from app.events import is_final, order_events
+from app.group_commit import group_commit_writer
+from app.idempotency import idempotency_store, request_fingerprint
+from app.ids import parse_id
+from app.log import configure_logging
+from app.metrics import PROMETHEUS_CONTENT_TYPE, registry
+from app.models import (BatchOrderResult, Order, OrderAccepted, OrderCreate,
+                        OrderResponse, OrderStatus, OrderSummary)
+from app.queries import (EXPORT_COLUMNS, InvalidCursor, decode_cursor, encode_cursor,
+                         load_order, order_export_query, order_filters, order_page_query)
+from app.read_routing import ReadYourWritesMiddleware, get_read_db, read_router
+from app.recovery import saga_recovery
+from app.services.inventory import inventory_service
+from app.services.payment import payment_service
+from app.services.resilience import Overloaded
+from app.services.shipping import shipping_service
+from app.startup import start_up
+from app.tracing import TracingMiddleware, tracer
+from app.worker import worker_pool
 
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Saga Pattern Microservice")
+SERVICE_CLIENTS = (payment_service, inventory_service, shipping_service)
 
 
-@app.post("/orders", response_model=OrderResponse)
-async def create_order(request: OrderCreate, db: Session = Depends(get_db)):
-    """Create a new order and execute the checkout saga."""
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Configure logging, open downstream clients, warm up and start the background workers."""
+    log_listener = configure_logging()
+    for service in SERVICE_CLIENTS:
+        await service.start()
+    timer = await start_up(app, engine, SERVICE_CLIENTS, read_router.engines)
+    await tracer.start()
+    await read_router.start()
+    if settings.GROUP_COMMIT_ENABLED:
+        await group_commit_writer.start()
+    await worker_pool.start()
+    if settings.SAGA_RECOVERY_ENABLED:
+        await saga_recovery.start()
+    timer.finish()
     try:
-        # Calculate total amount
-        total_amount = sum(item.price * item.quantity for item in request.items)
-
-        # Create order
-        order = Order(
-            customer_id=request.customer_id,
-            total_amount=total_amount,
-            status=OrderStatus.PENDING,
-        )
-        db.add(order)
-        db.flush()  # Flush to get the order ID
-
-        # Add order items
-        order_items = []
-        for item in request.items:
-            order_item = OrderItem(
-                order_id=order.id,
-                product_id=item.product_id,
-                name=item.name,
-                price=item.price,
-                quantity=item.quantity,
-            )
-            db.add(order_item)
-            order_items.append(order_item)
+        yield
+    finally:
+        await saga_recovery.stop()
+        await worker_pool.stop(settings.CHECKOUT_SHUTDOWN_TIMEOUT)
+        await group_commit_writer.stop()
+        for service in SERVICE_CLIENTS:
+            await service.close()
+        await tracer.stop()
+        await read_router.dispose()
+        await engine.dispose()
+        if log_listener is not None:
+            log_listener.stop()
 
-        # Add shipping address
-        shipping_address = ShippingAddress(
-            order_id=order.id,
-            **request.shipping_address.dict()
-        )
-        db.add(shipping_address)
 
-        # Add payment info
-        payment_info = models.PaymentInfo(
-            order_id=order.id,
-            payment_method=request.payment_method,
+app = FastAPI(title="Saga Pattern Microservice", lifespan=lifespan)
+app.add_middleware(ReadYourWritesMiddleware, router=read_router)
+app.add_middleware(TracingMiddleware, tracer=tracer)
+
+
+@app.post(
+    "/orders",
+    response_model=OrderResponse,
+    responses={202: {"model": OrderAccepted}},
+)
+async def create_order(
+    request: OrderCreate,
+    prefer: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """Create a new order and execute the checkout saga.
+
+    With ``Prefer: respond-async`` the order is accepted as pending and the
+    saga runs in the background worker pool; the response is ``202`` with a
+    URL to poll for the outcome.
+
+    With an ``Idempotency-Key`` header, a retry of the same request returns
+    the first response instead of creating another order.
+    """
+    run_async = worker_pool.running and "respond-async" in (prefer or "")
+    if run_async and worker_pool.full():
+        raise HTTPException(
+            status_code=503,
+            detail="Checkout queue is full",
+            headers={"Retry-After": "1"},
         )
-        db.add(payment_info)
-
-        db.commit()
-        db.refresh(order)
-
-        # Prepare context for saga
-        context = {
-            "order_id": order.id,
-            "customer_id": order.customer_id,
-            "total_amount": order.total_amount,
-            "payment_method": request.payment_method,
-            "shipping_address": request.shipping_address.dict(),
-            "items": [
-                {
-                    "product_id": item.product_id,
-                    "name": item.name,
-                    "price": item.price,
-                    "quantity": item.quantity,
-                }
-                for item in request.items
-            ],
-        }
 
-        # Create and execute saga
-        saga = Saga(
-            db,
-            order,
-            [PaymentStep, InventoryStep, ShippingStep]
+    if idempotency_key is None:
+        return await checkout_order(request, run_async, db)
+
+    fingerprint = request_fingerprint(request.json(sort_keys=True), str(run_async))
+    replay = await idempotency_store.begin(db, idempotency_key, fingerprint)
+    if replay is not None:
+        return replay
+
+    try:
+        response = await checkout_order(request, run_async, db)
+    except HTTPException as e:
+        if e.status_code >= 500:
+            await idempotency_store.release(db, idempotency_key)
+        else:
+            # The order was created and failed; a retry gets the same outcome
+            body = json.dumps({"detail": e.detail}).encode()
+            await idempotency_store.complete(db, idempotency_key, e.status_code, body)
+        raise
+    except Exception:
+        await idempotency_store.release(db, idempotency_key)
+        raise
+
+    await idempotency_store.complete(
+        db, idempotency_key, response.status_code, response.body,
+        location=response.headers.get("location"),
+    )
+    return response
+
+
+async def checkout_order(request: OrderCreate, run_async: bool, db: AsyncSession) -> Response:
+    """Admit a checkout and place its order.
+
+    A synchronous checkout first waits for a slot under the saga
+    concurrency limit; when none frees up in time it is shed with ``503``
+    before the order is created.
+    """
+    if run_async:
+        return await place_order(request, run_async, db)
+    try:
+        async with checkout_limiter.admit():
+            return await place_order(request, run_async, db)
+    except Overloaded as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many checkouts in flight",
+            headers={"Retry-After": str(e.retry_after)},
         )
 
+
+async def place_order(request: OrderCreate, run_async: bool, db: AsyncSession) -> Response:
+    """Persist the order, then run its saga or hand it to the worker pool."""
+    try:
+        # Create order with its items, shipping address and payment info
+        order = new_order(request, OrderStatus.PENDING if run_async else OrderStatus.PROCESSING)
+        db.add(order)
+        await db.commit()
+
+        if run_async:
+            return accept_order(order)
+
         try:
-            await saga.execute(context)
+            await run_checkout(db, order)
 
-            # Refresh order to get the latest state
-            db.refresh(order)
-            return order
+            # Reload order to get the latest state
+            return await order_response(await load_order(db, order.id))
 
+        except Overloaded as e:
+            # Shed by a downstream bulkhead; unless a step had completed, the
+            # saga gave the order back as pending instead of failing it
+            raise HTTPException(
+                status_code=503,
+                detail=f"{e}, order {order.id} is {order.status.value}",
+                headers={"Retry-After": str(e.retry_after)},
+            )
         except Exception as e:
             # Note: The saga already updates the order status, so we don't need to do it here
             raise HTTPException(status_code=400, detail=str(e))
 
+    except HTTPException:
+        raise
     except Exception as e:
-        db.rollback()
-        logger.error(f"Error creating order: {str(e)}")
+        await db.rollback()
+        logger.error("Error creating order: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to create order: {str(e)}")
 
 
+def accept_order(order: Order) -> JSONResponse:
+    """Hand a persisted order to the worker pool and answer ``202 Accepted``."""
+    try:
+        worker_pool.submit(order.id)
+    except asyncio.QueueFull:
+        # The order stays pending and is queued again when the pool restarts
+        raise HTTPException(
+            status_code=503,
+            detail=f"Checkout queue is full, order {order.id} is pending",
+            headers={"Retry-After": "1"},
+        )
+
+    status_url = app.url_path_for("get_order", order_id=order.id)
+    accepted = OrderAccepted(order_id=order.id, status=order.status, status_url=status_url)
+    return JSONResponse(
+        status_code=202,
+        content=jsonable_encoder(accepted),
+        headers={"Location": status_url},
+    )
+
+
+@app.post("/orders/batch", response_model=List[BatchOrderResult])
+async def create_orders_batch(
+    payloads: List[Dict[str, Any]] = Body(...),
+    db: AsyncSession = Depends(get_db),
+    session_factory=Depends(get_session_factory),
+):
+    """Create many orders at once and execute their checkout sagas.
+
+    Each payload is validated on its own; invalid ones are reported as
+    ``rejected`` without affecting the rest of the batch. Valid orders are
+    bulk-inserted as PENDING, then their sagas run with bounded concurrency,
+    each in its own session; an order is only claimed once its saga has a
+    checkout slot.
+    """
+    if len(payloads) > settings.ORDER_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch exceeds {settings.ORDER_BATCH_MAX_SIZE} orders",
+        )
+
+    results: List[Optional[BatchOrderResult]] = [None] * len(payloads)
+    accepted = []
+    for index, payload in enumerate(payloads):
+        try:
+            accepted.append((index, OrderCreate.parse_obj(payload)))
+        except ValidationError as e:
+            results[index] = BatchOrderResult(index=index, status="rejected", error=str(e))
+
+    try:
+        orders = await insert_orders(db, [request for _, request in accepted])
+    except Exception as e:
+        await db.rollback()
+        logger.error("Error creating order batch: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to create orders: {str(e)}")
+
+    semaphore = asyncio.Semaphore(settings.ORDER_BATCH_CONCURRENCY)
+
+    async def checkout(index: int, order: Order) -> None:
+        error = None
+        async with semaphore, session_factory() as session:
+            try:
+                async with checkout_limiter.admit(block=True):
+                    if await claim_order(session, order.id):
+                        await run_checkout(session, order)
+                    else:
+                        # Picked up by the worker pool of another process
+                        order.status = OrderStatus.PROCESSING
+            except HTTPException as e:
+                error = str(e.detail)
+            except Exception as e:
+                error = str(e)
+        results[index] = BatchOrderResult(
+            index=index, order_id=order.id, status=order.status, error=error
+        )
+
+    await asyncio.gather(
+        *(checkout(index, order) for (index, _), order in zip(accepted, orders))
+    )
+    return results
+
+
+@app.get("/orders", response_model=List[OrderSummary])
+async def list_orders(
+    request: Request,
+    customer_id: Optional[str] = None,
+    status: Optional[OrderStatus] = None,
+    since: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.ORDER_LIST_DEFAULT_LIMIT, ge=1, le=settings.ORDER_LIST_MAX_LIMIT),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """List orders, newest first.
+
+    Pages are keyed on ``(created_at, id)``: when there are more orders, the
+    ``Link`` header holds the URL of the next page, with a ``cursor`` that
+    continues after the last order of this one.
+    """
+    try:
+        after = decode_cursor(cursor) if cursor is not None else None
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    query = order_page_query(order_filters(customer_id, status, since), after, limit + 1)
+    orders = (await db.execute(query)).scalars().all()
+    headers = {}
+    if len(orders) > limit:
+        orders = orders[:limit]
+        next_url = request.url.include_query_params(cursor=encode_cursor(orders[-1]))
+        headers["Link"] = f'<{next_url}>; rel="next"'
+
+    return JSONResponse(
+        content=jsonable_encoder([OrderSummary.from_orm(order) for order in orders]),
+        headers=headers,
+    )
+
+
+@app.get("/orders/export")
+async def export_orders(
+    request: Request,
+    customer_id: Optional[str] = None,
+    status: Optional[OrderStatus] = None,
+    since: Optional[datetime] = None,
+    session_factory=Depends(get_session_factory),
+):
+    """Stream matching orders as NDJSON, oldest first.
+
+    Rows are read through a server-side cursor, ``ORDER_EXPORT_BATCH_SIZE``
+    at a time, and written out batch by batch, so memory use does not
+    depend on the number of orders.
+    """
+    factory = read_router.replica(request.cookies) or session_factory
+    query = order_export_query(
+        order_filters(customer_id, status, since), settings.ORDER_EXPORT_BATCH_SIZE
+    )
+    fields = [column.key for column in EXPORT_COLUMNS]
+
+    async def lines():
+        async with factory() as session:
+            result = await session.stream(query)
+            async for rows in result.partitions():
+                yield "".join(
+                    json.dumps(dict(zip(fields, row)), default=jsonable_encoder) + "\n"
+                    for row in rows
+                )
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
 @app.get("/orders/{order_id}", response_model=OrderResponse)
-async def get_order(order_id: str, db: Session = Depends(get_db)):
-    """Get order details."""
-    order = db.query(Order).filter(Order.id == order_id).first()
+async def get_order(
+    order_id: str,
+    db: AsyncSession = Depends(get_read_db),
+    primary: AsyncSession = Depends(get_db),
+):
+    """Get order details.
+
+    Read from a replica when one is configured; an order the replica has
+    not received yet is read from the primary.
+    """
+    order_id = parse_id(order_id)
+    if order_id is None:
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    cached = await order_cache.get(order_id)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+
+    order = await load_order(db, order_id)
+    if order is None and db is not primary:
+        order = await load_order(primary, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
-    return order
+    return await order_response(order)
+
+
+async def order_response(order: Order) -> Response:
+    """Serialize an order once, caching the JSON if the order is final."""
+    body = OrderResponse.from_orm(order).json().encode()
+    await order_cache.set(order.id, order.status, body)
+    return Response(content=body, media_type="application/json")
+
+
+async def order_snapshot(session_factory, order_id: str) -> Optional[Dict[str, Any]]:
+    """The order as the first event of a notification stream, read from the primary."""
+    async with session_factory() as db:
+        order = await load_order(db, order_id)
+        if order is None:
+            return None
+        return {
+            "type": "snapshot",
+            "order_id": order_id,
+            "order": jsonable_encoder(OrderResponse.from_orm(order)),
+        }
+
+
+@app.get("/orders/{order_id}/events")
+async def order_event_stream(order_id: str, session_factory=Depends(get_session_factory)):
+    """Stream an order's status and step changes as Server-Sent Events.
+
+    The first event is a snapshot of the order; the stream ends after the
+    order has completed or failed. The subscription is taken before the
+    snapshot is read, so no change in between is missed, and no database
+    session is held while the stream is open.
+    """
+    order_id = parse_id(order_id)
+    if order_id is None:
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    stack = AsyncExitStack()
+    queue = await stack.enter_async_context(order_events.subscribe(order_id))
+    try:
+        snapshot = await order_snapshot(session_factory, order_id)
+    except BaseException:
+        await stack.aclose()
+        raise
+    if snapshot is None:
+        await stack.aclose()
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    def message(event: Dict[str, Any]) -> str:
+        return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    async def events():
+        async with stack:
+            yield message(snapshot)
+            if is_final(snapshot):
+                return
+            async for event in order_events.follow(queue, settings.EVENT_KEEPALIVE_INTERVAL):
+                yield ": keep-alive\n\n" if event is None else message(event)
+
+    # The stream closes the subscription when it ends; the background task
+    # closes it when the client went away before the stream started
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(stack.aclose),
+    )
+
+
+@app.websocket("/orders/{order_id}/ws")
+async def order_event_socket(
+    websocket: WebSocket, order_id: str, session_factory=Depends(get_session_factory)
+):
+    """Send an order's snapshot, status and step changes as JSON messages.
+
+    Same events as ``/orders/{order_id}/events``. The server closes the
+    socket once the order has completed or failed; an unknown order is
+    refused with close code 4404.
+    """
+    order_id = parse_id(order_id)
+    if order_id is None:
+        await websocket.close(code=4404)
+        return
+
+    async with order_events.subscribe(order_id) as queue:
+        snapshot = await order_snapshot(session_factory, order_id)
+        if snapshot is None:
+            await websocket.close(code=4404)
+            return
+
+        await websocket.accept()
+        await websocket.send_json(snapshot)
+        if is_final(snapshot):
+            await websocket.close()
+            return
+
+        async def push():
+            async for event in order_events.follow(queue, settings.EVENT_KEEPALIVE_INTERVAL):
+                if event is not None:
+                    await websocket.send_json(event)
+            await websocket.close()
+
+        async def client_gone():
+            # Messages from the client are ignored
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+
+        pusher = asyncio.ensure_future(push())
+        listener = asyncio.ensure_future(client_gone())
+        await asyncio.wait({pusher, listener}, return_when=asyncio.FIRST_COMPLETED)
+        pusher.cancel()
+        listener.cancel()
+        # Sends fail once the client has gone away; that ends the stream too
+        await asyncio.gather(pusher, listener, return_exceptions=True)
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Order cache hit, miss and eviction counters."""
+    return order_cache.stats()
+
+
+@app.get("/health")
+async def health_check():
+    return {"status": "healthy"}
+
+
+@app.get("/metrics")
+async def metrics():
+    """Metrics in the Prometheus text exposition format."""
+    return Response(content=registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@app.get("/admission/stats")
+async def admission_stats():
+    """Concurrency limit, in-flight, queued and shed counts of the checkout limiter."""
+    return checkout_limiter.stats()
+
+
+@app.get("/services/stats")
+async def service_stats():
+    """Circuit breaker state, trips, latency and timeout of each downstream service."""
+    return {service.name: service.stats() for service in SERVICE_CLIENTS}
@@ -0,0 +1,279 @@
+"""Prometheus metrics, rendered in the text exposition format by ``/metrics``.
+
+Metrics are only updated from the event loop thread, so they need no locks:
+an observation is a bisect over the bucket bounds and two in-place
+additions. Label children are created once, on first use or up front, and
+callers on hot paths keep a reference to the child they record into.
+"""
+import abc
+import math
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric(abc.ABC):
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        registry.register(self)
+
+    def labels(self, *values: str):
+        """Return the child for ``values``, creating it on first use."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    @abc.abstractmethod
+    def _new_child(self):
+        ...
+
+    @abc.abstractmethod
+    def samples(self) -> Iterator[str]:
+        ...
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+            *self.samples(),
+        ]
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def samples(self) -> Iterator[str]:
+        for values, child in self._children.items():
+            labels = _format_labels(self.labelnames, values)
+            yield f"{self.name}_total{labels} {_format_value(child.value)}"
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def samples(self) -> Iterator[str]:
+        for values, child in self._children.items():
+            labels = _format_labels(self.labelnames, values)
+            yield f"{self.name}{labels} {_format_value(child.value)}"
+
+
+class _HistogramChild:
+    __slots__ = ("upper_bounds", "counts", "sum")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        # One count per bucket, plus the +Inf bucket; cumulated when rendered
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.upper_bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def samples(self) -> Iterator[str]:
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip((*self.upper_bounds, math.inf), child.counts):
+                cumulative += count
+                labels = _format_labels((*self.labelnames, "le"), (*values, _format_value(bound)))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_format_value(child.sum)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> None:
+        self.metrics.append(metric)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+saga_duration_seconds = Histogram(
+    "saga_duration_seconds",
+    "Duration of checkout sagas, including compensation, by outcome.",
+    ("outcome",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+sagas_in_flight = Gauge("sagas_in_flight", "Sagas currently executing.")
+step_duration_seconds = Histogram(
+    "saga_step_duration_seconds",
+    "Duration of saga step executions and compensations, by outcome.",
+    ("step", "action", "outcome"),
+)
+downstream_request_duration_seconds = Histogram(
+    "downstream_request_duration_seconds",
+    "Duration of requests to downstream services.",
+    ("service",),
+)
+downstream_responses = Counter(
+    "downstream_responses",
+    "Requests to downstream services by status code; "
+    "'error' for transport errors, 'circuit_open' and 'bulkhead_full' for rejected calls.",
+    ("service", "status"),
+)
+db_commit_duration_seconds = Histogram(
+    "db_commit_duration_seconds",
+    "Duration of database session commits, including the final flush.",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+db_reads = Counter(
+    "db_reads",
+    "Read-only requests by the database they were routed to (primary or replica).",
+    ("target",),
+)
+concurrency_limit = Gauge(
+    "concurrency_limit",
+    "Current adaptive concurrency limit of in-flight sagas and of each downstream service.",
+    ("limiter",),
+)
+requests_shed = Counter(
+    "requests_shed",
+    "Calls rejected by an adaptive concurrency limiter, because its wait queue "
+    "was full or the wait timed out.",
+    ("limiter",),
+)
+replica_lag_seconds = Gauge(
+    "replica_lag_seconds",
+    "Age of the replication heartbeat on each read replica, at the last check.",
+    ("replica",),
+)
+startup_duration_seconds = Gauge(
+    "startup_duration_seconds",
+    "Duration of the application startup phases, and of the whole startup.",
+    ("phase",),
+)
+
+# Children with known label values are created up front, so they are
+# exported as zero before the first observation
+saga_timers = {
+    outcome: saga_duration_seconds.labels(outcome) for outcome in ("completed", "failed")
+}
+saga_gauge = sagas_in_flight.labels()
+commit_timer = db_commit_duration_seconds.labels()
+
+STEP_OUTCOMES = {
+    "execute": ("completed", "failed", "cancelled"),
+    "compensate": ("compensated", "failed"),
+}
+_step_timers: Dict[str, Dict[str, Dict[str, _HistogramChild]]] = {}
+
+
+def step_timers(step_name: str) -> Dict[str, Dict[str, _HistogramChild]]:
+    """Duration histograms of a step, as ``timers[action][outcome]``."""
+    timers = _step_timers.get(step_name)
+    if timers is None:
+        timers = _step_timers[step_name] = {
+            action: {
+                outcome: step_duration_seconds.labels(step_name, action, outcome)
+                for outcome in outcomes
+            }
+            for action, outcomes in STEP_OUTCOMES.items()
+        }
+    return timers
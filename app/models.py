@@ -1,14 +1,14 @@
 from datetime import datetime
 from enum import Enum as PyEnum
 from typing import List, Optional
-from uuid import uuid4
 
 from pydantic import BaseModel, Field
-from sqlalchemy import (Column, DateTime, Enum, Float, ForeignKey, Integer,
-                        String, Table)
+from sqlalchemy import (Column, DateTime, Enum, Float, ForeignKey, Index,
+                        Integer, LargeBinary, String, Table)
 from sqlalchemy.orm import relationship
 
 from app.database import Base
+from app.ids import GUID, new_id
 
 
 # SQLAlchemy Models
@@ -29,8 +29,8 @@ class StepStatus(str, PyEnum):
 class Order(Base):
     __tablename__ = "orders"
 
-    id = Column(String, primary_key=True, index=True, default=lambda: str(uuid4()))
-    customer_id = Column(String, index=True)
+    id = Column(GUID, primary_key=True, default=new_id)
+    customer_id = Column(String)
     total_amount = Column(Float)
     status = Column(Enum(OrderStatus), default=OrderStatus.PENDING)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -38,16 +38,26 @@ class Order(Base):
 
     # Relationships
     items = relationship("OrderItem", back_populates="order")
-    steps = relationship("OrderStep", back_populates="order")
+    steps = relationship("OrderStep", back_populates="order", order_by="OrderStep.execution_order")
     shipping_address = relationship("ShippingAddress", back_populates="order", uselist=False)
     payment_info = relationship("PaymentInfo", back_populates="order", uselist=False)
 
+    __table_args__ = (
+        # Customer order history, newest first, paged by (created_at, id)
+        Index("ix_orders_customer_id_created_at", "customer_id", "created_at", "id"),
+        # Listing and export of all orders, or of those in one status, paged by (created_at, id)
+        Index("ix_orders_created_at", "created_at", "id"),
+        Index("ix_orders_status_created_at", "status", "created_at", "id"),
+        # Stale saga scan: PROCESSING orders ordered by last heartbeat
+        Index("ix_orders_status_updated_at", "status", "updated_at", "id"),
+    )
+
 
 class OrderItem(Base):
     __tablename__ = "order_items"
 
-    id = Column(String, primary_key=True, index=True, default=lambda: str(uuid4()))
-    order_id = Column(String, ForeignKey("orders.id"))
+    id = Column(GUID, primary_key=True, default=new_id)
+    order_id = Column(GUID, ForeignKey("orders.id"), index=True)
     product_id = Column(String, index=True)
     name = Column(String)
     price = Column(Float)
@@ -60,8 +70,8 @@ class OrderItem(Base):
 class ShippingAddress(Base):
     __tablename__ = "shipping_addresses"
 
-    id = Column(String, primary_key=True, index=True, default=lambda: str(uuid4()))
-    order_id = Column(String, ForeignKey("orders.id"), unique=True)
+    id = Column(GUID, primary_key=True, default=new_id)
+    order_id = Column(GUID, ForeignKey("orders.id"), unique=True)
     street = Column(String)
     city = Column(String)
     state = Column(String)
@@ -75,8 +85,8 @@ class ShippingAddress(Base):
 class PaymentInfo(Base):
     __tablename__ = "payment_info"
 
-    id = Column(String, primary_key=True, index=True, default=lambda: str(uuid4()))
-    order_id = Column(String, ForeignKey("orders.id"), unique=True)
+    id = Column(GUID, primary_key=True, default=new_id)
+    order_id = Column(GUID, ForeignKey("orders.id"), unique=True)
     payment_method = Column(String)
     payment_id = Column(String, nullable=True)
     transaction_id = Column(String, nullable=True)
@@ -88,8 +98,8 @@ class PaymentInfo(Base):
 class OrderStep(Base):
     __tablename__ = "order_steps"
 
-    id = Column(String, primary_key=True, index=True, default=lambda: str(uuid4()))
-    order_id = Column(String, ForeignKey("orders.id"))
+    id = Column(GUID, primary_key=True, default=new_id)
+    order_id = Column(GUID, ForeignKey("orders.id"))
     step_name = Column(String)
     status = Column(Enum(StepStatus), default=StepStatus.PENDING)
     execution_order = Column(Integer)
@@ -101,6 +111,31 @@ class OrderStep(Base):
     # Relationships
     order = relationship("Order", back_populates="steps")
 
+    __table_args__ = (
+        # Steps of an order in execution order
+        Index("ix_order_steps_order_id_execution_order", "order_id", "execution_order"),
+    )
+
+
+class IdempotencyRecord(Base):
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(255), primary_key=True)
+    fingerprint = Column(String)  # Hash of the request the key was first used with
+    status_code = Column(Integer, nullable=True)  # Unset while the request is in progress
+    location = Column(String, nullable=True)
+    body = Column(LargeBinary, nullable=True)  # zlib-compressed response body
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, index=True)
+
+
+class ReplicationHeartbeat(Base):
+    """Single row the primary rewrites periodically; its age on a replica is the replica's lag."""
+    __tablename__ = "replication_heartbeat"
+
+    id = Column(Integer, primary_key=True)
+    written_at = Column(DateTime, nullable=False)
+
 
 # Pydantic Models
 class ItemCreate(BaseModel):
@@ -181,3 +216,28 @@ class OrderResponse(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class OrderSummary(BaseModel):
+    id: str
+    customer_id: str
+    total_amount: float
+    status: OrderStatus
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        orm_mode = True
+
+
+class OrderAccepted(BaseModel):
+    order_id: str
+    status: OrderStatus
+    status_url: str
+
+
+class BatchOrderResult(BaseModel):
+    index: int
+    order_id: Optional[str] = None
+    status: str
+    error: Optional[str] = None
@@ -0,0 +1,111 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import bindparam, literal, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+
+from app.ids import parse_id
+from app.models import Order, OrderStatus
+
+# Relationships serialized by OrderResponse. Async sessions cannot lazy-load,
+# so every read that is returned to a client must load these up front. The
+# one-to-one rows and the items are joined into the order query; steps are
+# fetched with a second SELECT ... IN, so an order loads in two queries
+# without multiplying items by steps.
+ORDER_DETAIL_OPTIONS = (
+    joinedload(Order.shipping_address),
+    joinedload(Order.payment_info),
+    joinedload(Order.items),
+    selectinload(Order.steps),
+)
+
+# Built once so each read only binds the id; the compiled form is reused
+# from SQLAlchemy's statement cache.
+ORDER_DETAIL_QUERY = (
+    select(Order)
+    .options(*ORDER_DETAIL_OPTIONS)
+    .where(Order.id == bindparam("order_id"))
+    .execution_options(populate_existing=True)
+)
+
+
+async def load_order(db: AsyncSession, order_id: str) -> Optional[Order]:
+    """Load an order with everything needed to serialize it."""
+    result = await db.execute(ORDER_DETAIL_QUERY, {"order_id": order_id})
+    return result.unique().scalar_one_or_none()
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(order: Order) -> str:
+    """Opaque cursor pointing just past ``order`` in a listing."""
+    position = json.dumps([order.created_at.isoformat(), order.id])
+    return base64.urlsafe_b64encode(position.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, order_id = json.loads(base64.urlsafe_b64decode(padded))
+        created_at, order_id = datetime.fromisoformat(created_at), parse_id(order_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+    if order_id is None:
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+    return created_at, order_id
+
+
+def order_filters(
+    customer_id: Optional[str] = None,
+    status: Optional[OrderStatus] = None,
+    since: Optional[datetime] = None,
+) -> List[Any]:
+    filters = []
+    if customer_id is not None:
+        filters.append(Order.customer_id == customer_id)
+    if status is not None:
+        filters.append(Order.status == status)
+    if since is not None:
+        filters.append(Order.created_at >= since)
+    return filters
+
+
+def order_page_query(filters: List[Any], after: Optional[Tuple[datetime, str]], limit: int):
+    """One page of orders, newest first, after the ``(created_at, id)`` keyset.
+
+    Seeks into ``ix_orders_customer_id_created_at`` when filtering by
+    customer and into ``ix_orders_created_at`` otherwise, so a page costs
+    the same however deep it is.
+    """
+    query = select(Order).where(*filters)
+    if after is not None:
+        # Bound with the column types: an id bound as text would compare
+        # against the stored binary ids by storage class, not by value
+        created_at, order_id = after
+        query = query.where(
+            tuple_(Order.created_at, Order.id)
+            < tuple_(literal(created_at, Order.created_at.type), literal(order_id, Order.id.type))
+        )
+    return query.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit)
+
+
+# Columns of an exported order, in the order they are selected
+EXPORT_COLUMNS = (
+    Order.id, Order.customer_id, Order.total_amount, Order.status,
+    Order.created_at, Order.updated_at,
+)
+
+
+def order_export_query(filters: List[Any], batch_size: int):
+    """All matching orders, oldest first, fetched ``batch_size`` rows at a time."""
+    return (
+        select(*EXPORT_COLUMNS)
+        .where(*filters)
+        .order_by(Order.created_at, Order.id)
+        .execution_options(yield_per=batch_size)
+    )
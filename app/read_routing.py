@@ -0,0 +1,210 @@
+"""Routing of read-only requests to database replicas.
+
+Endpoints that only read take their session from ``get_read_db`` instead of
+``get_db``. When replicas are configured, those sessions are opened on a
+replica, chosen round-robin among those that are at most
+``REPLICA_MAX_STALENESS`` seconds behind the primary. The lag is measured
+with a heartbeat row that the router rewrites on the primary and reads back
+from every replica. When no replica is fresh enough, or the caller wrote
+recently, reads go to the primary: every write request gets a cookie with
+the time of the write, and for ``REPLICA_MAX_STALENESS`` seconds after it
+the caller's reads stay on the primary, so it always sees its own writes.
+Sagas, workers and every write stay on the primary.
+"""
+import asyncio
+import itertools
+import logging
+import time
+from datetime import datetime
+from typing import List, Mapping, Optional, Sequence
+
+from fastapi import Depends, Request
+from sqlalchemy import select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.database import SessionLocal, async_database_url, configure_sqlite, get_db
+from app.metrics import db_reads, replica_lag_seconds
+from app.models import ReplicationHeartbeat
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_ID = 1
+
+WRITE_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+
+
+class ReadRouter:
+    """Replica session factories, their measured lag and the read-your-writes check."""
+
+    def __init__(
+        self,
+        replica_urls: Sequence[str],
+        max_staleness: float,
+        cookie_name: str,
+        session_factory=SessionLocal,
+        lag_check_interval: float = 1.0,
+    ):
+        self.max_staleness = max_staleness
+        self.cookie_name = cookie_name
+        self.session_factory = session_factory
+        self.lag_check_interval = lag_check_interval
+        self.engines: List[AsyncEngine] = []
+        for url in replica_urls:
+            engine = create_async_engine(async_database_url(url))
+            configure_sqlite(engine)
+            self.engines.append(engine)
+        self.session_factories = [
+            sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+            for engine in self.engines
+        ]
+        # Lag of each replica at the last check (None: unknown), and when it was measured
+        self.lags: List[Optional[float]] = [None] * len(self.engines)
+        self._checked_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._counter = itertools.count()
+        self._primary_reads = db_reads.labels("primary")
+        self._replica_reads = db_reads.labels("replica")
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.session_factories)
+
+    def wrote_recently(self, cookies: Mapping[str, str]) -> bool:
+        try:
+            last_write = float(cookies[self.cookie_name])
+        except (KeyError, ValueError):
+            return False
+        return time.time() - last_write < self.max_staleness
+
+    def fresh_replicas(self) -> List[sessionmaker]:
+        """Session factories of the replicas within the staleness tolerance.
+
+        The age of the last measurement is added to each lag, so replicas
+        are given up on when the checks stop.
+        """
+        age = time.monotonic() - self._checked_at
+        return [
+            factory
+            for factory, lag in zip(self.session_factories, self.lags)
+            if lag is not None and lag + age <= self.max_staleness
+        ]
+
+    def replica(self, cookies: Mapping[str, str]) -> Optional[sessionmaker]:
+        """Session factory of the replica to read from, or None for the primary."""
+        replicas = self.fresh_replicas() if self.enabled else []
+        if not replicas or self.wrote_recently(cookies):
+            self._primary_reads.inc()
+            return None
+        self._replica_reads.inc()
+        return replicas[next(self._counter) % len(replicas)]
+
+    async def write_heartbeat(self) -> datetime:
+        now = datetime.utcnow()
+        async with self.session_factory() as db:
+            result = await db.execute(
+                update(ReplicationHeartbeat)
+                .where(ReplicationHeartbeat.id == HEARTBEAT_ID)
+                .values(written_at=now)
+            )
+            if result.rowcount == 0:
+                db.add(ReplicationHeartbeat(id=HEARTBEAT_ID, written_at=now))
+            await db.commit()
+        return now
+
+    async def check_lag(self) -> None:
+        """Write the heartbeat on the primary and measure its age on every replica."""
+        now = await self.write_heartbeat()
+        for index, factory in enumerate(self.session_factories):
+            try:
+                async with factory() as db:
+                    written_at = (
+                        await db.execute(
+                            select(ReplicationHeartbeat.written_at)
+                            .where(ReplicationHeartbeat.id == HEARTBEAT_ID)
+                        )
+                    ).scalar_one_or_none()
+            except SQLAlchemyError as e:
+                logger.warning("Could not read the heartbeat of replica %s: %r", index, e)
+                written_at = None
+            lag = None if written_at is None else max(0.0, (now - written_at).total_seconds())
+            self.lags[index] = lag
+            if lag is not None:
+                replica_lag_seconds.labels(str(index)).set(lag)
+        self._checked_at = time.monotonic()
+
+    async def start(self) -> None:
+        """Measure replica lag now and then every ``lag_check_interval`` seconds."""
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run(), name="replica-lag-check")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.check_lag()
+            except Exception as e:
+                logger.error("Replica lag check failed: %s", e)
+            await asyncio.sleep(self.lag_check_interval)
+
+    async def dispose(self) -> None:
+        await self.stop()
+        for engine in self.engines:
+            await engine.dispose()
+
+
+async def get_read_db(request: Request, db: AsyncSession = Depends(get_db)):
+    """Session for a read-only request: a replica, or the primary session."""
+    factory = read_router.replica(request.cookies)
+    if factory is None:
+        yield db
+        return
+    async with factory() as replica:
+        yield replica
+
+
+class ReadYourWritesMiddleware:
+    """ASGI middleware that stamps the response to a write with a cookie.
+
+    Only active when replicas are configured. The cookie expires when
+    reads from replicas are safe again.
+    """
+
+    def __init__(self, app, router: ReadRouter):
+        self.app = app
+        self.router = router
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in WRITE_METHODS
+            or not self.router.enabled
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 500:
+                cookie = (
+                    f"{self.router.cookie_name}={time.time():.3f}; "
+                    f"Max-Age={int(self.router.max_staleness) + 1}; Path=/; HttpOnly; SameSite=Lax"
+                )
+                message["headers"] = [*message.get("headers", []), (b"set-cookie", cookie.encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+read_router = ReadRouter(
+    [url.strip() for url in settings.DATABASE_REPLICA_URLS.split(",") if url.strip()],
+    max_staleness=settings.REPLICA_MAX_STALENESS,
+    cookie_name=settings.READ_YOUR_WRITES_COOKIE,
+    lag_check_interval=settings.REPLICA_LAG_CHECK_INTERVAL,
+)
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional, Type
+
+from sqlalchemy import select, update
+
+from app.checkout import CHECKOUT_STEPS, build_context
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Order, OrderStatus
+from app.queries import load_order
+from app.saga import Saga
+from app.steps.base import Step
+
+logger = logging.getLogger(__name__)
+
+
+class SagaRecovery:
+    """Resumes or compensates sagas whose process died mid-flight.
+
+    A running saga refreshes its order's ``updated_at`` at every durability
+    point, so a PROCESSING order that has not been updated for
+    ``stale_after`` seconds is orphaned. The scanner claims such orders in
+    batches and rebuilds each saga from its ``OrderStep`` rows: it resumes
+    forward when no step has failed, and compensates otherwise.
+
+    Claiming is a single conditional UPDATE that only matches orders that are
+    still stale, and it bumps ``updated_at``. When several replicas scan at
+    the same time, each order is therefore claimed by exactly one of them.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        step_classes: List[Type[Step]],
+        stale_after: float,
+        interval: float,
+        batch_size: int,
+    ):
+        self.session_factory = session_factory
+        self.step_classes = step_classes
+        self.stale_after = stale_after
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Scan once now and then every ``interval`` seconds in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="saga-recovery")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error("Saga recovery scan failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> int:
+        """Recover stale sagas batch by batch; return how many were recovered."""
+        recovered = 0
+        while True:
+            order_ids = await self._claim_batch()
+            if not order_ids:
+                return recovered
+
+            logger.info("Recovering %s interrupted sagas", len(order_ids))
+            await asyncio.gather(*(self._recover(order_id) for order_id in order_ids))
+            recovered += len(order_ids)
+
+    async def _claim_batch(self) -> List[str]:
+        now = datetime.utcnow()
+        cutoff = now - timedelta(seconds=self.stale_after)
+        stale = (Order.status == OrderStatus.PROCESSING, Order.updated_at < cutoff)
+
+        async with self.session_factory() as db:
+            candidates = (
+                select(Order.id)
+                .where(*stale)
+                .order_by(Order.updated_at)
+                .limit(self.batch_size)
+            )
+            result = await db.execute(
+                update(Order)
+                .where(Order.id.in_(candidates.scalar_subquery()), *stale)
+                .values(updated_at=now)
+                .returning(Order.id)
+                .execution_options(synchronize_session=False)
+            )
+            order_ids = result.scalars().all()
+            if order_ids:
+                await db.commit()
+        return order_ids
+
+    async def _recover(self, order_id: str) -> None:
+        async with self.session_factory() as db:
+            order = await load_order(db, order_id)
+            saga = Saga(db, order, self.step_classes, order_steps=order.steps)
+            try:
+                await saga.resume(build_context(order))
+            except Exception as e:
+                # The saga has already recorded the failure and compensated
+                logger.info("Recovered saga for order %s failed: %s", order_id, e)
+
+
+saga_recovery = SagaRecovery(
+    SessionLocal,
+    CHECKOUT_STEPS,
+    stale_after=settings.SAGA_RECOVERY_STALE_AFTER,
+    interval=settings.SAGA_RECOVERY_INTERVAL,
+    batch_size=settings.SAGA_RECOVERY_BATCH_SIZE,
+)
@@ -1,75 +1,301 @@
+import asyncio
 import logging
-from typing import Any, Dict, List, Type
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Type
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
 
-from app.models import Order, OrderStatus
+from app.events import order_status_event
+from app.metrics import saga_gauge, saga_timers
+from app.models import Order, OrderStatus, OrderStep, StepStatus
+from app.services.resilience import Overloaded
 from app.steps.base import Step
+from app.tracing import tracer
+from app.unit_of_work import SagaUnitOfWork
 
 logger = logging.getLogger(__name__)
 
 
 class Saga:
-    """Saga coordinator that manages the execution of steps."""
+    """Saga coordinator that manages the execution of steps.
 
-    def __init__(self, db: Session, order: Order, step_classes: List[Type[Step]]):
+    Steps form a dependency graph through ``Step.depends_on``. A step starts
+    as soon as all of its dependencies have completed, so independent steps
+    run concurrently and the saga takes roughly as long as its critical path.
+    If a step fails, no further steps are started; steps already in flight
+    are allowed to finish, and then every completed step is compensated in
+    reverse topological order, level by level; a durability point that
+    fails between steps is handled the same way. A saga whose steps were only
+    shed by a full bulkhead, before any of them completed, is not failed:
+    its order goes back to PENDING and ``Overloaded`` is raised.
+
+    The order stays PROCESSING until compensation has finished, and its
+    ``updated_at`` is refreshed at every durability point. A PROCESSING order
+    that has not been touched for a while therefore belongs to a saga whose
+    process died, and can be picked up by ``app.recovery``.
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        order: Order,
+        step_classes: List[Type[Step]],
+        order_steps: Optional[List[OrderStep]] = None,
+    ):
         self.db = db
         self.order = order
+        self.uow = SagaUnitOfWork(db, order.id)
         self.step_instances = []
 
-        # Initialize steps with execution order
+        # Initialize steps with execution order; the step records are
+        # inserted together at the first flush. When resuming, steps are
+        # attached to the records of the interrupted run instead.
+        persisted = {order_step.step_name: order_step for order_step in order_steps or ()}
         for idx, step_class in enumerate(step_classes):
             step = step_class(db)
-            step.register_step(order, idx + 1)
+            if step.step_name in persisted:
+                step.attach_step(self.uow, persisted[step.step_name])
+            else:
+                step.register_step(self.uow, order, idx + 1)
             self.step_instances.append(step)
 
+        self.depths = self._resolve_depths(self.step_instances)
+
+    @staticmethod
+    def _resolve_depths(steps: List[Step]) -> Dict[str, int]:
+        """Return each step's depth in the dependency graph, validating it."""
+        dependencies = {step.step_name: set(step.depends_on) for step in steps}
+        for name, deps in dependencies.items():
+            unknown = deps - dependencies.keys()
+            if unknown:
+                raise ValueError(f"Step {name} depends on unknown steps: {sorted(unknown)}")
+
+        depths: Dict[str, int] = {}
+        while len(depths) < len(dependencies):
+            resolved = {
+                name: max((depths[dep] + 1 for dep in deps), default=0)
+                for name, deps in dependencies.items()
+                if name not in depths and deps <= depths.keys()
+            }
+            if not resolved:
+                cycle = sorted(dependencies.keys() - depths.keys())
+                raise ValueError(f"Step dependencies contain a cycle: {cycle}")
+            depths.update(resolved)
+        return depths
+
+    def set_order_status(self, status: OrderStatus) -> None:
+        """Buffer an order status change and mirror it on the loaded order."""
+        now = datetime.utcnow()
+        set_committed_value(self.order, "status", status)
+        set_committed_value(self.order, "updated_at", now)
+        self.uow.update(Order, self.order.id, status=status, updated_at=now)
+        self.uow.publish(order_status_event(self.order.id, status, now))
+
+    async def checkpoint(self) -> None:
+        """Durability point: write buffered changes and refresh the order heartbeat."""
+        self.uow.update(Order, self.order.id, updated_at=datetime.utcnow())
+        await self.uow.flush()
+
     async def execute(self, context: Dict[str, Any]) -> Dict[str, Any]:
         """Execute all steps in the saga."""
-        # Update order status to processing
-        self.order.status = OrderStatus.PROCESSING
-        self.db.commit()
+        with tracer.span("saga.execute", order_id=self.order.id):
+            return await self._execute(context, [])
 
-        executed_steps = []
+    async def resume(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Continue a saga that was interrupted, from its persisted step records.
+
+        The references of completed steps are restored into ``context``. If a
+        step had already failed, the completed steps are compensated;
+        otherwise the remaining steps are executed.
+        """
+        with tracer.span("saga.resume", order_id=self.order.id):
+            completed = [
+                step for step in self.step_instances
+                if step.order_step.status == StepStatus.COMPLETED
+            ]
+            for step in completed:
+                step.restore(context)
+
+            if any(
+                step.order_step.status in (StepStatus.FAILED, StepStatus.COMPENSATED)
+                for step in self.step_instances
+            ):
+                logger.info("Compensating interrupted saga for order %s", self.order.id)
+                await self.compensate(context, completed)
+                self.set_order_status(OrderStatus.FAILED)
+                await self.uow.flush()
+                return context
+
+            logger.info("Resuming interrupted saga for order %s", self.order.id)
+            return await self._execute(context, completed)
+
+    async def _execute(self, context: Dict[str, Any], executed_steps: List[Step]) -> Dict[str, Any]:
+        # Update order status to processing
+        self.set_order_status(OrderStatus.PROCESSING)
+        started = time.perf_counter()
+        saga_gauge.inc()
 
         try:
-            for step in self.step_instances:
-                logger.info(f"Executing step: {step.step_name}")
-                context = await step.execute(context)
-                executed_steps.append(step)
+            await self._run_graph(
+                context, executed_steps, {step.step_name for step in executed_steps}
+            )
 
             # If all steps succeed, update order status to completed
-            self.order.status = OrderStatus.COMPLETED
-            self.db.commit()
+            self.set_order_status(OrderStatus.COMPLETED)
+            await self.uow.flush()
 
-            logger.info(f"Saga completed successfully for order {self.order.id}")
+            logger.info("Saga completed successfully for order %s", self.order.id)
+            saga_timers["completed"].observe(time.perf_counter() - started)
             return context
 
         except Exception as e:
-            logger.error(f"Error executing saga for order {self.order.id}: {str(e)}")
+            if isinstance(e, Overloaded) and not executed_steps:
+                await self._give_back(e)
+                raise
 
-            # Update order status to failed
-            self.order.status = OrderStatus.FAILED
-            self.db.commit()
+            logger.error("Error executing saga for order %s: %s", self.order.id, e)
 
-            # Compensate executed steps in reverse order
+            # Compensate executed steps in reverse order, then mark the order failed
             await self.compensate(context, executed_steps)
+            self.set_order_status(OrderStatus.FAILED)
+            await self.uow.flush()
+            saga_timers["failed"].observe(time.perf_counter() - started)
 
             # Re-raise the exception
             raise
 
+        finally:
+            saga_gauge.dec()
+
+    async def _give_back(self, error: Overloaded) -> None:
+        """Return an order that was shed before any step took effect to PENDING.
+
+        There is nothing to compensate, so the order is not failed: the steps
+        that were shed are reset and the order can be checked out again.
+        """
+        logger.warning("Saga for order %s was shed: %s", self.order.id, error)
+        for step in self.step_instances:
+            if step.order_step.status == StepStatus.FAILED:
+                await step.update_step_status(StepStatus.PENDING)
+        self.set_order_status(OrderStatus.PENDING)
+        await self.uow.flush()
+
+    async def _run_graph(
+        self,
+        context: Dict[str, Any],
+        executed_steps: List[Step],
+        done: Optional[Set[str]] = None,
+    ) -> None:
+        """Run every step not in ``done``, each once its dependencies completed."""
+        done = set(done or ())
+        started = set(done)
+
+        def ready_steps() -> List[Step]:
+            ready = [
+                step for step in self.step_instances
+                if step.step_name not in started and set(step.depends_on) <= done
+            ]
+            started.update(step.step_name for step in ready)
+            return ready
+
+        async def run(step: Step) -> None:
+            logger.info("Executing step: %s", step.step_name)
+            started = time.perf_counter()
+            outcome = "failed"
+            try:
+                with tracer.span("step.execute", step=step.step_name):
+                    result = await step.execute(context)
+                context.update(result)
+                outcome = "completed"
+            except asyncio.CancelledError:
+                outcome = "cancelled"
+                raise
+            finally:
+                step.timers["execute"][outcome].observe(time.perf_counter() - started)
+
+        await self.checkpoint()
+        running: Dict[asyncio.Task, Step] = {
+            asyncio.create_task(run(step)): step for step in ready_steps()
+        }
+        error: Optional[BaseException] = None
+        try:
+            while running:
+                finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    step = running.pop(task)
+                    if task.exception() is not None:
+                        # A step that failed outright outweighs one that was shed
+                        if error is None or isinstance(error, Overloaded):
+                            error = task.exception()
+                        continue
+                    executed_steps.append(step)
+                    done.add(step.step_name)
+
+                # After a failure no new step is started, but steps in flight
+                # run to completion: their calls may already have taken effect
+                # downstream, so they must be compensated, not abandoned
+                next_steps = [] if error is not None else ready_steps()
+                if next_steps:
+                    # Durability point: earlier outcomes are stored before the next external calls
+                    try:
+                        await self.checkpoint()
+                    except Exception as e:
+                        # The next steps are not started, and the steps in
+                        # flight are awaited like after a step failure
+                        error = e
+                        continue
+                    for next_step in next_steps:
+                        running[asyncio.create_task(run(next_step))] = next_step
+        finally:
+            # Only left with steps running when the saga itself is cancelled
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+
+        if error is not None:
+            raise error
+
     async def compensate(self, context: Dict[str, Any], steps_to_compensate=None) -> Dict[str, Any]:
         """
-        Compensate for executed steps in reverse order.
+        Compensate for executed steps in reverse topological order.
+        Steps at the same depth of the dependency graph are independent of
+        each other and are compensated concurrently.
         If steps_to_compensate is not provided, compensate all executed steps.
         """
+        with tracer.span("saga.compensate", order_id=self.order.id):
+            return await self._compensate_levels(context, steps_to_compensate)
+
+    async def _compensate_levels(self, context: Dict[str, Any], steps_to_compensate) -> Dict[str, Any]:
         steps = steps_to_compensate if steps_to_compensate is not None else self.step_instances
 
-        for step in reversed(steps):
-            try:
-                logger.info(f"Compensating step: {step.step_name}")
-                context = await step.compensate(context)
-            except Exception as e:
-                logger.error(f"Error compensating step {step.step_name}: {str(e)}")
-                # Continue compensating other steps even if one fails
+        levels: Dict[int, List[Step]] = {}
+        for step in steps:
+            levels.setdefault(self.depths[step.step_name], []).append(step)
+
+        for depth in sorted(levels, reverse=True):
+            await self.checkpoint()
+            results = await asyncio.gather(
+                *(self._compensate_step(step, context) for step in levels[depth])
+            )
+            for result in results:
+                context.update(result)
 
         return context
+
+    async def _compensate_step(self, step: Step, context: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            logger.info("Compensating step: %s", step.step_name)
+            with tracer.span("step.compensate", step=step.step_name):
+                return await step.compensate(context)
+        except Exception as e:
+            logger.error("Error compensating step %s: %s", step.step_name, e)
+            # Continue compensating other steps even if one fails
+            return context
+        finally:
+            # Steps record a failed compensation on their step record instead of raising
+            outcome = "compensated" if step.order_step.status == StepStatus.COMPENSATED else "failed"
+            step.timers["compensate"][outcome].observe(time.perf_counter() - started)
+
@@ -0,0 +1,238 @@
+import logging
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.config import settings
+from app.metrics import downstream_request_duration_seconds, downstream_responses
+from app.services.resilience import (AdaptiveLimiter, AdaptiveTimeout, AIMDLimit,
+                                     BulkheadFullError, CircuitBreaker, CircuitOpenError,
+                                     LatencyTracker, Overloaded, hedged)
+from app.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceClient:
+    """Base class for downstream service clients.
+
+    Each client owns one long-lived ``httpx.AsyncClient`` so connections to
+    the downstream service are pooled and reused across sagas. The client is
+    opened and closed from the application lifespan; it is also created
+    lazily on first use for callers that run outside the app.
+
+    Requests go through ``request``, which applies the client's circuit
+    breaker, its bulkhead (an adaptive limit on concurrent calls to the
+    service) and a timeout adapted to the service's observed latency, and
+    can hedge idempotent reads.
+    """
+
+    def __init__(self, name: str, base_url: str, timeout: float):
+        self.name = name
+        self.base_url = base_url
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self.breaker = CircuitBreaker(
+            name,
+            failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+            recovery_timeout=settings.CIRCUIT_BREAKER_RECOVERY_TIMEOUT,
+        )
+        self.latency = LatencyTracker(
+            window=settings.LATENCY_WINDOW, min_samples=settings.LATENCY_MIN_SAMPLES
+        )
+        self.adaptive_timeout = AdaptiveTimeout(
+            self.latency,
+            ceiling=timeout,
+            floor=settings.ADAPTIVE_TIMEOUT_MIN,
+            percentile=settings.ADAPTIVE_TIMEOUT_PERCENTILE,
+            multiplier=settings.ADAPTIVE_TIMEOUT_MULTIPLIER,
+            enabled=settings.ADAPTIVE_TIMEOUT_ENABLED,
+        )
+        self.bulkhead = AdaptiveLimiter(
+            name,
+            AIMDLimit(
+                initial=settings.BULKHEAD_LIMIT,
+                min_limit=settings.ADMISSION_MIN_LIMIT,
+                max_limit=settings.BULKHEAD_MAX,
+                latency_target=settings.BULKHEAD_LATENCY_TARGET,
+                backoff=settings.ADMISSION_BACKOFF,
+            ),
+            queue_size=settings.BULKHEAD_QUEUE_SIZE,
+            queue_timeout=settings.BULKHEAD_QUEUE_TIMEOUT,
+            enabled=settings.ADMISSION_CONTROL_ENABLED,
+        )
+        self.hedges = 0
+        self._request_timer = downstream_request_duration_seconds.labels(name)
+        self._responses = {
+            status: downstream_responses.labels(name, status) for status in ("error", "circuit_open", "bulkhead_full")
+        }
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+        return self._client
+
+    def _create_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(self.timeout, connect=settings.HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+            ),
+            http2=settings.HTTP2_ENABLED,
+        )
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        hedge: bool = False,
+        guarded: bool = True,
+        idempotency_key: Optional[str] = None,
+        **kwargs,
+    ) -> httpx.Response:
+        """Send a request to the service.
+
+        ``hedge`` sends a second copy of a slow request (idempotent GETs
+        only). Compensating calls pass ``guarded=False``: they must be
+        attempted even while the circuit is open or the bulkhead is full,
+        and get the full configured timeout.
+
+        Requests that are safe to repeat, GETs and requests sent with an
+        ``idempotency_key``, are retried up to ``SERVICE_RETRIES`` times
+        after a transport error or timeout.
+        """
+        if idempotency_key is not None:
+            kwargs["headers"] = {**kwargs.get("headers", {}), "Idempotency-Key": idempotency_key}
+        retries = settings.SERVICE_RETRIES if method == "GET" or idempotency_key else 0
+
+        for attempt in range(retries + 1):
+            try:
+                return await self._send(method, url, hedge, guarded, kwargs)
+            except CircuitOpenError:
+                raise
+            except httpx.RequestError as e:
+                if attempt == retries:
+                    raise
+                logger.warning("Retrying %s %s on %s service: %r", method, url, self.name, e)
+
+    async def _send(
+        self, method: str, url: str, hedge: bool, guarded: bool, kwargs: Dict[str, Any]
+    ) -> httpx.Response:
+        if not guarded:
+            return await self._send_traced(method, url, hedge, self.timeout, kwargs)
+
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self._responses["circuit_open"].inc()
+            raise
+        try:
+            await self.bulkhead.acquire()
+        except Overloaded as e:
+            self.breaker.release()
+            self._responses["bulkhead_full"].inc()
+            raise BulkheadFullError(self.name, e.retry_after)
+
+        started = time.monotonic()
+        try:
+            response = await self._send_traced(
+                method, url, hedge, self.adaptive_timeout.current, kwargs
+            )
+        except httpx.RequestError:
+            self.bulkhead.release(time.monotonic() - started, dropped=True)
+            raise
+        except BaseException:
+            self.bulkhead.release()
+            raise
+        self.bulkhead.release(time.monotonic() - started, dropped=response.status_code >= 500)
+        return response
+
+    async def _send_traced(
+        self, method: str, url: str, hedge: bool, timeout: float, kwargs: Dict[str, Any]
+    ) -> httpx.Response:
+        kwargs["timeout"] = httpx.Timeout(timeout, connect=settings.HTTP_CONNECT_TIMEOUT)
+        with tracer.span("http.client", service=self.name, method=method, url=url) as span:
+            if span is not None:
+                # Propagate the trace, and its sampling decision, downstream
+                kwargs["headers"] = {**kwargs.get("headers", {}), "traceparent": span.traceparent}
+            response = await self._send_timed(method, url, hedge, timeout, kwargs)
+            if span is not None:
+                span.set_attribute("status_code", response.status_code)
+        return response
+
+    async def _send_timed(
+        self, method: str, url: str, hedge: bool, timeout: float, kwargs: Dict[str, Any]
+    ) -> httpx.Response:
+        def send():
+            return self.client.request(method, url, **kwargs)
+
+        started = time.monotonic()
+        try:
+            if hedge and settings.HEDGED_READS_ENABLED and self.latency.ready:
+                response = await hedged(
+                    send, self.latency.percentile(settings.HEDGE_PERCENTILE), self._count_hedge
+                )
+            else:
+                response = await send()
+        except httpx.TimeoutException:
+            self.latency.record(timeout)
+            self._request_timer.observe(time.monotonic() - started)
+            self._responses["error"].inc()
+            self.breaker.record_failure()
+            raise
+        except httpx.RequestError:
+            self._responses["error"].inc()
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            self.breaker.release()
+            raise
+
+        elapsed = time.monotonic() - started
+        self.latency.record(elapsed)
+        self._request_timer.observe(elapsed)
+        self._count_response(response.status_code)
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    def _count_response(self, status_code: int) -> None:
+        counter = self._responses.get(status_code)
+        if counter is None:
+            counter = self._responses[status_code] = downstream_responses.labels(
+                self.name, str(status_code)
+            )
+        counter.inc()
+
+    def _count_hedge(self) -> None:
+        self.hedges += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.breaker.stats(),
+            "timeout": self.adaptive_timeout.current,
+            "latency_p50": self.latency.percentile(50),
+            "latency_p99": self.latency.percentile(99),
+            "hedges": self.hedges,
+            "bulkhead": self.bulkhead.stats(),
+        }
+
+    async def start(self) -> None:
+        """Open the pooled HTTP client."""
+        logger.info("Opening HTTP client for %s", self.base_url)
+        self.client
+
+    async def close(self) -> None:
+        """Close the pooled HTTP client and its connections."""
+        if self._client is not None:
+            logger.info("Closing HTTP client for %s", self.base_url)
+            await self._client.aclose()
+            self._client = None
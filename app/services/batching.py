@@ -0,0 +1,77 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class RequestBatcher:
+    """Coalesces concurrent requests into batches.
+
+    Callers ``submit`` one payload each and wait for their own result. The
+    first payload opens a window of ``window`` seconds; everything submitted
+    within it, up to ``max_size`` payloads, is sent with one call to
+    ``send``, which must return one result per payload in the same order.
+    If ``send`` raises, or returns a different number of results, every
+    caller in the batch gets an exception.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[List[Any]], Awaitable[List[Any]]],
+        window: float,
+        max_size: int,
+    ):
+        self.send = send
+        self.window = window
+        self.max_size = max_size
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._in_flight = set()
+
+    async def submit(self, payload: Any) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((payload, future))
+
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._send_batch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _send_batch(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        logger.debug("Sending batch of %s requests", len(batch))
+        try:
+            results = await self.send([payload for payload, _ in batch])
+        except Exception as e:
+            self._fail(batch, e)
+            return
+
+        if len(results) != len(batch):
+            # Results can no longer be matched to payloads by position
+            self._fail(batch, RuntimeError(
+                f"Batch of {len(batch)} requests got {len(results)} results"
+            ))
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    @staticmethod
+    def _fail(batch: List[Tuple[Any, asyncio.Future]], error: Exception) -> None:
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(error)
@@ -1,75 +1,162 @@
 import logging
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 import httpx
 from fastapi import HTTPException
 
 from app.config import settings
+from app.ids import idempotency_key
+from app.services.base import ServiceClient
+from app.services.batching import RequestBatcher
 
 logger = logging.getLogger(__name__)
 
 
-class InventoryService:
+class InventoryService(ServiceClient):
     """Client for interacting with the inventory service."""
 
     def __init__(self):
-        self.base_url = settings.INVENTORY_SERVICE_URL
+        super().__init__(
+            "inventory",
+            settings.INVENTORY_SERVICE_URL, timeout=settings.INVENTORY_SERVICE_TIMEOUT
+        )
+        self.batcher: Optional[RequestBatcher] = None
+        if settings.INVENTORY_BATCH_WINDOW_MS > 0:
+            self.batcher = RequestBatcher(
+                self.reserve_inventory_batch,
+                window=settings.INVENTORY_BATCH_WINDOW_MS / 1000,
+                max_size=settings.INVENTORY_BATCH_MAX_SIZE,
+            )
 
     async def reserve_inventory(self, order_id: str, items: List[Dict]) -> Dict:
-        """Reserve inventory items for an order."""
-        logger.info(f"Reserving inventory for order {order_id}")
-
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{self.base_url}/inventory/reserve",
-                    json={
-                        "order_id": order_id,
-                        "items": items,
-                    },
-                    timeout=10.0,
-                )
+        """Reserve inventory items for an order.
 
-                response.raise_for_status()
-                return response.json()
-            except httpx.HTTPStatusError as e:
-                logger.error(f"Inventory service error: {e.response.text}")
-                raise HTTPException(
-                    status_code=e.response.status_code,
-                    detail=f"Inventory service error: {e.response.text}",
-                )
-            except httpx.RequestError as e:
-                logger.error(f"Inventory request error: {str(e)}")
+        When batching is enabled, reservations arriving within the batch
+        window are sent together, but each caller still gets its own result.
+        """
+        logger.info("Reserving inventory for order %s", order_id)
+
+        if self.batcher is not None:
+            result = await self.batcher.submit({
+                "order_id": order_id,
+                "items": items,
+                "idempotency_key": idempotency_key(order_id, "inventory"),
+            })
+            if result["status_code"] >= 400:
+                logger.error("Inventory service error: %s", result["detail"])
                 raise HTTPException(
-                    status_code=500,
-                    detail=f"Inventory service unavailable: {str(e)}"
+                    status_code=result["status_code"],
+                    detail=f"Inventory service error: {result['detail']}",
                 )
+            return result["reservation"]
+
+        try:
+            response = await self.request(
+                "POST",
+                "/inventory/reserve",
+                json={
+                    "order_id": order_id,
+                    "items": items,
+                },
+                idempotency_key=idempotency_key(order_id, "inventory"),
+            )
+
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPStatusError as e:
+            logger.error("Inventory service error: %s", e.response.text)
+            raise HTTPException(
+                status_code=e.response.status_code,
+                detail=f"Inventory service error: {e.response.text}",
+            )
+        except httpx.RequestError as e:
+            logger.error("Inventory request error: %s", e)
+            raise HTTPException(
+                status_code=500,
+                detail=f"Inventory service unavailable: {str(e)}"
+            )
+
+    async def reserve_inventory_batch(self, reservations: List[Dict]) -> List[Dict]:
+        """Reserve inventory for several orders with one request.
+
+        Returns one result per reservation, in order, with its ``status_code``
+        and either the ``reservation`` or the error ``detail``.
+        """
+        logger.info("Reserving inventory for %s orders", len(reservations))
+
+        try:
+            response = await self.request(
+                "POST",
+                "/inventory/reserve/batch",
+                json={"reservations": reservations},
+            )
+
+            response.raise_for_status()
+            return response.json()["results"]
+        except httpx.HTTPStatusError as e:
+            logger.error("Inventory batch error: %s", e.response.text)
+            raise HTTPException(
+                status_code=e.response.status_code,
+                detail=f"Inventory service error: {e.response.text}",
+            )
+        except httpx.RequestError as e:
+            logger.error("Inventory batch request error: %s", e)
+            raise HTTPException(
+                status_code=500,
+                detail=f"Inventory service unavailable: {str(e)}"
+            )
 
     async def release_inventory(self, reservation_id: str) -> Dict:
         """Release reserved inventory."""
-        logger.info(f"Releasing inventory reservation {reservation_id}")
+        logger.info("Releasing inventory reservation %s", reservation_id)
 
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{self.base_url}/inventory/release/{reservation_id}",
-                    timeout=10.0,
-                )
+        try:
+            response = await self.request(
+                "POST",
+                f"/inventory/release/{reservation_id}",
+                guarded=False,
+                idempotency_key=idempotency_key(reservation_id, "release"),
+            )
 
-                response.raise_for_status()
-                return response.json()
-            except httpx.HTTPStatusError as e:
-                logger.error(f"Inventory release error: {e.response.text}")
-                raise HTTPException(
-                    status_code=e.response.status_code,
-                    detail=f"Inventory release error: {e.response.text}",
-                )
-            except httpx.RequestError as e:
-                logger.error(f"Inventory release request error: {str(e)}")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Inventory service unavailable during release: {str(e)}"
-                )
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPStatusError as e:
+            logger.error("Inventory release error: %s", e.response.text)
+            raise HTTPException(
+                status_code=e.response.status_code,
+                detail=f"Inventory release error: {e.response.text}",
+            )
+        except httpx.RequestError as e:
+            logger.error("Inventory release request error: %s", e)
+            raise HTTPException(
+                status_code=500,
+                detail=f"Inventory service unavailable during release: {str(e)}"
+            )
+
+    async def get_inventory(self, product_id: str) -> Dict:
+        """Get the stock of a product from the inventory service.
+
+        The read is idempotent, so a slow request is hedged.
+        """
+        logger.info("Fetching inventory for product %s", product_id)
+
+        try:
+            response = await self.request("GET", f"/inventory/{product_id}", hedge=True)
+
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPStatusError as e:
+            logger.error("Inventory lookup error: %s", e.response.text)
+            raise HTTPException(
+                status_code=e.response.status_code,
+                detail=f"Inventory lookup error: {e.response.text}",
+            )
+        except httpx.RequestError as e:
+            logger.error("Inventory lookup request error: %s", e)
+            raise HTTPException(
+                status_code=500,
+                detail=f"Inventory service unavailable: {str(e)}"
+            )
 
 
 inventory_service = InventoryService()
@@ -5,73 +5,104 @@ import httpx
 from fastapi import HTTPException
 
 from app.config import settings
+from app.ids import idempotency_key
+from app.services.base import ServiceClient
 
 logger = logging.getLogger(__name__)
 
 
-class PaymentService:
+class PaymentService(ServiceClient):
     """Client for interacting with the payment service."""
 
     def __init__(self):
-        self.base_url = settings.PAYMENT_SERVICE_URL
+        super().__init__(
+            "payment",
+            settings.PAYMENT_SERVICE_URL, timeout=settings.PAYMENT_SERVICE_TIMEOUT
+        )
 
     async def process_payment(
         self, order_id: str, amount: float, payment_method: str
     ) -> Dict:
         """Process a payment through the payment service."""
-        logger.info(f"Processing payment for order {order_id}: ${amount}")
-
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{self.base_url}/payments",
-                    json={
-                        "order_id": order_id,
-                        "amount": amount,
-                        "payment_method": payment_method,
-                    },
-                    timeout=10.0,
-                )
-
-                response.raise_for_status()
-                return response.json()
-            except httpx.HTTPStatusError as e:
-                logger.error(f"Payment service error: {e.response.text}")
-                raise HTTPException(
-                    status_code=e.response.status_code,
-                    detail=f"Payment service error: {e.response.text}",
-                )
-            except httpx.RequestError as e:
-                logger.error(f"Payment request error: {str(e)}")
-                raise HTTPException(
-                    status_code=500, detail=f"Payment service unavailable: {str(e)}"
-                )
+        logger.info("Processing payment for order %s: $%s", order_id, amount)
+
+        try:
+            response = await self.request(
+                "POST",
+                "/payments",
+                json={
+                    "order_id": order_id,
+                    "amount": amount,
+                    "payment_method": payment_method,
+                },
+                idempotency_key=idempotency_key(order_id, "payment"),
+            )
+
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPStatusError as e:
+            logger.error("Payment service error: %s", e.response.text)
+            raise HTTPException(
+                status_code=e.response.status_code,
+                detail=f"Payment service error: {e.response.text}",
+            )
+        except httpx.RequestError as e:
+            logger.error("Payment request error: %s", e)
+            raise HTTPException(
+                status_code=500, detail=f"Payment service unavailable: {str(e)}"
+            )
 
     async def refund_payment(self, payment_id: str) -> Dict:
         """Refund a payment through the payment service."""
-        logger.info(f"Refunding payment {payment_id}")
-
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{self.base_url}/payments/{payment_id}/refund",
-                    timeout=10.0,
-                )
-
-                response.raise_for_status()
-                return response.json()
-            except httpx.HTTPStatusError as e:
-                logger.error(f"Payment refund error: {e.response.text}")
-                raise HTTPException(
-                    status_code=e.response.status_code,
-                    detail=f"Payment refund error: {e.response.text}",
-                )
-            except httpx.RequestError as e:
-                logger.error(f"Payment refund request error: {str(e)}")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Payment service unavailable during refund: {str(e)}"
-                )
+        logger.info("Refunding payment %s", payment_id)
+
+        try:
+            response = await self.request(
+                "POST",
+                f"/payments/{payment_id}/refund",
+                guarded=False,
+                idempotency_key=idempotency_key(payment_id, "refund"),
+            )
+
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPStatusError as e:
+            logger.error("Payment refund error: %s", e.response.text)
+            raise HTTPException(
+                status_code=e.response.status_code,
+                detail=f"Payment refund error: {e.response.text}",
+            )
+        except httpx.RequestError as e:
+            logger.error("Payment refund request error: %s", e)
+            raise HTTPException(
+                status_code=500,
+                detail=f"Payment service unavailable during refund: {str(e)}"
+            )
+
+    async def get_payment(self, payment_id: str) -> Dict:
+        """Get a payment from the payment service.
+
+        The read is idempotent, so a slow request is hedged.
+        """
+        logger.info("Fetching payment %s", payment_id)
+
+        try:
+            response = await self.request("GET", f"/payments/{payment_id}", hedge=True)
+
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPStatusError as e:
+            logger.error("Payment lookup error: %s", e.response.text)
+            raise HTTPException(
+                status_code=e.response.status_code,
+                detail=f"Payment lookup error: {e.response.text}",
+            )
+        except httpx.RequestError as e:
+            logger.error("Payment lookup request error: %s", e)
+            raise HTTPException(
+                status_code=500,
+                detail=f"Payment service unavailable: {str(e)}"
+            )
 
 
 payment_service = PaymentService()
@@ -0,0 +1,365 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, TypeVar
+
+import httpx
+
+from app.metrics import concurrency_limit, requests_shed
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(httpx.RequestError):
+    """Raised instead of calling a downstream service whose circuit is open.
+
+    It is a ``RequestError`` so the service clients report it like any
+    other unreachable service, without waiting for a timeout.
+    """
+
+
+class CircuitBreaker:
+    """Fail fast on a downstream service that keeps failing.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls are rejected for ``recovery_timeout`` seconds. Then one probe call
+    is let through (half-open): its success closes the circuit, its failure
+    opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, recovery_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def before_call(self) -> None:
+        """Raise ``CircuitOpenError`` unless a call may go through now."""
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.recovery_timeout:
+                self.rejected += 1
+                raise CircuitOpenError(f"Circuit open for {self.name} service")
+            self.state = self.HALF_OPEN
+            logger.info("Circuit for %s service half-open, probing", self.name)
+
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                self.rejected += 1
+                raise CircuitOpenError(f"Circuit half-open for {self.name} service")
+            self._probing = True
+
+    def record_success(self) -> None:
+        if self.state != self.CLOSED:
+            logger.info("Circuit for %s service closed", self.name)
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or (
+            self.state == self.CLOSED and self.failures >= self.failure_threshold
+        ):
+            self.state = self.OPEN
+            self.trips += 1
+            self._opened_at = time.monotonic()
+            logger.warning(
+                "Circuit for %s service opened after %s failures", self.name, self.failures
+            )
+
+    def release(self) -> None:
+        """Give up the probe slot of a call that ended without an outcome."""
+        self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
+
+
+class LatencyTracker:
+    """Latency percentiles over the most recent ``window`` calls."""
+
+    def __init__(self, window: int, min_samples: int):
+        self.samples: deque = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    @property
+    def ready(self) -> bool:
+        return len(self.samples) >= self.min_samples
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+class AdaptiveTimeout:
+    """Request timeout derived from observed latency.
+
+    Until enough samples are collected the configured ``ceiling`` is used.
+    Then the timeout is ``multiplier`` times the ``percentile`` latency,
+    kept between ``floor`` and ``ceiling``, so a slow downstream is given
+    up on long before the hard limit when it is usually fast.
+    """
+
+    def __init__(
+        self,
+        latency: LatencyTracker,
+        ceiling: float,
+        floor: float,
+        percentile: float,
+        multiplier: float,
+        enabled: bool = True,
+    ):
+        self.latency = latency
+        self.ceiling = ceiling
+        self.floor = floor
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.enabled = enabled
+
+    @property
+    def current(self) -> float:
+        if not self.enabled or not self.latency.ready:
+            return self.ceiling
+        observed = self.latency.percentile(self.percentile) * self.multiplier
+        return min(self.ceiling, max(self.floor, observed))
+
+
+async def hedged(
+    send: Callable[[], Awaitable[T]],
+    delay: float,
+    on_hedge: Optional[Callable[[], None]] = None,
+) -> T:
+    """Run ``send`` and, if it has not finished after ``delay`` seconds,
+    run it a second time; return whichever attempt succeeds first.
+
+    Only for idempotent requests. The losing attempt is cancelled.
+    """
+    first = asyncio.ensure_future(send())
+    done, _ = await asyncio.wait({first}, timeout=delay)
+    if done:
+        return first.result()
+
+    if on_hedge is not None:
+        on_hedge()
+    pending = {first, asyncio.ensure_future(send())}
+    error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+class Overloaded(Exception):
+    """Raised by ``AdaptiveLimiter`` when a caller is shed."""
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"{name} is over its concurrency limit")
+        self.retry_after = retry_after
+
+
+class BulkheadFullError(Overloaded):
+    """Raised instead of calling a downstream service that is at its concurrency limit.
+
+    Unlike a transport error it is not turned into a failed call by the
+    service clients: it reaches the saga, which gives the order back
+    instead of failing it when no step has taken effect yet, and the caller
+    is shed with ``503``.
+    """
+
+    def __init__(self, name: str, retry_after: int):
+        Exception.__init__(self, f"Too many concurrent calls to {name} service")
+        self.retry_after = retry_after
+
+
+class AIMDLimit:
+    """Concurrency limit adapted with additive increase, multiplicative decrease.
+
+    Each call that finishes within ``latency_target`` while the limit is at
+    least half used raises the limit by one. A call that was slower or was
+    dropped (timed out, failed to connect) multiplies it by ``backoff``, at
+    most once per ``latency_target`` seconds, so a burst of slow calls that
+    were all started under the old limit only counts once.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        min_limit: int,
+        max_limit: int,
+        latency_target: float,
+        backoff: float,
+    ):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self._decreased_at = 0.0
+
+    @property
+    def current(self) -> int:
+        return int(self.limit)
+
+    def record(self, latency: float, in_flight: int, dropped: bool = False) -> None:
+        """Adjust the limit after a call that took ``latency`` seconds."""
+        if dropped or latency > self.latency_target:
+            now = time.monotonic()
+            if now - self._decreased_at >= self.latency_target:
+                self._decreased_at = now
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+        elif in_flight * 2 >= self.limit:
+            self.limit = min(self.max_limit, self.limit + 1)
+
+
+class AdaptiveLimiter:
+    """Caps concurrent calls at an ``AIMDLimit``, with a bounded wait queue.
+
+    Over the limit, a caller waits in FIFO order for up to ``queue_timeout``
+    seconds; if ``queue_size`` callers are already waiting, or the wait
+    times out, it is shed with ``Overloaded`` right away instead of adding
+    to the load. Callers that must not be shed pass ``block=True``: they
+    wait for as long as it takes and do not count against the queue size.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        limit: AIMDLimit,
+        queue_size: int,
+        queue_timeout: float,
+        enabled: bool = True,
+    ):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.enabled = enabled
+        self.in_flight = 0
+        self.shed = 0
+        self._waiters: deque = deque()
+        self._queued = 0
+        self._latency = 0.0
+        self._limit_gauge = concurrency_limit.labels(name)
+        self._limit_gauge.set(limit.current)
+        self._shed_counter = requests_shed.labels(name)
+
+    @property
+    def retry_after(self) -> int:
+        """Seconds after which a shed caller may try again: about one call's latency."""
+        return max(1, math.ceil(self._latency))
+
+    async def acquire(self, block: bool = False) -> None:
+        if not self.enabled:
+            return
+        if self.in_flight < self.limit.current and not self._waiters:
+            self.in_flight += 1
+            return
+        if not block and self._queued >= self.queue_size:
+            self._shed()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        if not block:
+            self._queued += 1
+        try:
+            await asyncio.wait({waiter}, timeout=None if block else self.queue_timeout)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        finally:
+            if not block:
+                self._queued -= 1
+        if not waiter.done():
+            self._abandon(waiter)
+            self._shed()
+
+    def release(self, latency: Optional[float] = None, dropped: bool = False) -> None:
+        """Free a slot; ``latency`` (None for a cancelled call) adapts the limit."""
+        if not self.enabled:
+            return
+        if latency is not None:
+            self._latency += 0.1 * (latency - self._latency)
+            self.limit.record(latency, self.in_flight, dropped)
+            self._limit_gauge.set(self.limit.current)
+        self.in_flight -= 1
+        self._wake()
+
+    @asynccontextmanager
+    async def admit(self, block: bool = False) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block; its run time adapts the limit."""
+        await self.acquire(block)
+        started = time.monotonic()
+        try:
+            yield
+        except Exception:
+            self.release(time.monotonic() - started)
+            raise
+        except BaseException:
+            self.release()
+            raise
+        self.release(time.monotonic() - started)
+
+    def _wake(self) -> None:
+        # The slot is handed over directly: in_flight is incremented for the waiter
+        while self._waiters and self.in_flight < self.limit.current:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self.in_flight += 1
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        if waiter.done() and not waiter.cancelled():
+            # Granted a slot just as the wait ended; pass it on
+            self.in_flight -= 1
+            self._wake()
+        else:
+            waiter.cancel()
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+
+    def _shed(self) -> None:
+        self.shed += 1
+        self._shed_counter.inc()
+        raise Overloaded(self.name, self.retry_after)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit.current,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "shed": self.shed,
+        }
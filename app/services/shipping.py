@@ -5,74 +5,105 @@ import httpx
 from fastapi import HTTPException
 
 from app.config import settings
+from app.ids import idempotency_key
+from app.services.base import ServiceClient
 
 logger = logging.getLogger(__name__)
 
 
-class ShippingService:
+class ShippingService(ServiceClient):
     """Client for interacting with the shipping service."""
 
     def __init__(self):
-        self.base_url = settings.SHIPPING_SERVICE_URL
+        super().__init__(
+            "shipping",
+            settings.SHIPPING_SERVICE_URL, timeout=settings.SHIPPING_SERVICE_TIMEOUT
+        )
 
     async def create_shipment(
         self, order_id: str, items: Dict, address: Dict
     ) -> Dict:
         """Create a shipment for an order."""
-        logger.info(f"Creating shipment for order {order_id}")
-
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{self.base_url}/shipments",
-                    json={
-                        "order_id": order_id,
-                        "items": items,
-                        "address": address,
-                    },
-                    timeout=10.0,
-                )
-
-                response.raise_for_status()
-                return response.json()
-            except httpx.HTTPStatusError as e:
-                logger.error(f"Shipping service error: {e.response.text}")
-                raise HTTPException(
-                    status_code=e.response.status_code,
-                    detail=f"Shipping service error: {e.response.text}",
-                )
-            except httpx.RequestError as e:
-                logger.error(f"Shipping request error: {str(e)}")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Shipping service unavailable: {str(e)}"
-                )
+        logger.info("Creating shipment for order %s", order_id)
+
+        try:
+            response = await self.request(
+                "POST",
+                "/shipments",
+                json={
+                    "order_id": order_id,
+                    "items": items,
+                    "address": address,
+                },
+                idempotency_key=idempotency_key(order_id, "shipping"),
+            )
+
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPStatusError as e:
+            logger.error("Shipping service error: %s", e.response.text)
+            raise HTTPException(
+                status_code=e.response.status_code,
+                detail=f"Shipping service error: {e.response.text}",
+            )
+        except httpx.RequestError as e:
+            logger.error("Shipping request error: %s", e)
+            raise HTTPException(
+                status_code=500,
+                detail=f"Shipping service unavailable: {str(e)}"
+            )
 
     async def cancel_shipment(self, shipment_id: str) -> Dict:
         """Cancel a shipment."""
-        logger.info(f"Cancelling shipment {shipment_id}")
-
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{self.base_url}/shipments/{shipment_id}/cancel",
-                    timeout=10.0,
-                )
-
-                response.raise_for_status()
-                return response.json()
-            except httpx.HTTPStatusError as e:
-                logger.error(f"Shipping cancellation error: {e.response.text}")
-                raise HTTPException(
-                    status_code=e.response.status_code,
-                    detail=f"Shipping cancellation error: {e.response.text}",
-                )
-            except httpx.RequestError as e:
-                logger.error(f"Shipping cancellation request error: {str(e)}")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Shipping service unavailable during cancellation: {str(e)}"
-                )
+        logger.info("Cancelling shipment %s", shipment_id)
+
+        try:
+            response = await self.request(
+                "POST",
+                f"/shipments/{shipment_id}/cancel",
+                guarded=False,
+                idempotency_key=idempotency_key(shipment_id, "cancel"),
+            )
+
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPStatusError as e:
+            logger.error("Shipping cancellation error: %s", e.response.text)
+            raise HTTPException(
+                status_code=e.response.status_code,
+                detail=f"Shipping cancellation error: {e.response.text}",
+            )
+        except httpx.RequestError as e:
+            logger.error("Shipping cancellation request error: %s", e)
+            raise HTTPException(
+                status_code=500,
+                detail=f"Shipping service unavailable during cancellation: {str(e)}"
+            )
+
+    async def get_shipment(self, shipment_id: str) -> Dict:
+        """Get a shipment from the shipping service.
+
+        The read is idempotent, so a slow request is hedged.
+        """
+        logger.info("Fetching shipment %s", shipment_id)
+
+        try:
+            response = await self.request("GET", f"/shipments/{shipment_id}", hedge=True)
+
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPStatusError as e:
+            logger.error("Shipment lookup error: %s", e.response.text)
+            raise HTTPException(
+                status_code=e.response.status_code,
+                detail=f"Shipment lookup error: {e.response.text}",
+            )
+        except httpx.RequestError as e:
+            logger.error("Shipment lookup request error: %s", e)
+            raise HTTPException(
+                status_code=500,
+                detail=f"Shipping service unavailable: {str(e)}"
+            )
 
 
 shipping_service = ShippingService()
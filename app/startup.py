@@ -0,0 +1,104 @@
+"""Startup sequence run by the application lifespan.
+
+Work that the first requests would otherwise pay for lazily is done here:
+the schema check (only with ``DB_CREATE_ALL``), SQLAlchemy mapper
+configuration, the OpenAPI schema and response models, pooled connections
+to the database and its replicas, and a connection to each downstream
+service. Each phase is timed, logged and exported as
+``startup_duration_seconds``.
+"""
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Sequence
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import configure_mappers
+
+from app.config import settings
+from app.database import Base
+from app.metrics import startup_duration_seconds
+from app.services.base import ServiceClient
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """Durations of the startup phases, in seconds."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - started
+            startup_duration_seconds.labels(name).set(self.phases[name])
+
+    def finish(self) -> float:
+        total = time.perf_counter() - self.started
+        startup_duration_seconds.labels("total").set(total)
+        logger.info(
+            "Startup completed in %.3fs (%s)",
+            total,
+            ", ".join(f"{name} {seconds:.3f}s" for name, seconds in self.phases.items()),
+        )
+        return total
+
+
+async def warm_database(engine: AsyncEngine, connections: int) -> None:
+    """Open ``connections`` pooled connections at once and return them to the pool."""
+
+    async def check():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(check() for _ in range(connections)))
+
+
+async def warm_service(service: ServiceClient) -> None:
+    """Resolve and connect to a downstream service ahead of the first saga.
+
+    Goes straight to the HTTP client, so the call is not counted in the
+    service's latency statistics or circuit breaker. A service that is not
+    up yet is only logged.
+    """
+    try:
+        await service.client.get("/health", timeout=settings.HTTP_CONNECT_TIMEOUT)
+    except httpx.HTTPError as e:
+        logger.warning("Could not warm up connection to %s service: %r", service.name, e)
+
+
+async def start_up(
+    app: FastAPI,
+    engine: AsyncEngine,
+    services: Sequence[ServiceClient],
+    replicas: Sequence[AsyncEngine] = (),
+) -> StartupTimer:
+    timer = StartupTimer()
+    if settings.DB_CREATE_ALL:
+        with timer.phase("schema"):
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+
+    if settings.STARTUP_WARMUP:
+        with timer.phase("mappers"):
+            configure_mappers()
+        with timer.phase("openapi"):
+            # Builds the OpenAPI document and the schemas of all request and response models
+            app.openapi()
+        with timer.phase("connections"):
+            await asyncio.gather(
+                warm_database(engine, settings.DB_WARMUP_CONNECTIONS),
+                *(warm_database(replica, settings.DB_WARMUP_CONNECTIONS) for replica in replicas),
+                *(warm_service(service) for service in services),
+            )
+    return timer
@@ -1,10 +1,16 @@
 import abc
 import logging
-from typing import Any, Dict, Optional
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
 
+from app.events import step_status_event
+from app.ids import new_id
+from app.metrics import step_timers
 from app.models import Order, OrderStep, StepStatus
+from app.unit_of_work import SagaUnitOfWork
 
 logger = logging.getLogger(__name__)
 
@@ -12,40 +18,75 @@ logger = logging.getLogger(__name__)
 class Step(abc.ABC):
     """Base class for all steps in the saga."""
 
-    def __init__(self, db: Session, step_name: str):
+    # Names of the steps that must complete before this one can run. Steps
+    # without a dependency path between them are executed concurrently.
+    depends_on: Tuple[str, ...] = ()
+
+    # Context key that holds this step's external reference (e.g. payment_id),
+    # used to rebuild the saga context from the persisted step records
+    reference_key: Optional[str] = None
+
+    def __init__(self, db: AsyncSession, step_name: str):
         self.db = db
         self.step_name = step_name
+        self.timers = step_timers(step_name)
         self.order_step = None
+        self.uow: Optional[SagaUnitOfWork] = None
 
-    def register_step(self, order: Order, execution_order: int) -> OrderStep:
-        """Register this step with the order."""
-        order_step = OrderStep(
-            order_id=order.id,
-            step_name=self.step_name,
-            execution_order=execution_order,
-            status=StepStatus.PENDING,
-        )
-        self.db.add(order_step)
-        self.db.commit()
-        self.db.refresh(order_step)
+    def register_step(self, uow: SagaUnitOfWork, order: Order, execution_order: int) -> OrderStep:
+        """Register this step with the order.
+
+        The step record is buffered in ``uow`` and inserted at its next flush.
+        """
+        values = {
+            "id": new_id(),
+            "order_id": order.id,
+            "step_name": self.step_name,
+            "execution_order": execution_order,
+            "status": StepStatus.PENDING,
+        }
+        uow.add(OrderStep, **values)
+        self.uow = uow
+        self.order_step = OrderStep(**values)
+        return self.order_step
+
+    def attach_step(self, uow: SagaUnitOfWork, order_step: OrderStep) -> OrderStep:
+        """Attach this step to a step record persisted by an earlier run."""
+        self.uow = uow
         self.order_step = order_step
         return order_step
 
-    def update_step_status(
+    def restore(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Put the reference of a completed step back into the saga context."""
+        if (
+            self.reference_key
+            and self.order_step.status == StepStatus.COMPLETED
+            and self.order_step.reference_id
+        ):
+            context[self.reference_key] = self.order_step.reference_id
+        return context
+
+    async def update_step_status(
         self, status: StepStatus, reference_id: Optional[str] = None, error_message: Optional[str] = None
     ) -> OrderStep:
-        """Update the status of this step."""
+        """Update the status of this step.
+
+        The change is buffered and written at the saga's next durability
+        point, after which it is published to the order's subscribers.
+        """
         if not self.order_step:
             raise ValueError("Step not registered")
 
-        self.order_step.status = status
+        changes = {"status": status, "updated_at": datetime.utcnow()}
         if reference_id:
-            self.order_step.reference_id = reference_id
+            changes["reference_id"] = reference_id
         if error_message:
-            self.order_step.error_message = error_message
+            changes["error_message"] = error_message
 
-        self.db.commit()
-        self.db.refresh(self.order_step)
+        for field, value in changes.items():
+            set_committed_value(self.order_step, field, value)
+        self.uow.update(OrderStep, self.order_step.id, **changes)
+        self.uow.publish(step_status_event(self.order_step.order_id, self.step_name, changes))
         return self.order_step
 
     @abc.abstractmethod
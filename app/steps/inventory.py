@@ -1,7 +1,7 @@
 import logging
 from typing import Any, Dict, List
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import OrderItem, StepStatus
 from app.services.inventory import inventory_service
@@ -13,7 +13,10 @@ logger = logging.getLogger(__name__)
 class InventoryStep(Step):
     """Step to reserve inventory."""
 
-    def __init__(self, db: Session):
+    depends_on = ("payment",)
+    reference_key = "reservation_id"
+
+    def __init__(self, db: AsyncSession):
         super().__init__(db, step_name="inventory")
 
     async def execute(self, context: Dict[str, Any]) -> Dict[str, Any]:
@@ -21,7 +24,7 @@ class InventoryStep(Step):
         order_id = context["order_id"]
         items = context["items"]
 
-        logger.info(f"Executing inventory step for order {order_id}")
+        logger.info("Executing inventory step for order %s", order_id)
 
         try:
             # Call inventory service
@@ -30,7 +33,7 @@ class InventoryStep(Step):
             )
 
             # Update step status
-            self.update_step_status(
+            await self.update_step_status(
                 StepStatus.COMPLETED,
                 reference_id=inventory_result["reservation_id"]
             )
@@ -42,10 +45,10 @@ class InventoryStep(Step):
 
         except Exception as e:
             error_message = str(e)
-            logger.error(f"Inventory step failed: {error_message}")
+            logger.error("Inventory step failed: %s", error_message)
 
             # Update step status to failed
-            self.update_step_status(
+            await self.update_step_status(
                 StepStatus.FAILED,
                 error_message=error_message
             )
@@ -59,14 +62,14 @@ class InventoryStep(Step):
             logger.warning("No inventory reservation to release")
             return context
 
-        logger.info(f"Compensating inventory step for reservation {reservation_id}")
+        logger.info("Compensating inventory step for reservation %s", reservation_id)
 
         try:
             # Call inventory service to release
             release_result = await inventory_service.release_inventory(reservation_id)
 
             # Update step status
-            self.update_step_status(
+            await self.update_step_status(
                 StepStatus.COMPENSATED,
                 reference_id=reservation_id
             )
@@ -78,10 +81,10 @@ class InventoryStep(Step):
 
         except Exception as e:
             error_message = str(e)
-            logger.error(f"Inventory compensation failed: {error_message}")
+            logger.error("Inventory compensation failed: %s", error_message)
 
             # Even if compensation fails, we still mark it as attempted
-            self.update_step_status(
+            await self.update_step_status(
                 StepStatus.FAILED,
                 error_message=f"Compensation failed: {error_message}"
             )
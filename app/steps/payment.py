@@ -1,7 +1,7 @@
 import logging
 from typing import Any, Dict
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import Order, PaymentInfo, StepStatus
 from app.services.payment import payment_service
@@ -13,7 +13,9 @@ logger = logging.getLogger(__name__)
 class PaymentStep(Step):
     """Step to process payment."""
 
-    def __init__(self, db: Session):
+    reference_key = "payment_id"
+
+    def __init__(self, db: AsyncSession):
         super().__init__(db, step_name="payment")
 
     async def execute(self, context: Dict[str, Any]) -> Dict[str, Any]:
@@ -22,7 +24,7 @@ class PaymentStep(Step):
         amount = context["total_amount"]
         payment_method = context["payment_method"]
 
-        logger.info(f"Executing payment step for order {order_id}")
+        logger.info("Executing payment step for order %s", order_id)
 
         try:
             # Call payment service
@@ -31,16 +33,16 @@ class PaymentStep(Step):
             )
 
             # Update order with payment info
-            payment_info = PaymentInfo(
-                order_id=order_id,
-                payment_method=payment_method,
+            self.uow.update(
+                PaymentInfo,
+                order_id,
+                key_column="order_id",
                 payment_id=payment_result["payment_id"],
                 transaction_id=payment_result["transaction_id"],
             )
-            self.db.add(payment_info)
 
             # Update step status
-            self.update_step_status(
+            await self.update_step_status(
                 StepStatus.COMPLETED,
                 reference_id=payment_result["payment_id"]
             )
@@ -49,15 +51,14 @@ class PaymentStep(Step):
             context["payment_id"] = payment_result["payment_id"]
             context["transaction_id"] = payment_result["transaction_id"]
 
-            self.db.commit()
             return context
 
         except Exception as e:
             error_message = str(e)
-            logger.error(f"Payment step failed: {error_message}")
+            logger.error("Payment step failed: %s", error_message)
 
             # Update step status to failed
-            self.update_step_status(
+            await self.update_step_status(
                 StepStatus.FAILED,
                 error_message=error_message
             )
@@ -71,14 +72,14 @@ class PaymentStep(Step):
             logger.warning("No payment to refund")
             return context
 
-        logger.info(f"Compensating payment step for payment {payment_id}")
+        logger.info("Compensating payment step for payment %s", payment_id)
 
         try:
             # Call payment service for refund
             refund_result = await payment_service.refund_payment(payment_id)
 
             # Update step status
-            self.update_step_status(
+            await self.update_step_status(
                 StepStatus.COMPENSATED,
                 reference_id=refund_result.get("refund_id")
             )
@@ -91,10 +92,10 @@ class PaymentStep(Step):
 
         except Exception as e:
             error_message = str(e)
-            logger.error(f"Payment compensation failed: {error_message}")
+            logger.error("Payment compensation failed: %s", error_message)
 
             # Even if compensation fails, we still mark it as attempted
-            self.update_step_status(
+            await self.update_step_status(
                 StepStatus.FAILED,
                 error_message=f"Compensation failed: {error_message}"
             )
@@ -1,7 +1,7 @@
 import logging
 from typing import Any, Dict
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import StepStatus
 from app.services.shipping import shipping_service
@@ -13,7 +13,10 @@ logger = logging.getLogger(__name__)
 class ShippingStep(Step):
     """Step to process shipping."""
 
-    def __init__(self, db: Session):
+    depends_on = ("payment",)
+    reference_key = "shipment_id"
+
+    def __init__(self, db: AsyncSession):
         super().__init__(db, step_name="shipping")
 
     async def execute(self, context: Dict[str, Any]) -> Dict[str, Any]:
@@ -22,7 +25,7 @@ class ShippingStep(Step):
         items = context["items"]
         shipping_address = context["shipping_address"]
 
-        logger.info(f"Executing shipping step for order {order_id}")
+        logger.info("Executing shipping step for order %s", order_id)
 
         try:
             # Call shipping service
@@ -31,7 +34,7 @@ class ShippingStep(Step):
             )
 
             # Update step status
-            self.update_step_status(
+            await self.update_step_status(
                 StepStatus.COMPLETED,
                 reference_id=shipping_result["shipment_id"]
             )
@@ -44,10 +47,10 @@ class ShippingStep(Step):
 
         except Exception as e:
             error_message = str(e)
-            logger.error(f"Shipping step failed: {error_message}")
+            logger.error("Shipping step failed: %s", error_message)
 
             # Update step status to failed
-            self.update_step_status(
+            await self.update_step_status(
                 StepStatus.FAILED,
                 error_message=error_message
             )
@@ -61,14 +64,14 @@ class ShippingStep(Step):
             logger.warning("No shipment to cancel")
             return context
 
-        logger.info(f"Compensating shipping step for shipment {shipment_id}")
+        logger.info("Compensating shipping step for shipment %s", shipment_id)
 
         try:
             # Call shipping service to cancel
             cancel_result = await shipping_service.cancel_shipment(shipment_id)
 
             # Update step status
-            self.update_step_status(
+            await self.update_step_status(
                 StepStatus.COMPENSATED,
                 reference_id=shipment_id
             )
@@ -80,10 +83,10 @@ class ShippingStep(Step):
 
         except Exception as e:
             error_message = str(e)
-            logger.error(f"Shipping compensation failed: {error_message}")
+            logger.error("Shipping compensation failed: %s", error_message)
 
             # Even if compensation fails, we still mark it as attempted
-            self.update_step_status(
+            await self.update_step_status(
                 StepStatus.FAILED,
                 error_message=f"Compensation failed: {error_message}"
             )
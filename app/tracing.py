@@ -0,0 +1,279 @@
+"""Tracing of checkouts across the saga, its steps, DB flushes and service calls.
+
+The active span is kept in a ``contextvars.ContextVar``, so spans opened in
+a task nest under the span that was active when the task was created.
+Traces are sampled at their root (head-based sampling); the decision is
+inherited by every child span and passed on to downstream services in the
+W3C ``traceparent`` header. Finished spans of sampled traces are queued and
+written in batches by ``BatchSpanExporter``.
+"""
+import abc
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class Span:
+    __slots__ = (
+        "trace_id", "span_id", "parent_id", "name", "sampled",
+        "start_ns", "end_ns", "attributes", "status", "error",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str],
+        sampled: bool,
+        attributes: Dict[str, Any],
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status = "ok"
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        record = {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time_ns": self.start_ns,
+            "duration_ms": (self.end_ns - self.start_ns) / 1e6,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+        if self.error is not None:
+            record["error"] = self.error
+        return record
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """Return ``(trace_id, parent_id, sampled)`` from a ``traceparent`` header."""
+    match = TRACEPARENT_PATTERN.match(header.strip().lower()) if header else None
+    if not match:
+        return None
+    trace_id, parent_id, flags = match.groups()
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+
+class SpanSink(abc.ABC):
+    """Destination of exported spans."""
+
+    @abc.abstractmethod
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        """Write a batch of span records; called from a worker thread."""
+        pass
+
+
+class NDJSONFileSink(SpanSink):
+    """Appends spans to a file, one JSON object per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        lines = "".join(json.dumps(record, default=str) + "\n" for record in records)
+        with open(self.path, "a") as f:
+            f.write(lines)
+
+
+class BatchSpanExporter:
+    """Queues finished spans and writes them to a sink in batches.
+
+    A batch is written every ``flush_interval`` seconds, or as soon as
+    ``batch_size`` spans are waiting. Writes happen in a worker thread, off
+    the event loop. When more than ``max_queue_size`` spans are waiting,
+    new spans are dropped and counted rather than held in memory.
+    """
+
+    def __init__(self, sink: SpanSink, batch_size: int, flush_interval: float, max_queue_size: int):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        self.queue: deque = deque()
+        self.exported = 0
+        self.dropped = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def export(self, span: Span) -> None:
+        if len(self.queue) >= self.max_queue_size:
+            self.dropped += 1
+            return
+        self.queue.append(span)
+        if len(self.queue) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Write all queued spans."""
+        while self.queue:
+            batch = [
+                self.queue.popleft().to_dict()
+                for _ in range(min(self.batch_size, len(self.queue)))
+            ]
+            try:
+                await asyncio.to_thread(self.sink.write, batch)
+                self.exported += len(batch)
+            except Exception as e:
+                self.dropped += len(batch)
+                logger.error("Error exporting %s spans: %s", len(batch), e)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+class Tracer:
+    """Opens spans and hands sampled ones to the exporter."""
+
+    def __init__(self, exporter: BatchSpanExporter, sample_rate: float, enabled: bool):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.enabled = enabled
+
+    @contextmanager
+    def span(
+        self, name: str, traceparent: Optional[str] = None, **attributes: Any
+    ) -> Iterator[Optional[Span]]:
+        """Open a span as a child of the current one.
+
+        A span without a parent starts a new trace, continuing the remote
+        trace in ``traceparent`` if one is given.
+        """
+        if not self.enabled:
+            yield None
+            return
+
+        parent = _current_span.get()
+        if parent is not None:
+            span = Span(name, parent.trace_id, parent.span_id, parent.sampled, attributes)
+        else:
+            remote = parse_traceparent(traceparent)
+            if remote is not None:
+                trace_id, parent_id, sampled = remote
+            else:
+                trace_id, parent_id = os.urandom(16).hex(), None
+                sampled = random.random() < self.sample_rate
+            span = Span(name, trace_id, parent_id, sampled, attributes)
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            if span.sampled:
+                self.exporter.export(span)
+
+    async def start(self) -> None:
+        if self.enabled:
+            await self.exporter.start()
+
+    async def stop(self) -> None:
+        if self.enabled:
+            await self.exporter.stop()
+
+
+class TracingMiddleware:
+    """ASGI middleware that opens a span for each HTTP request."""
+
+    def __init__(self, app, tracer: Tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for key, value in scope["headers"]:
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+
+        with self.tracer.span(
+            "http.request",
+            traceparent=traceparent,
+            method=scope["method"],
+            path=scope["path"],
+        ) as span:
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.status = "error"
+                await send(message)
+
+            await self.app(scope, receive, send_with_status)
+
+
+tracer = Tracer(
+    BatchSpanExporter(
+        NDJSONFileSink(settings.TRACE_EXPORT_PATH),
+        batch_size=settings.TRACE_BATCH_SIZE,
+        flush_interval=settings.TRACE_FLUSH_INTERVAL,
+        max_queue_size=settings.TRACE_QUEUE_SIZE,
+    ),
+    sample_rate=settings.TRACE_SAMPLE_RATE,
+    enabled=settings.TRACING_ENABLED,
+)
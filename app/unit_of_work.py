@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Type
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import order_cache
+from app.events import order_events
+from app.group_commit import Inserts, Updates, group_commit_writer, write_changes
+from app.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+
+class SagaUnitOfWork:
+    """Write-behind unit of work for the bookkeeping of a single saga.
+
+    Step registrations and status changes are buffered in memory and written
+    in one transaction per ``flush()``. The saga coordinator flushes before
+    every external call and when the saga ends, so whenever a downstream
+    side effect may happen, the outcome of every earlier step (including its
+    ``reference_id``) is already durable. Crash recovery relies on exactly
+    that guarantee.
+
+    Rows are inserted with a single multi-row INSERT per model, and updates
+    are grouped by the columns they touch and sent as one executemany each.
+    Repeated changes to the same row are coalesced before they are written.
+    Concurrent flushes from parallel steps are serialized, since a session
+    must not be used by two tasks at once. After each commit the saga's
+    order is invalidated in the order cache, and the status events buffered
+    with ``publish()`` are sent to the order's subscribers, so a subscriber
+    never sees a change that is not durable yet.
+
+    While the group commit writer is running, flushes go through it and
+    are committed together with those of other sagas. Changes whose write
+    fails stay buffered and are written by the next flush.
+    """
+
+    def __init__(self, db: AsyncSession, order_id: Optional[str] = None):
+        self.db = db
+        self.order_id = order_id
+        self._lock = asyncio.Lock()
+        self._inserts: Inserts = {}
+        self._updates: Updates = {}
+        self._events: List[Dict[str, Any]] = []
+
+    @property
+    def pending(self) -> bool:
+        return bool(self._inserts or self._updates)
+
+    def add(self, model: Type, **values: Any) -> None:
+        """Buffer an INSERT of ``values`` into ``model``'s table."""
+        self._inserts.setdefault(model, []).append(values)
+
+    def update(self, model: Type, key: Any, key_column: str = "id", **values: Any) -> None:
+        """Buffer an UPDATE of the ``model`` row whose ``key_column`` equals ``key``."""
+        self._updates.setdefault((model, key_column, key), {}).update(values)
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        """Buffer an order event, published once the next flush has committed."""
+        self._events.append(event)
+
+    async def flush(self) -> None:
+        """Write all buffered changes in one transaction."""
+        async with self._lock:
+            if not self.pending:
+                return
+
+            inserts, self._inserts = self._inserts, {}
+            updates, self._updates = self._updates, {}
+            events, self._events = self._events, []
+
+            try:
+                with tracer.span(
+                    "db.flush", inserts=sum(map(len, inserts.values())), updates=len(updates)
+                ):
+                    if group_commit_writer.running:
+                        await group_commit_writer.write(inserts, updates)
+                    else:
+                        await write_changes(self.db, inserts, updates)
+            except Exception:
+                self._restore(inserts, updates, events)
+                raise
+
+            if self.order_id is not None:
+                await order_cache.invalidate(self.order_id)
+            for event in events:
+                await order_events.publish(event)
+
+    def _restore(self, inserts: Inserts, updates: Updates, events: List[Dict[str, Any]]) -> None:
+        """Put back changes whose write failed, ahead of those buffered since."""
+        for model, rows in self._inserts.items():
+            inserts.setdefault(model, []).extend(rows)
+        for key, values in self._updates.items():
+            updates.setdefault(key, {}).update(values)
+        self._inserts, self._updates = inserts, updates
+        self._events = events + self._events
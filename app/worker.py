@@ -0,0 +1,141 @@
+import asyncio
+import logging
+from typing import List, Optional, Set
+
+from sqlalchemy import select
+
+from app.checkout import checkout_limiter, claim_order, run_checkout
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Order, OrderStatus
+from app.queries import load_order
+
+logger = logging.getLogger(__name__)
+
+
+class SagaWorkerPool:
+    """Bounded pool of background workers that run checkout sagas.
+
+    Orders accepted in asynchronous mode are persisted as PENDING and their
+    ids are queued here. Each worker opens its own session, waits for a
+    checkout slot, claims the order by moving it from PENDING to PROCESSING,
+    loads it and runs the checkout saga. On start the pool also queues PENDING orders
+    left over from a previous process, so accepted orders are not lost when
+    the app restarts with a non-empty queue.
+    """
+
+    def __init__(self, session_factory, concurrency: int, queue_size: int):
+        self.session_factory = session_factory
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._idle: Set[asyncio.Task] = set()
+        self._closing = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.concurrency > 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def full(self) -> bool:
+        return self.queue is None or self.queue.full()
+
+    async def start(self) -> None:
+        """Start the workers and queue orders that are still pending."""
+        if not self.enabled or self.running:
+            return
+
+        self._closing = False
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"saga-worker-{idx}")
+            for idx in range(self.concurrency)
+        ]
+        logger.info("Started %s saga workers (queue size %s)", self.concurrency, self.queue_size)
+
+        await self._queue_pending_orders()
+
+    async def stop(self, timeout: float) -> None:
+        """Stop the workers, letting in-flight sagas finish within ``timeout`` seconds.
+
+        Orders still queued stay PENDING and are picked up on the next start.
+        """
+        if not self.running:
+            return
+
+        self._closing = True
+        for task in self._workers:
+            if task in self._idle:
+                task.cancel()
+
+        _, still_running = await asyncio.wait(self._workers, timeout=timeout)
+        for task in still_running:
+            logger.warning("Cancelling %s with a saga in flight", task.get_name())
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+
+        self._workers = []
+        self._idle.clear()
+        self.queue = None
+
+    def submit(self, order_id: str) -> None:
+        """Queue an order for processing.
+
+        Raises ``asyncio.QueueFull`` when the queue is at capacity.
+        """
+        if self.queue is None or self._closing:
+            raise asyncio.QueueFull()
+        self.queue.put_nowait(order_id)
+
+    async def _queue_pending_orders(self) -> None:
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(Order.id)
+                .where(Order.status == OrderStatus.PENDING)
+                .order_by(Order.created_at)
+                .limit(self.queue_size)
+            )
+            order_ids = result.scalars().all()
+
+        for order_id in order_ids:
+            self.submit(order_id)
+        if order_ids:
+            logger.info("Queued %s pending orders", len(order_ids))
+
+    async def _worker(self) -> None:
+        task = asyncio.current_task()
+        while not self._closing:
+            self._idle.add(task)
+            try:
+                order_id = await self.queue.get()
+            finally:
+                self._idle.discard(task)
+
+            try:
+                await self._process(order_id)
+            except Exception as e:
+                logger.error("Saga worker failed for order %s: %s", order_id, e)
+            finally:
+                self.queue.task_done()
+
+    async def _process(self, order_id: str) -> None:
+        async with self.session_factory() as db:
+            try:
+                async with checkout_limiter.admit(block=True):
+                    if not await claim_order(db, order_id):
+                        return
+                    await run_checkout(db, await load_order(db, order_id))
+            except Exception as e:
+                # The saga has already recorded the failure and compensated
+                logger.info("Checkout failed for order %s: %s", order_id, e)
+
+
+worker_pool = SagaWorkerPool(
+    SessionLocal,
+    concurrency=settings.CHECKOUT_WORKERS,
+    queue_size=settings.CHECKOUT_QUEUE_SIZE,
+)
@@ -0,0 +1,355 @@
+"""Load test of the checkout saga.
+
+Drives ``POST /orders`` with a reproducible mix of order scenarios against
+the orchestrator and the three mock services, and prints a JSON report
+with throughput, latency percentiles, database commits and downstream
+calls per scenario.
+
+The services run either in-process, connected through ASGI transports, or
+as separate uvicorn processes:
+
+    python -m benchmarks.checkout --orders 1000 --concurrency 50
+    python -m benchmarks.checkout --mode processes --output run.json
+    python -m benchmarks.checkout --mix success=50,decline=50 --seed 7
+
+Commit and downstream call counts are only available in-process.
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import partial
+from importlib import import_module
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+from sqlalchemy import event
+
+# Scenario -> expected status code of POST /orders
+SCENARIOS = {
+    "success": 200,
+    "decline": 400,       # amount above the payment service's 1000 limit
+    "out_of_stock": 400,  # product3 has no stock
+    "bad_address": 400,   # postal code 00000 is rejected by shipping
+}
+
+DEFAULT_MIX = "success=70,decline=10,out_of_stock=10,bad_address=10"
+
+MOCK_SERVICES = {
+    "payment": "mock_services.payment_service",
+    "inventory": "mock_services.inventory_service",
+    "shipping": "mock_services.shipping_service",
+}
+
+# Stock of the mock inventory, so successful orders never run out
+MOCK_STOCK = 10_000_000
+
+# Scenario of the order being processed, for attributing commits and calls
+current_scenario: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "current_scenario", default="warmup"
+)
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(
+                f"Unknown scenario {name!r}, expected one of {', '.join(SCENARIOS)}"
+            )
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def order_payload(scenario: str, index: int) -> Dict[str, Any]:
+    """An order request that ends in ``scenario``."""
+    items = [
+        {"product_id": "product1", "name": "Product 1", "price": 10.0, "quantity": 1},
+        {"product_id": "product2", "name": "Product 2", "price": 15.0, "quantity": 1},
+    ]
+    postal_code = "12345"
+    if scenario == "decline":
+        items = [{"product_id": "product1", "name": "Product 1", "price": 2000.0, "quantity": 1}]
+    elif scenario == "out_of_stock":
+        items = [{"product_id": "product3", "name": "Product 3", "price": 20.0, "quantity": 1}]
+    elif scenario == "bad_address":
+        postal_code = "00000"
+
+    return {
+        "customer_id": f"bench-{index % 1000}",
+        "items": items,
+        "shipping_address": {
+            "street": "123 Main St",
+            "city": "Cityville",
+            "state": "Stateland",
+            "postal_code": postal_code,
+            "country": "Country",
+        },
+        "payment_method": "credit_card",
+    }
+
+
+def plan_orders(count: int, mix: Dict[str, float], seed: int) -> List[Tuple[str, Dict]]:
+    """The same ``seed`` and ``mix`` always give the same sequence of orders."""
+    rng = random.Random(seed)
+    scenarios = rng.choices(list(mix), weights=list(mix.values()), k=count)
+    return [(scenario, order_payload(scenario, index)) for index, scenario in enumerate(scenarios)]
+
+
+def percentiles(samples: List[float]) -> Dict[str, Optional[float]]:
+    """Latency summary in milliseconds."""
+    if not samples:
+        return {"p50": None, "p90": None, "p99": None, "max": None, "mean": None}
+    ordered = sorted(samples)
+
+    def rank(p: float) -> float:
+        return round(ordered[max(0, math.ceil(len(ordered) * p / 100) - 1)] * 1000, 3)
+
+    return {
+        "p50": rank(50),
+        "p90": rank(90),
+        "p99": rank(99),
+        "max": round(ordered[-1] * 1000, 3),
+        "mean": round(sum(ordered) / len(ordered) * 1000, 3),
+    }
+
+
+async def drive(
+    client: httpx.AsyncClient, orders: List[Tuple[str, Dict]], concurrency: int
+) -> List[Tuple[str, Optional[int], float]]:
+    """Send ``orders`` with ``concurrency`` requests in flight.
+
+    Returns ``(scenario, status_code, seconds)`` per order; the status is
+    None if the request itself failed.
+    """
+    results = []
+    pending = iter(orders)
+
+    async def worker():
+        for scenario, payload in pending:
+            token = current_scenario.set(scenario)
+            started = time.perf_counter()
+            try:
+                status: Optional[int] = (await client.post("/orders", json=payload)).status_code
+            except httpx.HTTPError:
+                status = None
+            finally:
+                current_scenario.reset(token)
+            results.append((scenario, status, time.perf_counter() - started))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results
+
+
+class CountingTransport(httpx.ASGITransport):
+    """ASGI transport to a mock service that counts calls per scenario."""
+
+    def __init__(self, app, service: str, calls: Dict[str, Counter]):
+        super().__init__(app=app)
+        self.service = service
+        self.calls = calls
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.calls[current_scenario.get()][self.service] += 1
+        return await super().handle_async_request(request)
+
+
+async def run_in_process(args, orders, warmup) -> Dict[str, Any]:
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["DB_CREATE_ALL"] = "true"
+    os.environ["MOCK_INVENTORY_STOCK"] = str(MOCK_STOCK)
+
+    # Imported only now, so the settings above are picked up
+    from app.database import engine
+    from app.main import SERVICE_CLIENTS, app
+
+    commits: Counter = Counter()
+    calls: Dict[str, Counter] = defaultdict(Counter)
+
+    def count_commit(conn):
+        commits[current_scenario.get()] += 1
+
+    event.listen(engine.sync_engine, "commit", count_commit)
+    for service in SERVICE_CLIENTS:
+        mock_app = import_module(MOCK_SERVICES[service.name]).app
+        service._create_client = partial(
+            httpx.AsyncClient,
+            transport=CountingTransport(mock_app, service.name, calls),
+            base_url=service.base_url,
+        )
+
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://orchestrator", timeout=None
+        ) as client:
+            await drive(client, warmup, args.concurrency)
+            started = time.perf_counter()
+            results = await drive(client, orders, args.concurrency)
+            duration = time.perf_counter() - started
+
+    return {"results": results, "duration": duration, "commits": commits, "calls": calls}
+
+
+@contextmanager
+def service_processes(args) -> Iterator[str]:
+    """Run the orchestrator and mock services as uvicorn processes."""
+    ports = {name: args.base_port + offset for offset, name in enumerate(MOCK_SERVICES, 1)}
+    env = {
+        **os.environ,
+        "DATABASE_URL": args.database_url,
+        "DB_CREATE_ALL": "true",
+        "MOCK_INVENTORY_STOCK": str(MOCK_STOCK),
+        **{f"{name.upper()}_SERVICE_URL": f"http://127.0.0.1:{port}" for name, port in ports.items()},
+    }
+    apps = [(module, port) for module, port in zip(MOCK_SERVICES.values(), ports.values())]
+    apps.append(("app.main", args.base_port))
+
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", f"{module}:app", "--host", "127.0.0.1",
+             "--port", str(port), "--log-level", "warning"],
+            env=env,
+        )
+        for module, port in apps
+    ]
+    try:
+        for _, port in apps:
+            wait_until_ready(f"http://127.0.0.1:{port}/health")
+        yield f"http://127.0.0.1:{args.base_port}"
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+def wait_until_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if httpx.get(url).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"{url} did not come up within {timeout} seconds")
+        time.sleep(0.1)
+
+
+async def run_processes(args, orders, warmup) -> Dict[str, Any]:
+    with service_processes(args) as base_url:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=None) as client:
+            await drive(client, warmup, args.concurrency)
+            started = time.perf_counter()
+            results = await drive(client, orders, args.concurrency)
+            duration = time.perf_counter() - started
+
+    return {"results": results, "duration": duration, "commits": None, "calls": None}
+
+
+def build_report(args, mix: Dict[str, float], run: Dict[str, Any]) -> Dict[str, Any]:
+    by_scenario: Dict[str, List[Tuple[Optional[int], float]]] = defaultdict(list)
+    for scenario, status, seconds in run["results"]:
+        by_scenario[scenario].append((status, seconds))
+
+    scenarios = {}
+    for scenario, outcomes in sorted(by_scenario.items()):
+        statuses = Counter(str(status) for status, _ in outcomes)
+        report = {
+            "orders": len(outcomes),
+            "expected_status": SCENARIOS[scenario],
+            "unexpected": sum(1 for status, _ in outcomes if status != SCENARIOS[scenario]),
+            "status_codes": dict(sorted(statuses.items())),
+            "latency_ms": percentiles([seconds for _, seconds in outcomes]),
+        }
+        if run["commits"] is not None:
+            report["db_commits"] = run["commits"][scenario]
+            report["db_commits_per_order"] = round(run["commits"][scenario] / len(outcomes), 3)
+            report["downstream_calls"] = dict(sorted(run["calls"][scenario].items()))
+        scenarios[scenario] = report
+
+    results = run["results"]
+    return {
+        "benchmark": "checkout",
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "config": {
+            "mode": args.mode,
+            "orders": args.orders,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "mix": mix,
+            "seed": args.seed,
+        },
+        "duration_s": round(run["duration"], 3),
+        "throughput_rps": round(len(results) / run["duration"], 2),
+        "unexpected": sum(report["unexpected"] for report in scenarios.values()),
+        "latency_ms": percentiles([seconds for _, _, seconds in results]),
+        "scenarios": scenarios,
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test of the checkout saga")
+    parser.add_argument("--mode", choices=("inprocess", "processes"), default="inprocess")
+    parser.add_argument("--orders", type=int, default=500, help="Measured orders")
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured successful orders sent first")
+    parser.add_argument("--concurrency", type=int, default=20, help="Requests in flight")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help=f"Scenario weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", help="Database to use (default: a temporary SQLite file)")
+    parser.add_argument("--base-port", type=int, default=18000,
+                        help="Orchestrator port in processes mode; the services use the next three")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> Dict[str, Any]:
+    args = parse_args(argv)
+    mix = args.mix if isinstance(args.mix, dict) else parse_mix(args.mix)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.database_url is None:
+            args.database_url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        orders = plan_orders(args.orders, mix, args.seed)
+        warmup = plan_orders(args.warmup, {"success": 1}, args.seed)
+        runner = run_in_process if args.mode == "inprocess" else run_processes
+        run = asyncio.run(runner(args, orders, warmup))
+
+    report = build_report(args, mix, run)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return report
+
+
+if __name__ == "__main__":
+    main()
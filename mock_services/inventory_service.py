@@ -1,6 +1,7 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException
 from pydantic import BaseModel
 from typing import Dict, List, Optional
+import os
 import uuid
 import uvicorn
 
@@ -13,8 +14,17 @@ inventory = {
     "product3": {"name": "Product 3", "quantity": 0},  # Out of stock
 }
 
+# Load tests raise the stock of the available products
+if os.getenv("MOCK_INVENTORY_STOCK"):
+    for product in inventory.values():
+        if product["quantity"]:
+            product["quantity"] = int(os.getenv("MOCK_INVENTORY_STOCK"))
+
 reservations = {}
 
+# Responses by Idempotency-Key, so a retried request is not applied twice
+processed = {}
+
 
 class InventoryItem(BaseModel):
     product_id: str
@@ -26,6 +36,8 @@ class InventoryItem(BaseModel):
 class ReservationRequest(BaseModel):
     order_id: str
     items: List[Dict]
+    # Per-reservation key in batch requests; single requests use the header
+    idempotency_key: Optional[str] = None
 
 
 class ReservationResponse(BaseModel):
@@ -35,8 +47,46 @@ class ReservationResponse(BaseModel):
     status: str
 
 
+class BatchReservationRequest(BaseModel):
+    reservations: List[ReservationRequest]
+
+
+class BatchReservationResult(BaseModel):
+    status_code: int
+    reservation: Optional[ReservationResponse] = None
+    detail: Optional[str] = None
+
+
+class BatchReservationResponse(BaseModel):
+    results: List[BatchReservationResult]
+
+
 @app.post("/inventory/reserve", response_model=ReservationResponse)
-async def reserve_inventory(request: ReservationRequest):
+async def reserve_inventory(
+    request: ReservationRequest, idempotency_key: Optional[str] = Header(None)
+):
+    return reserve(request, idempotency_key or request.idempotency_key)
+
+
+@app.post("/inventory/reserve/batch", response_model=BatchReservationResponse)
+async def reserve_inventory_batch(request: BatchReservationRequest):
+    # Each reservation is applied atomically on its own; one failing
+    # reservation does not affect the others
+    results = []
+    for reservation_request in request.reservations:
+        try:
+            reservation = reserve(reservation_request, reservation_request.idempotency_key)
+            results.append({"status_code": 200, "reservation": reservation})
+        except HTTPException as e:
+            results.append({"status_code": e.status_code, "detail": e.detail})
+
+    return {"results": results}
+
+
+def reserve(request: ReservationRequest, idempotency_key: Optional[str] = None) -> Dict:
+    if idempotency_key in processed:
+        return processed[idempotency_key]
+
     # Check if we have enough inventory for each item
     for item in request.items:
         product_id = item["product_id"]
@@ -76,12 +126,17 @@ async def reserve_inventory(request: ReservationRequest):
     }
 
     reservations[reservation_id] = reservation
+    if idempotency_key:
+        processed[idempotency_key] = reservation
 
     return reservation
 
 
 @app.post("/inventory/release/{reservation_id}")
-async def release_inventory(reservation_id: str):
+async def release_inventory(reservation_id: str, idempotency_key: Optional[str] = Header(None)):
+    if idempotency_key in processed:
+        return processed[idempotency_key]
+
     # Check if reservation exists
     if reservation_id not in reservations:
         raise HTTPException(status_code=404, detail="Reservation not found")
@@ -102,11 +157,15 @@ async def release_inventory(reservation_id: str):
     # Update reservation status
     reservation["status"] = "released"
 
-    return {
+    release = {
         "reservation_id": reservation_id,
         "status": "released",
         "message": "Inventory released successfully"
     }
+    if idempotency_key:
+        processed[idempotency_key] = release
+
+    return release
 
 
 @app.get("/inventory/{product_id}")
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException
 from pydantic import BaseModel
 from typing import Dict, Optional
 import uuid
@@ -10,6 +10,9 @@ app = FastAPI(title="Payment Service")
 payments = {}
 refunds = {}
 
+# Responses by Idempotency-Key, so a retried request is not applied twice
+processed = {}
+
 
 class PaymentRequest(BaseModel):
     order_id: str
@@ -33,7 +36,12 @@ class RefundResponse(BaseModel):
 
 
 @app.post("/payments", response_model=PaymentResponse)
-async def process_payment(request: PaymentRequest):
+async def process_payment(
+    request: PaymentRequest, idempotency_key: Optional[str] = Header(None)
+):
+    if idempotency_key in processed:
+        return processed[idempotency_key]
+
     # Validate payment request
     if request.amount <= 0:
         raise HTTPException(status_code=400, detail="Invalid amount")
@@ -56,12 +64,17 @@ async def process_payment(request: PaymentRequest):
     }
 
     payments[payment_id] = payment
+    if idempotency_key:
+        processed[idempotency_key] = payment
 
     return payment
 
 
 @app.post("/payments/{payment_id}/refund", response_model=RefundResponse)
-async def refund_payment(payment_id: str):
+async def refund_payment(payment_id: str, idempotency_key: Optional[str] = Header(None)):
+    if idempotency_key in processed:
+        return processed[idempotency_key]
+
     # Check if payment exists
     if payment_id not in payments:
         raise HTTPException(status_code=404, detail="Payment not found")
@@ -84,6 +97,8 @@ async def refund_payment(payment_id: str):
 
     refunds[refund_id] = refund
     payment["status"] = "refunded"
+    if idempotency_key:
+        processed[idempotency_key] = refund
 
     return refund
 
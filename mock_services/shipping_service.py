@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException
 from pydantic import BaseModel
 from typing import Dict, List, Optional
 import uuid
@@ -9,6 +9,9 @@ app = FastAPI(title="Shipping Service")
 # In-memory storage for shipments
 shipments = {}
 
+# Responses by Idempotency-Key, so a retried request is not applied twice
+processed = {}
+
 
 class ShipmentRequest(BaseModel):
     order_id: str
@@ -25,7 +28,12 @@ class ShipmentResponse(BaseModel):
 
 
 @app.post("/shipments", response_model=ShipmentResponse)
-async def create_shipment(request: ShipmentRequest):
+async def create_shipment(
+    request: ShipmentRequest, idempotency_key: Optional[str] = Header(None)
+):
+    if idempotency_key in processed:
+        return processed[idempotency_key]
+
     # Validate address
     address = request.address
     if not all(key in address for key in ["street", "city", "state", "postal_code", "country"]):
@@ -50,12 +58,17 @@ async def create_shipment(request: ShipmentRequest):
     }
 
     shipments[shipment_id] = shipment
+    if idempotency_key:
+        processed[idempotency_key] = shipment
 
     return shipment
 
 
 @app.post("/shipments/{shipment_id}/cancel")
-async def cancel_shipment(shipment_id: str):
+async def cancel_shipment(shipment_id: str, idempotency_key: Optional[str] = Header(None)):
+    if idempotency_key in processed:
+        return processed[idempotency_key]
+
     # Check if shipment exists
     if shipment_id not in shipments:
         raise HTTPException(status_code=404, detail="Shipment not found")
@@ -73,11 +86,15 @@ async def cancel_shipment(shipment_id: str):
     # Cancel shipment
     shipment["status"] = "cancelled"
 
-    return {
+    cancellation = {
         "shipment_id": shipment_id,
         "status": "cancelled",
         "message": "Shipment cancelled successfully"
     }
+    if idempotency_key:
+        processed[idempotency_key] = cancellation
+
+    return cancellation
 
 
 @app.get("/shipments/{shipment_id}")
@@ -1,53 +1,256 @@
-import subprocess
-import time
+"""Start the main application and the mock services.
+
+    python run_services.py
+    python run_services.py --supervise --workers 4
+
+Services start concurrently and are reported ready once their ``/health``
+endpoint answers. A service with one worker is a single uvicorn process
+bound to its port. ``--workers`` only applies to the main application: its
+workers share a socket opened here, which needs ``fork``-style descriptor
+passing and is not available on Windows, where the main application keeps
+one worker. The mock services keep their payments, reservations, shipments
+and idempotency records in process memory, so they always run as a single
+worker. With ``--supervise``, crashed workers are restarted with
+exponential backoff. Service output is forwarded line by line, prefixed
+with the worker name. SIGINT or SIGTERM stops every worker gracefully.
+"""
+import argparse
+import asyncio
 import os
 import signal
+import socket
 import sys
+import time
+from typing import List, Optional
+
+import httpx
 
 services = [
-    {"name": "Payment Service", "port": 8001, "file": "mock_services/payment_service.py"},
-    {"name": "Inventory Service", "port": 8002, "file": "mock_services/inventory_service.py"},
-    {"name": "Shipping Service", "port": 8003, "file": "mock_services/shipping_service.py"},
+    {"name": "Payment Service", "port": 8001, "file": "mock_services/payment_service.py", "env": "PAYMENT_SERVICE_URL", "stateful": True},
+    {"name": "Inventory Service", "port": 8002, "file": "mock_services/inventory_service.py", "env": "INVENTORY_SERVICE_URL", "stateful": True},
+    {"name": "Shipping Service", "port": 8003, "file": "mock_services/shipping_service.py", "env": "SHIPPING_SERVICE_URL", "stateful": True},
     {"name": "Main Application", "port": 8000, "file": "app/main.py"}
 ]
 
-processes = []
+# Workers can share a listening socket passed down as a file descriptor
+SHARED_SOCKETS = os.name != "nt"
 
-def start_services():
-    for service in services:
-        print(f"Starting {service['name']} on port {service['port']}...")
-        process = subprocess.Popen(
-            ["uvicorn", service["file"].replace(".py", "").replace("/", ".") + ":app", "--host", "0.0.0.0", "--port", str(service["port"])],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
+READY_TIMEOUT = 30.0
+# A worker that stays up this long resets its restart backoff
+STABLE_AFTER = 30.0
+
+
+def backoff_delay(failures: int, base: float = 0.5, limit: float = 30.0) -> float:
+    """Seconds to wait before restarting a worker that crashed ``failures`` times in a row."""
+    return min(limit, base * 2 ** (failures - 1)) if failures else 0.0
+
+
+def worker_count(service, workers: int) -> int:
+    """Workers to run for ``service``: services with in-memory state get one.
+
+    Without shared sockets every service gets one, bound to its own port.
+    """
+    return 1 if service.get("stateful") or not SHARED_SOCKETS else workers
+
+
+def open_socket(host: str, port: int) -> socket.socket:
+    """Listening socket passed to every worker of a service."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Worker:
+    """One uvicorn process, serving a shared socket or bound to the service's port."""
+
+    def __init__(
+        self, service, index: int, sock: Optional[socket.socket], env, host: str, log_level: str
+    ):
+        self.service = service
+        self.name = f"{service['name']} #{index}"
+        self.sock = sock
+        self.env = env
+        self.host = host
+        self.log_level = log_level
+        self.process = None
+
+    def command(self) -> List[str]:
+        if self.sock is not None:
+            listen = ["--fd", str(self.sock.fileno())]
+        else:
+            listen = ["--host", self.host, "--port", str(self.service["port"])]
+        return [
+            sys.executable, "-m", "uvicorn", f"{service_module(self.service)}:app",
+            *listen, "--log-level", self.log_level,
+        ]
+
+    async def start(self) -> None:
+        options = {"pass_fds": (self.sock.fileno(),)} if self.sock is not None else {}
+        self.process = await asyncio.create_subprocess_exec(
+            *self.command(),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            env=self.env,
+            **options,
         )
-        processes.append(process)
-        print(f"{service['name']} started with PID {process.pid}")
-        time.sleep(1)  # Small delay to prevent port conflicts
+        print(f"{self.name} started with PID {self.process.pid}")
 
-def cleanup(sig=None, frame=None):
-    print("Stopping all services...")
-    for process in processes:
-        process.terminate()
+    async def drain(self) -> None:
+        """Forward the worker's output, so it never blocks on a full pipe."""
+        async for line in self.process.stdout:
+            sys.stdout.write(f"[{self.name}] {line.decode(errors='replace')}")
+            sys.stdout.flush()
 
-    for process in processes:
-        process.wait()
+    async def stop(self, timeout: float) -> None:
+        if self.process is None or self.process.returncode is not None:
+            return
+        self.process.terminate()
+        try:
+            await asyncio.wait_for(self.process.wait(), timeout)
+        except asyncio.TimeoutError:
+            print(f"{self.name} did not stop within {timeout} seconds, killing it")
+            self.process.kill()
+            await self.process.wait()
 
-    print("All services stopped.")
-    sys.exit(0)
 
-if __name__ == "__main__":
-    # Register signal handlers for graceful shutdown
-    signal.signal(signal.SIGINT, cleanup)
-    signal.signal(signal.SIGTERM, cleanup)
+def service_module(service) -> str:
+    return service["file"].replace(".py", "").replace("/", ".")
 
-    try:
-        start_services()
-        print("All services are running. Press Ctrl+C to stop.")
 
-        # Keep script running
+async def wait_until_healthy(service, host: str, timeout: float = READY_TIMEOUT) -> float:
+    """Poll the service's ``/health`` endpoint; return the seconds it took to answer."""
+    url = f"http://{'127.0.0.1' if host == '0.0.0.0' else host}:{service['port']}/health"
+    started = time.monotonic()
+    async with httpx.AsyncClient(timeout=1.0) as client:
         while True:
-            time.sleep(1)
-    except Exception as e:
-        print(f"Error: {e}")
-        cleanup()
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return time.monotonic() - started
+            except httpx.TransportError:
+                pass
+            if time.monotonic() - started > timeout:
+                raise RuntimeError(f"{service['name']} did not become healthy within {timeout} seconds")
+            await asyncio.sleep(0.05)
+
+
+class Supervisor:
+    def __init__(self, args):
+        self.args = args
+        self.workers = []
+        self.stopping = asyncio.Event()
+        self.sockets = []
+        self.failed = False
+
+    def environment(self):
+        env = dict(os.environ)
+        for service in services:
+            if "env" in service:
+                env.setdefault(service["env"], f"http://127.0.0.1:{service['port']}")
+        return env
+
+    async def run(self) -> int:
+        env = self.environment()
+        for service in services:
+            count = worker_count(service, self.args.workers)
+            sock = None
+            if count > 1:
+                sock = open_socket(self.args.host, service["port"])
+                self.sockets.append(sock)
+            for index in range(1, count + 1):
+                self.workers.append(
+                    Worker(service, index, sock, env, self.args.host, self.args.log_level)
+                )
+
+        tasks = [asyncio.create_task(self.keep_running(worker)) for worker in self.workers]
+        ready = asyncio.gather(
+            *(wait_until_healthy(service, self.args.host) for service in services)
+        )
+        stopping = asyncio.create_task(self.stopping.wait())
+        await asyncio.wait({ready, stopping}, return_when=asyncio.FIRST_COMPLETED)
+        if not ready.done():
+            ready.cancel()
+        elif ready.exception() is not None:
+            print(f"Error: {ready.exception()}")
+            self.failed = True
+            self.stopping.set()
+        else:
+            for service, seconds in zip(services, ready.result()):
+                print(f"{service['name']} ready on port {service['port']} after {seconds:.2f}s")
+            print("All services are running. Press Ctrl+C to stop.")
+
+        await stopping
+        print("Stopping all services...")
+        await asyncio.gather(*(worker.stop(self.args.shutdown_timeout) for worker in self.workers))
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for sock in self.sockets:
+            sock.close()
+        print("All services stopped.")
+        return 1 if self.failed else 0
+
+    async def keep_running(self, worker: Worker) -> None:
+        failures = 0
+        while not self.stopping.is_set():
+            started = time.monotonic()
+            await worker.start()
+            drain = asyncio.create_task(worker.drain())
+            code = await worker.process.wait()
+            await drain
+            if self.stopping.is_set():
+                return
+
+            print(f"{worker.name} exited with code {code}")
+            if not self.args.supervise:
+                self.failed = True
+                self.stopping.set()
+                return
+            failures = 1 if time.monotonic() - started >= STABLE_AFTER else failures + 1
+            delay = backoff_delay(failures)
+            print(f"Restarting {worker.name} in {delay:.1f}s")
+            try:
+                await asyncio.wait_for(self.stopping.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--supervise", action="store_true",
+                        help="restart crashed workers instead of stopping everything")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes of the main application (not on Windows)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--base-port", type=int, default=8000,
+                        help="port of the main application; the mock services use the next three")
+    parser.add_argument("--shutdown-timeout", type=float, default=30.0,
+                        help="seconds a worker gets to finish in-flight requests")
+    parser.add_argument("--log-level", default="info", help="uvicorn log level")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.workers > 1 and not SHARED_SOCKETS:
+        print("--workers needs shared sockets, which this platform lacks; running one worker")
+    for service in services:
+        service["port"] += args.base_port - 8000
+
+    async def run() -> int:
+        supervisor = Supervisor(args)
+        loop = asyncio.get_running_loop()
+        # Register signal handlers for graceful shutdown
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, supervisor.stopping.set)
+            except NotImplementedError:
+                # Windows event loops have no signal handlers
+                signal.signal(sig, lambda *_: loop.call_soon_threadsafe(supervisor.stopping.set))
+        return await supervisor.run()
+
+    return asyncio.run(run())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
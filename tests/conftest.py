@@ -2,20 +2,31 @@ import asyncio
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool, StaticPool
 
-from app.database import Base, get_db
+from app.checkout import new_order
+from app.database import Base, async_database_url, get_db, get_session_factory
 from app.main import app
+from app.models import OrderCreate, OrderStatus
+from app.recovery import saga_recovery
+from app.worker import worker_pool
 
-# Create in-memory test database
+# Create file-backed test database. The sync engine manages the schema, the
+# async engine serves the application sessions.
 TEST_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(
     TEST_DATABASE_URL,
     connect_args={"check_same_thread": False},
     poolclass=StaticPool,
 )
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine(
+    async_database_url(TEST_DATABASE_URL), poolclass=NullPool
+)
+TestingSessionLocal = sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
 
 
 @pytest.fixture(scope="function")
@@ -23,32 +34,63 @@ def db():
     # Create the database and tables
     Base.metadata.create_all(bind=engine)
 
-    # Create a new session for each test
-    db = TestingSessionLocal()
     try:
-        yield db
+        yield TestingSessionLocal
     finally:
-        db.close()
-
-    # Drop the database after test
-    Base.metadata.drop_all(bind=engine)
+        # Drop the database after test
+        Base.metadata.drop_all(bind=engine)
 
 
 @pytest.fixture(scope="function")
 def client(db):
-    # Override the get_db dependency
-    def override_get_db():
-        try:
-            yield db
-        finally:
-            pass
+    # Override the get_db dependency with a session on the test database
+    async def override_get_db():
+        async with db() as session:
+            yield session
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = lambda: db
+    session_factory, worker_pool.session_factory = worker_pool.session_factory, db
+    saga_recovery.session_factory = db
 
     with TestClient(app) as c:
         yield c
 
     app.dependency_overrides = {}
+    worker_pool.session_factory = session_factory
+    saga_recovery.session_factory = session_factory
+
+
+@pytest.fixture
+def order_request():
+    return {
+        "customer_id": "cust123",
+        "items": [
+            {"product_id": "product1", "name": "Product 1", "price": 10.0, "quantity": 2},
+            {"product_id": "product2", "name": "Product 2", "price": 15.0, "quantity": 1}
+        ],
+        "shipping_address": {
+            "street": "123 Main St",
+            "city": "Cityville",
+            "state": "Stateland",
+            "postal_code": "12345",
+            "country": "Country"
+        },
+        "payment_method": "credit_card"
+    }
+
+
+@pytest.fixture
+def insert_order(db, order_request):
+    """Insert an order for ``order_request`` directly and return its id."""
+    def insert(status=OrderStatus.PENDING) -> str:
+        with Session(engine) as session:
+            order = new_order(OrderCreate(**order_request), status)
+            session.add(order)
+            session.commit()
+            return order.id
+
+    return insert
 
 
 @pytest.fixture(scope="function")
@@ -0,0 +1,29 @@
+import json
+import subprocess
+import sys
+
+
+def test_checkout_benchmark_reports_each_scenario(tmp_path):
+    """A short in-process run produces a comparable JSON report."""
+    output = tmp_path / "run.json"
+    subprocess.run(
+        [sys.executable, "-m", "benchmarks.checkout", "--orders", "24", "--warmup", "0",
+         "--concurrency", "4", "--seed", "3", "--output", str(output)],
+        check=True,
+        capture_output=True,
+    )
+    report = json.loads(output.read_text())
+
+    assert report["config"]["orders"] == 24
+    assert report["unexpected"] == 0
+    assert sum(scenario["orders"] for scenario in report["scenarios"].values()) == 24
+    assert report["latency_ms"]["p99"] >= report["latency_ms"]["p50"] > 0
+
+    success = report["scenarios"]["success"]
+    assert success["status_codes"] == {"200": success["orders"]}
+    assert success["db_commits_per_order"] == 4
+    assert success["downstream_calls"] == {
+        "inventory": success["orders"],
+        "payment": success["orders"],
+        "shipping": success["orders"],
+    }
@@ -1,29 +1,28 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from uuid import UUID
+
 import pytest
 from unittest.mock import AsyncMock, patch
+from fastapi import HTTPException
 from httpx import HTTPStatusError, Response
-
+from sqlalchemy import event, insert
+from sqlalchemy.exc import OperationalError
+
+from app import group_commit
+from app.cache import order_cache
+from app.checkout import new_order
+from app.idempotency import request_fingerprint
+from app.models import IdempotencyRecord, OrderCreate, OrderStatus, StepStatus
+from app.queries import load_order
+from app.saga import Saga
 from app.services.payment import payment_service
 from app.services.inventory import inventory_service
 from app.services.shipping import shipping_service
-
-
-@pytest.fixture
-def order_request():
-    return {
-        "customer_id": "cust123",
-        "items": [
-            {"product_id": "product1", "name": "Product 1", "price": 10.0, "quantity": 2},
-            {"product_id": "product2", "name": "Product 2", "price": 15.0, "quantity": 1}
-        ],
-        "shipping_address": {
-            "street": "123 Main St",
-            "city": "Cityville",
-            "state": "Stateland",
-            "postal_code": "12345",
-            "country": "Country"
-        },
-        "payment_method": "credit_card"
-    }
+from app.steps.base import Step
+from app.worker import worker_pool
+from tests.conftest import async_engine, engine
 
 
 @pytest.mark.asyncio
@@ -250,3 +249,461 @@ async def test_shipping_failure_with_compensation(client, order_request):
         mock_shipping.assert_called_once()
         mock_refund.assert_called_once_with("pay_123")
         mock_release.assert_called_once_with("res_123")
+
+
+@pytest.mark.asyncio
+async def test_successful_checkout_commits_once_per_durability_point(client, order_request):
+    """Step bookkeeping is written at durability points, not on every transition."""
+    commits = []
+
+    def count_commit(conn):
+        commits.append(conn)
+
+    event.listen(async_engine.sync_engine, "commit", count_commit)
+
+    try:
+        with patch.object(
+            payment_service, "process_payment", new_callable=AsyncMock
+        ) as mock_payment, patch.object(
+            inventory_service, "reserve_inventory", new_callable=AsyncMock
+        ) as mock_inventory, patch.object(
+            shipping_service, "create_shipment", new_callable=AsyncMock
+        ) as mock_shipping:
+            mock_payment.return_value = {"payment_id": "pay_123", "transaction_id": "trx_123"}
+            mock_inventory.return_value = {"reservation_id": "res_123"}
+            mock_shipping.return_value = {"shipment_id": "ship_123"}
+
+            response = client.post("/orders", json=order_request)
+    finally:
+        event.remove(async_engine.sync_engine, "commit", count_commit)
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "completed"
+
+    # Order intake, one flush before payment, one before the concurrent
+    # inventory and shipping calls, and one at saga end
+    assert len(commits) == 4
+
+
+@pytest.mark.asyncio
+async def test_independent_steps_run_concurrently(client, order_request):
+    """Inventory and shipping both only depend on payment and run in parallel."""
+    in_flight = []
+    max_in_flight = []
+
+    async def slow_call(name):
+        in_flight.append(name)
+        max_in_flight.append(len(in_flight))
+        await asyncio.sleep(0.05)
+        in_flight.remove(name)
+
+    async def reserve(*args):
+        await slow_call("inventory")
+        return {"reservation_id": "res_123"}
+
+    async def ship(*args):
+        await slow_call("shipping")
+        return {"shipment_id": "ship_123"}
+
+    with patch.object(
+        payment_service, "process_payment", new_callable=AsyncMock
+    ) as mock_payment, patch.object(
+        inventory_service, "reserve_inventory", new_callable=AsyncMock
+    ) as mock_inventory, patch.object(
+        shipping_service, "create_shipment", new_callable=AsyncMock
+    ) as mock_shipping:
+        mock_payment.return_value = {"payment_id": "pay_123", "transaction_id": "trx_123"}
+        mock_inventory.side_effect = reserve
+        mock_shipping.side_effect = ship
+
+        response = client.post("/orders", json=order_request)
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "completed"
+    assert max(max_in_flight) == 2
+
+
+@pytest.mark.asyncio
+async def test_steps_in_flight_when_a_sibling_fails_finish_and_are_compensated(client, order_request):
+    """A failing step does not abandon its running siblings; all of them are compensated."""
+    compensating, peak = [], []
+
+    class DemoStep(Step):
+        depends_on = ("reserve",)
+        delay, fails = 0.05, False
+
+        def __init__(self, db):
+            super().__init__(db, step_name=self.name)
+
+        async def execute(self, context):
+            await asyncio.sleep(self.delay)
+            if self.fails:
+                await self.update_step_status(StepStatus.FAILED, error_message="declined")
+                raise RuntimeError("declined")
+            await self.update_step_status(StepStatus.COMPLETED)
+            return context
+
+        async def compensate(self, context):
+            compensating.append(self.step_name)
+            peak.append(len(compensating))
+            await asyncio.sleep(0.02)
+            compensating.remove(self.step_name)
+            await self.update_step_status(StepStatus.COMPENSATED)
+            return context
+
+    class Reserve(DemoStep):
+        name, depends_on, delay = "reserve", (), 0
+
+    class Label(DemoStep):
+        name = "label"
+
+    class Pickup(DemoStep):
+        name = "pickup"
+
+    class Charge(DemoStep):
+        name, delay, fails = "charge", 0, True
+
+    async with worker_pool.session_factory() as db:
+        order = new_order(OrderCreate(**order_request), OrderStatus.PROCESSING)
+        db.add(order)
+        await db.commit()
+
+        with pytest.raises(RuntimeError):
+            await Saga(db, order, [Reserve, Label, Pickup, Charge]).execute({})
+
+        order = await load_order(db, order.id)
+
+    assert order.status == OrderStatus.FAILED
+    assert {step.step_name: step.status for step in order.steps} == {
+        "reserve": StepStatus.COMPENSATED,
+        "label": StepStatus.COMPENSATED,
+        "pickup": StepStatus.COMPENSATED,
+        "charge": StepStatus.FAILED,
+    }
+    # Label and pickup are at the same depth and were compensated together
+    assert max(peak) == 2
+
+
+@pytest.mark.asyncio
+async def test_steps_in_flight_when_a_checkpoint_fails_finish_and_are_compensated(
+    db, order_request, monkeypatch
+):
+    """A failed durability point stops the saga like a failed step would."""
+    writes = []
+
+    async def write_changes(session, inserts, updates):
+        writes.append(len(writes) + 1)
+        if len(writes) == 2:
+            raise OperationalError("COMMIT", {}, Exception("database is locked"))
+        await group_commit.write_changes(session, inserts, updates)
+
+    monkeypatch.setattr("app.unit_of_work.write_changes", write_changes)
+
+    class DemoStep(Step):
+        depends_on, delay = (), 0
+
+        def __init__(self, session):
+            super().__init__(session, step_name=self.name)
+
+        async def execute(self, context):
+            await asyncio.sleep(self.delay)
+            await self.update_step_status(StepStatus.COMPLETED)
+            return context
+
+        async def compensate(self, context):
+            await self.update_step_status(StepStatus.COMPENSATED)
+            return context
+
+    class Reserve(DemoStep):
+        name = "reserve"
+
+    class Label(DemoStep):
+        name, delay = "label", 0.05
+
+    class Pickup(DemoStep):
+        name, depends_on = "pickup", ("reserve",)
+
+    async with db() as session:
+        order = new_order(OrderCreate(**order_request), OrderStatus.PROCESSING)
+        session.add(order)
+        await session.commit()
+
+        # The checkpoint before pickup fails while label is still in flight
+        with pytest.raises(OperationalError):
+            await Saga(session, order, [Reserve, Label, Pickup]).execute({})
+
+        order = await load_order(session, order.id)
+
+    assert order.status == OrderStatus.FAILED
+    assert {step.step_name: step.status for step in order.steps} == {
+        "reserve": StepStatus.COMPENSATED,
+        "label": StepStatus.COMPENSATED,
+        "pickup": StepStatus.PENDING,
+    }
+
+
+@pytest.mark.asyncio
+async def test_async_checkout_returns_accepted(client, order_request):
+    """With Prefer: respond-async the saga runs in the background worker pool."""
+    with patch.object(
+        payment_service, "process_payment", new_callable=AsyncMock
+    ) as mock_payment, patch.object(
+        inventory_service, "reserve_inventory", new_callable=AsyncMock
+    ) as mock_inventory, patch.object(
+        shipping_service, "create_shipment", new_callable=AsyncMock
+    ) as mock_shipping:
+        mock_payment.return_value = {"payment_id": "pay_123", "transaction_id": "trx_123"}
+        mock_inventory.return_value = {"reservation_id": "res_123"}
+        mock_shipping.return_value = {"shipment_id": "ship_123"}
+
+        response = client.post(
+            "/orders", json=order_request, headers={"Prefer": "respond-async"}
+        )
+
+        assert response.status_code == 202
+        accepted = response.json()
+        assert accepted["status"] == "pending"
+        assert response.headers["Location"] == accepted["status_url"]
+
+        # Poll the status URL until the saga has finished
+        for _ in range(50):
+            order = client.get(accepted["status_url"]).json()
+            if order["status"] not in ("pending", "processing"):
+                break
+            time.sleep(0.05)
+
+    assert order["id"] == accepted["order_id"]
+    assert order["status"] == "completed"
+    mock_payment.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_workers_claim_each_pending_order_once(client, order_request):
+    """An order queued by several workers or processes is run by one of them."""
+    async with worker_pool.session_factory() as db:
+        pending = new_order(OrderCreate(**order_request))
+        running = new_order(OrderCreate(**order_request), OrderStatus.PROCESSING)
+        db.add_all([pending, running])
+        await db.commit()
+
+    with patch.object(
+        payment_service, "process_payment", new_callable=AsyncMock
+    ) as mock_payment, patch.object(
+        inventory_service, "reserve_inventory", new_callable=AsyncMock
+    ) as mock_inventory, patch.object(
+        shipping_service, "create_shipment", new_callable=AsyncMock
+    ) as mock_shipping:
+        mock_payment.return_value = {"payment_id": "pay_123", "transaction_id": "trx_123"}
+        mock_inventory.return_value = {"reservation_id": "res_123"}
+        mock_shipping.return_value = {"shipment_id": "ship_123"}
+
+        await asyncio.gather(
+            *(worker_pool._process(order_id) for order_id in (pending.id, pending.id, running.id))
+        )
+
+    mock_payment.assert_called_once()
+    assert client.get(f"/orders/{pending.id}").json()["status"] == "completed"
+    assert client.get(f"/orders/{running.id}").json()["status"] == "processing"
+
+
+@pytest.mark.asyncio
+async def test_batch_checkout_reports_per_order_status(client, order_request):
+    """Invalid or failing orders in a batch don't affect the others."""
+    declined = dict(order_request, customer_id="cust456")
+    invalid = {"customer_id": "cust789", "items": []}
+
+    async def process_payment(order_id, amount, payment_method):
+        if amount > 1000:
+            raise HTTPException(status_code=400, detail="Insufficient funds")
+        return {"payment_id": f"pay_{order_id}", "transaction_id": "trx_123"}
+
+    declined["items"] = [
+        {"product_id": "product1", "name": "Product 1", "price": 2000.0, "quantity": 1}
+    ]
+
+    with patch.object(
+        payment_service, "process_payment", side_effect=process_payment
+    ), patch.object(
+        inventory_service, "reserve_inventory", new_callable=AsyncMock
+    ) as mock_inventory, patch.object(
+        shipping_service, "create_shipment", new_callable=AsyncMock
+    ) as mock_shipping:
+        mock_inventory.return_value = {"reservation_id": "res_123"}
+        mock_shipping.return_value = {"shipment_id": "ship_123"}
+
+        response = client.post("/orders/batch", json=[order_request, invalid, declined])
+
+    assert response.status_code == 200
+    results = response.json()
+    assert [result["index"] for result in results] == [0, 1, 2]
+    assert [result["status"] for result in results] == ["completed", "rejected", "failed"]
+    assert results[1]["order_id"] is None
+    assert "Insufficient funds" in results[2]["error"]
+
+    order = client.get(f"/orders/{results[0]['order_id']}").json()
+    assert order["status"] == "completed"
+    assert len(order["items"]) == 2
+    assert order["payment_info"]["payment_id"] == f"pay_{order['id']}"
+
+
+@pytest.mark.asyncio
+async def test_get_order_loads_in_two_queries(client, order_request):
+    """Reading an order eager-loads its relationships instead of lazy-loading them."""
+    with patch.object(
+        payment_service, "process_payment", new_callable=AsyncMock
+    ) as mock_payment, patch.object(
+        inventory_service, "reserve_inventory", new_callable=AsyncMock
+    ) as mock_inventory, patch.object(
+        shipping_service, "create_shipment", new_callable=AsyncMock
+    ) as mock_shipping:
+        mock_payment.return_value = {"payment_id": "pay_123", "transaction_id": "trx_123"}
+        mock_inventory.return_value = {"reservation_id": "res_123"}
+        mock_shipping.return_value = {"shipment_id": "ship_123"}
+
+        order_id = client.post("/orders", json=order_request).json()["id"]
+
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count_statement)
+    try:
+        await order_cache.invalidate(order_id)
+        response = client.get(f"/orders/{order_id}")
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", count_statement)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["items"]) == 2
+    assert [step["step_name"] for step in data["steps"]] == ["payment", "inventory", "shipping"]
+    assert data["shipping_address"]["postal_code"] == "12345"
+    assert data["payment_info"]["payment_id"] == "pay_123"
+    assert len(statements) == 2
+
+
+@pytest.mark.asyncio
+async def test_completed_order_reads_are_served_from_cache(client, order_request):
+    """Final orders are cached as JSON and served without touching the database."""
+    with patch.object(
+        payment_service, "process_payment", new_callable=AsyncMock
+    ) as mock_payment, patch.object(
+        inventory_service, "reserve_inventory", new_callable=AsyncMock
+    ) as mock_inventory, patch.object(
+        shipping_service, "create_shipment", new_callable=AsyncMock
+    ) as mock_shipping:
+        mock_payment.return_value = {"payment_id": "pay_123", "transaction_id": "trx_123"}
+        mock_inventory.return_value = {"reservation_id": "res_123"}
+        mock_shipping.return_value = {"shipment_id": "ship_123"}
+
+        created = client.post("/orders", json=order_request).json()
+
+    hits = client.get("/cache/stats").json()["hits"]
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count_statement)
+    try:
+        response = client.get(f"/orders/{created['id']}")
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", count_statement)
+
+    assert response.status_code == 200
+    assert response.json() == created
+    assert statements == []
+    assert client.get("/cache/stats").json()["hits"] == hits + 1
+
+
+@pytest.mark.asyncio
+async def test_order_ids_are_time_ordered_binary_keys(client, order_request):
+    """Ids are UUIDv7 strings in the API and 16-byte keys in the database."""
+    with patch.object(
+        payment_service, "process_payment", new_callable=AsyncMock
+    ) as mock_payment, patch.object(
+        inventory_service, "reserve_inventory", new_callable=AsyncMock
+    ) as mock_inventory, patch.object(
+        shipping_service, "create_shipment", new_callable=AsyncMock
+    ) as mock_shipping:
+        mock_payment.return_value = {"payment_id": "pay_123", "transaction_id": "trx_123"}
+        mock_inventory.return_value = {"reservation_id": "res_123"}
+        mock_shipping.return_value = {"shipment_id": "ship_123"}
+
+        results = client.post("/orders/batch", json=[order_request] * 3).json()
+
+    order_ids = [result["order_id"] for result in results]
+    assert [UUID(order_id).version for order_id in order_ids] == [7, 7, 7]
+    assert sorted(order_ids) == order_ids
+
+    with engine.connect() as conn:
+        stored = conn.exec_driver_sql("SELECT id FROM orders ORDER BY id").scalars().all()
+    assert stored == [UUID(order_id).bytes for order_id in order_ids]
+
+    assert client.get(f"/orders/{order_ids[0]}").status_code == 200
+    assert client.get("/orders/not-an-order-id").status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_retried_order_with_idempotency_key_is_not_duplicated(client, order_request):
+    """A retry with the same Idempotency-Key replays the first response."""
+    headers = {"Idempotency-Key": "checkout-attempt-1"}
+    with patch.object(
+        payment_service, "process_payment", new_callable=AsyncMock
+    ) as mock_payment, patch.object(
+        inventory_service, "reserve_inventory", new_callable=AsyncMock
+    ) as mock_inventory, patch.object(
+        shipping_service, "create_shipment", new_callable=AsyncMock
+    ) as mock_shipping:
+        mock_payment.return_value = {"payment_id": "pay_123", "transaction_id": "trx_123"}
+        mock_inventory.return_value = {"reservation_id": "res_123"}
+        mock_shipping.return_value = {"shipment_id": "ship_123"}
+
+        first = client.post("/orders", json=order_request, headers=headers)
+        retry = client.post("/orders", json=order_request, headers=headers)
+        reused = client.post(
+            "/orders", json=dict(order_request, customer_id="cust456"), headers=headers
+        )
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    mock_payment.assert_called_once()
+    assert reused.status_code == 422
+
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT COUNT(*) FROM orders").scalar_one() == 1
+
+
+@pytest.mark.asyncio
+async def test_abandoned_idempotency_claim_is_taken_over(client, order_request):
+    """A key claimed by a request that never completed is free again after the lock timeout."""
+    fingerprint = request_fingerprint(OrderCreate(**order_request).json(sort_keys=True), "False")
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        for key, claimed_at in (("abandoned", now - timedelta(minutes=5)), ("running", now)):
+            conn.execute(insert(IdempotencyRecord).values(
+                key=key, fingerprint=fingerprint, created_at=claimed_at,
+                expires_at=claimed_at + timedelta(days=1),
+            ))
+
+    with patch.object(
+        payment_service, "process_payment", new_callable=AsyncMock
+    ) as mock_payment, patch.object(
+        inventory_service, "reserve_inventory", new_callable=AsyncMock
+    ) as mock_inventory, patch.object(
+        shipping_service, "create_shipment", new_callable=AsyncMock
+    ) as mock_shipping:
+        mock_payment.return_value = {"payment_id": "pay_123", "transaction_id": "trx_123"}
+        mock_inventory.return_value = {"reservation_id": "res_123"}
+        mock_shipping.return_value = {"shipment_id": "ship_123"}
+
+        running = client.post("/orders", json=order_request, headers={"Idempotency-Key": "running"})
+        taken_over = client.post(
+            "/orders", json=order_request, headers={"Idempotency-Key": "abandoned"}
+        )
+
+    assert running.status_code == 409
+    assert taken_over.status_code == 200
+    assert taken_over.json()["status"] == "completed"
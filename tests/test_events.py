@@ -0,0 +1,109 @@
+import json
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from app.checkout import run_checkout
+from app.events import InMemoryEventBackend, OrderEvents, order_events, order_status_event
+from app.main import app
+from app.models import OrderStatus
+from app.queries import load_order
+from app.services.inventory import inventory_service
+from app.services.payment import payment_service
+from app.services.shipping import shipping_service
+from tests.conftest import TestingSessionLocal
+
+
+async def checkout(order_id: str) -> None:
+    async with TestingSessionLocal() as db:
+        await run_checkout(db, await load_order(db, order_id))
+
+
+@pytest.mark.asyncio
+async def test_slow_subscribers_lose_their_oldest_events():
+    events = OrderEvents(InMemoryEventBackend(), queue_size=2)
+    now = datetime.utcnow()
+
+    async with events.subscribe("order1") as queue:
+        for status in (OrderStatus.PENDING, OrderStatus.PROCESSING, OrderStatus.COMPLETED):
+            await events.publish(order_status_event("order1", status, now))
+        await events.publish(order_status_event("order2", OrderStatus.FAILED, now))
+
+        received = [event async for event in events.follow(queue, keepalive=1.0)]
+
+    assert [event["status"] for event in received] == ["processing", "completed"]
+    assert events.stats() == {"published": 4, "channels": 0, "subscribers": 0, "dropped": 1}
+
+
+def test_websocket_streams_the_transitions_of_a_saga(client, insert_order):
+    order_id = insert_order()
+
+    with patch.object(
+        payment_service, "process_payment", new_callable=AsyncMock,
+        return_value={"payment_id": "pay_123", "transaction_id": "trx_123", "status": "completed"},
+    ), patch.object(
+        inventory_service, "reserve_inventory", new_callable=AsyncMock,
+        return_value={"reservation_id": "res_123", "status": "reserved"},
+    ), patch.object(
+        shipping_service, "create_shipment", new_callable=AsyncMock,
+        return_value={"shipment_id": "ship_123", "tracking_number": "TRK123", "status": "scheduled"},
+    ), client.websocket_connect(f"/orders/{order_id}/ws") as websocket:
+        snapshot = websocket.receive_json()
+        client.portal.call(checkout, order_id)
+
+        events = []
+        with pytest.raises(WebSocketDisconnect):
+            while True:
+                events.append(websocket.receive_json())
+
+    assert snapshot["type"] == "snapshot"
+    assert snapshot["order"]["status"] == "pending"
+    assert events[0] == {**events[0], "type": "order_status", "status": "processing"}
+    assert events[-1] == {**events[-1], "type": "order_status", "status": "completed"}
+    completed_steps = {
+        event["step"] for event in events
+        if event["type"] == "step_status" and event["status"] == "completed"
+    }
+    assert completed_steps == {"payment", "inventory", "shipping"}
+
+
+def test_event_stream_of_a_final_order_is_its_snapshot(client, insert_order):
+    order_id = insert_order(OrderStatus.FAILED)
+
+    response = client.get(f"/orders/{order_id}/events")
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    name, data = response.text.strip().split("\n")
+    assert name == "event: snapshot"
+    assert json.loads(data[len("data: "):])["order"]["status"] == "failed"
+    assert client.get("/orders/not-an-order/events").status_code == 404
+
+
+def test_event_stream_unsubscribes_when_it_never_starts(client, insert_order, monkeypatch):
+    order_id = insert_order()
+    messages = []
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+
+    # The client is gone before the response body starts
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": f"/orders/{order_id}/events", "raw_path": b"", "root_path": "",
+        "query_string": b"", "headers": [], "client": ("test", 1), "server": ("test", 80),
+    }
+    client.portal.call(app, scope, receive, send)
+    assert order_events.stats()["subscribers"] == 0
+
+    async def broken_snapshot(session_factory, order_id):
+        raise RuntimeError("database is gone")
+
+    monkeypatch.setattr("app.main.order_snapshot", broken_snapshot)
+    with pytest.raises(RuntimeError):
+        client.get(f"/orders/{order_id}/events")
+    assert order_events.stats()["subscribers"] == 0
@@ -0,0 +1,123 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, configure_sqlite
+from app.group_commit import GroupCommitWriter, write_changes
+from app.ids import new_id
+from app.models import Order, OrderStatus
+from app.unit_of_work import SagaUnitOfWork
+
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'group.db'}")
+    configure_sqlite(engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def writer(session_factory, monkeypatch):
+    writer = GroupCommitWriter(session_factory, window=0.05, max_batch=64)
+    monkeypatch.setattr("app.unit_of_work.group_commit_writer", writer)
+    await writer.start()
+    yield writer
+    await writer.stop()
+
+
+def order_row(order_id=None):
+    now = datetime.utcnow()
+    return dict(
+        id=order_id or new_id(), customer_id="cust123", total_amount=10.0,
+        status=OrderStatus.PENDING, created_at=now, updated_at=now,
+    )
+
+
+@pytest.mark.asyncio
+async def test_connections_use_the_sqlite_profile(session_factory):
+    async with session_factory() as db:
+        pragmas = {
+            name: (await db.execute(text(f"PRAGMA {name}"))).scalar()
+            for name in ("journal_mode", "synchronous", "busy_timeout")
+        }
+    assert pragmas == {"journal_mode": "wal", "synchronous": 1, "busy_timeout": 5000}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_flushes_share_one_commit(session_factory, writer):
+    async def flush_saga():
+        async with session_factory() as db:
+            uow = SagaUnitOfWork(db)
+            uow.add(Order, **order_row())
+            await uow.flush()
+
+    await asyncio.gather(*(flush_saga() for _ in range(10)))
+
+    assert (writer.batches, writer.writes) == (1, 10)
+    async with session_factory() as db:
+        assert (await db.execute(select(func.count(Order.id)))).scalar() == 10
+
+
+@pytest.mark.asyncio
+async def test_failed_write_does_not_fail_the_rest_of_its_group(session_factory, writer):
+    existing = new_id()
+    async with session_factory() as db:
+        uow = SagaUnitOfWork(db)
+        uow.add(Order, **order_row(existing))
+        await uow.flush()
+
+    results = await asyncio.gather(
+        writer.write({Order: [order_row()]}, {}),
+        writer.write({Order: [order_row(existing)]}, {}),
+        writer.write({}, {(Order, "id", existing): {"status": OrderStatus.COMPLETED}}),
+        return_exceptions=True,
+    )
+
+    assert results[0] is None and results[2] is None
+    assert isinstance(results[1], IntegrityError)
+    async with session_factory() as db:
+        assert (await db.execute(select(func.count(Order.id)))).scalar() == 2
+        assert (await db.get(Order, existing)).status == OrderStatus.COMPLETED
+
+
+@pytest.mark.asyncio
+async def test_changes_of_a_failed_flush_are_written_by_the_next_one(session_factory, monkeypatch):
+    failures = [OperationalError("COMMIT", {}, Exception("database is locked"))]
+    published = []
+
+    async def flaky_write_changes(db, inserts, updates):
+        if failures:
+            raise failures.pop()
+        await write_changes(db, inserts, updates)
+
+    async def publish(event):
+        published.append(event)
+
+    monkeypatch.setattr("app.unit_of_work.write_changes", flaky_write_changes)
+    monkeypatch.setattr("app.unit_of_work.order_events.publish", publish)
+    row = order_row()
+    async with session_factory() as db:
+        uow = SagaUnitOfWork(db)
+        uow.add(Order, **row)
+        uow.update(Order, row["id"], status=OrderStatus.PROCESSING, customer_id="cust456")
+        uow.publish({"order_id": row["id"], "status": "processing"})
+        with pytest.raises(OperationalError):
+            await uow.flush()
+
+        uow.update(Order, row["id"], status=OrderStatus.COMPLETED)
+        uow.publish({"order_id": row["id"], "status": "completed"})
+        await uow.flush()
+
+    async with session_factory() as db:
+        order = await db.get(Order, row["id"])
+    assert (order.status, order.customer_id) == (OrderStatus.COMPLETED, "cust456")
+    assert [event["status"] for event in published] == ["processing", "completed"]
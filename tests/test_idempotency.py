@@ -0,0 +1,66 @@
+import httpx
+import pytest
+
+from app.ids import idempotency_key
+from app.services.inventory import InventoryService
+from app.services.payment import PaymentService
+from mock_services import inventory_service as inventory_mock
+from mock_services import payment_service as payment_mock
+
+
+def client_for(service, app):
+    """Point ``service`` at a mock service app running in-process."""
+    service._client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://mock"
+    )
+    return service
+
+
+def test_step_keys_are_deterministic():
+    assert idempotency_key("order1", "payment") == idempotency_key("order1", "payment")
+    assert idempotency_key("order1", "payment") != idempotency_key("order1", "shipping")
+    assert idempotency_key("order1", "payment") != idempotency_key("order2", "payment")
+
+
+@pytest.mark.asyncio
+async def test_repeated_step_calls_are_applied_once():
+    payment = client_for(PaymentService(), payment_mock.app)
+    inventory = client_for(InventoryService(), inventory_mock.app)
+    stock = inventory_mock.inventory["product2"]["quantity"]
+
+    charged = await payment.process_payment("order-retried", 25.0, "credit_card")
+    again = await payment.process_payment("order-retried", 25.0, "credit_card")
+    assert again["payment_id"] == charged["payment_id"]
+
+    refund = await payment.refund_payment(charged["payment_id"])
+    assert (await payment.refund_payment(charged["payment_id"])) == refund
+
+    items = [{"product_id": "product2", "quantity": 2}]
+    reserved = await inventory.reserve_inventory("order-retried", items)
+    assert (await inventory.reserve_inventory("order-retried", items)) == reserved
+    assert inventory_mock.inventory["product2"]["quantity"] == stock - 2
+
+    await payment.close()
+    await inventory.close()
+
+
+@pytest.mark.asyncio
+async def test_calls_with_idempotency_keys_are_retried():
+    attempts = []
+
+    async def handler(request):
+        attempts.append(request.headers.get("Idempotency-Key"))
+        if len(attempts) == 1:
+            raise httpx.ConnectError("Connection reset", request=request)
+        return httpx.Response(200, json={"payment_id": "pay_123", "transaction_id": "trx_123"})
+
+    payment = PaymentService()
+    payment._client = httpx.AsyncClient(
+        transport=httpx.MockTransport(handler), base_url="http://payment"
+    )
+
+    result = await payment.process_payment("order1", 25.0, "credit_card")
+
+    assert result["payment_id"] == "pay_123"
+    assert attempts == [idempotency_key("order1", "payment")] * 2
+    await payment.close()
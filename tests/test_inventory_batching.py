@@ -0,0 +1,71 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.services.batching import RequestBatcher
+from app.services.inventory import InventoryService
+from mock_services import inventory_service as inventory_mock
+
+
+@pytest.fixture
+def inventory():
+    """Inventory client that batches reservations against the mock service."""
+    requests = []
+
+    async def record(request):
+        requests.append(request.url.path)
+
+    service = InventoryService()
+    service._client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=inventory_mock.app),
+        base_url="http://inventory",
+        event_hooks={"request": [record]},
+    )
+    service.batcher = RequestBatcher(
+        service.reserve_inventory_batch, window=0.01, max_size=100
+    )
+    service.requests = requests
+    return service
+
+
+@pytest.mark.asyncio
+async def test_concurrent_reservations_are_sent_as_one_batch(inventory):
+    stock = inventory_mock.inventory["product1"]["quantity"]
+
+    results = await asyncio.gather(
+        inventory.reserve_inventory("order1", [{"product_id": "product1", "quantity": 1}]),
+        inventory.reserve_inventory("order2", [{"product_id": "product3", "quantity": 1}]),
+        inventory.reserve_inventory("order3", [{"product_id": "product1", "quantity": 2}]),
+        return_exceptions=True,
+    )
+    await inventory.close()
+
+    assert inventory.requests == ["/inventory/reserve/batch"]
+
+    # Each caller gets its own outcome
+    assert results[0]["order_id"] == "order1"
+    assert results[0]["reservation_id"].startswith("res_")
+    assert isinstance(results[1], HTTPException)
+    assert results[1].status_code == 400
+    assert "Insufficient stock for product3" in results[1].detail
+    assert results[2]["order_id"] == "order3"
+
+    # Failed reservations do not touch stock
+    assert inventory_mock.inventory["product1"]["quantity"] == stock - 3
+
+
+@pytest.mark.asyncio
+async def test_short_batch_response_fails_every_caller():
+    async def send(payloads):
+        return payloads[:-1]
+
+    batcher = RequestBatcher(send, window=0.01, max_size=100)
+
+    results = await asyncio.wait_for(
+        asyncio.gather(*(batcher.submit(n) for n in range(3)), return_exceptions=True), 1
+    )
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert "Batch of 3 requests got 2 results" in str(results[0])
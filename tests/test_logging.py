@@ -0,0 +1,68 @@
+import json
+import logging
+import logging.handlers
+import queue
+
+from app.log import JSONFormatter, NonBlockingQueueHandler, SamplingFilter, TraceContextFilter
+from app.tracing import BatchSpanExporter, NDJSONFileSink, Tracer
+
+
+def make_record(name="app.saga", level=logging.INFO, msg="Executing step: %s", args=("payment",), **extra):
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_includes_extra_fields_and_trace():
+    tracer = Tracer(BatchSpanExporter(NDJSONFileSink("unused"), 1, 1, 1), 0.0, enabled=True)
+    record = make_record(order_id="order1")
+    with tracer.span("saga.execute") as span:
+        TraceContextFilter().filter(record)
+
+    entry = json.loads(JSONFormatter().format(record))
+
+    assert entry["message"] == "Executing step: payment"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "app.saga"
+    assert entry["order_id"] == "order1"
+    assert (entry["trace_id"], entry["span_id"]) == (span.trace_id, span.span_id)
+
+
+def test_sampling_and_rate_limits_apply_below_warning():
+    log_filter = SamplingFilter({"app.services": 0.0}, {"app.saga": 2})
+
+    assert not log_filter.filter(make_record("app.services.payment"))
+    assert log_filter.filter(make_record("app.services.payment", logging.ERROR))
+    assert [log_filter.filter(make_record("app.saga")) for _ in range(3)] == [True, True, False]
+    assert log_filter.filter(make_record("app.saga", logging.WARNING))
+    assert log_filter.filter(make_record("app.main"))
+    assert log_filter.suppressed == 2
+
+
+def test_queue_handler_defers_formatting_to_the_listener():
+    formatted = []
+
+    class Arg:
+        def __str__(self):
+            formatted.append(True)
+            return "payment"
+
+    class Collect(logging.Handler):
+        def __init__(self):
+            super().__init__()
+            self.messages = []
+
+        def emit(self, record):
+            self.messages.append(record.getMessage())
+
+    handler = NonBlockingQueueHandler(queue.Queue(2))
+    for _ in range(3):
+        handler.handle(make_record(args=(Arg(),)))
+    assert not formatted
+    assert handler.dropped == 1
+
+    output = Collect()
+    listener = logging.handlers.QueueListener(handler.queue, output)
+    listener.start()
+    listener.stop()
+    assert output.messages == ["Executing step: payment"] * 2
@@ -0,0 +1,73 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app.metrics import Histogram, Registry
+from app.services.inventory import inventory_service
+from app.services.payment import payment_service
+from app.services.shipping import shipping_service
+
+
+def sample(text, name):
+    """Value of the sample ``name`` (with labels) in a metrics page."""
+    for line in text.splitlines():
+        if line.startswith(name + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_histogram_renders_cumulative_buckets(monkeypatch):
+    registry = Registry()
+    monkeypatch.setattr("app.metrics.registry", registry)
+    histogram = Histogram("request_seconds", "Request latency.", ("path",), buckets=(0.1, 1.0))
+    child = histogram.labels('/a"b')
+    for value in (0.05, 0.1, 0.5, 3.0):
+        child.observe(value)
+
+    assert registry.render().splitlines() == [
+        "# HELP request_seconds Request latency.",
+        "# TYPE request_seconds histogram",
+        'request_seconds_bucket{path="/a\\"b",le="0.1"} 2',
+        'request_seconds_bucket{path="/a\\"b",le="1"} 3',
+        'request_seconds_bucket{path="/a\\"b",le="+Inf"} 4',
+        'request_seconds_sum{path="/a\\"b"} 3.65',
+        'request_seconds_count{path="/a\\"b"} 4',
+    ]
+
+
+@pytest.mark.asyncio
+async def test_checkout_is_recorded(client):
+    order_request = {
+        "customer_id": "cust123",
+        "items": [{"product_id": "product1", "name": "Product 1", "price": 10.0, "quantity": 2}],
+        "shipping_address": {
+            "street": "123 Main St",
+            "city": "Cityville",
+            "state": "Stateland",
+            "postal_code": "12345",
+            "country": "Country",
+        },
+    }
+    completed = 'saga_duration_seconds_count{outcome="completed"}'
+    payment = 'saga_step_duration_seconds_count{step="payment",action="execute",outcome="completed"}'
+    before = client.get("/metrics").text
+
+    with patch.object(
+        payment_service, "process_payment", new_callable=AsyncMock
+    ) as mock_payment, patch.object(
+        inventory_service, "reserve_inventory", new_callable=AsyncMock
+    ) as mock_inventory, patch.object(
+        shipping_service, "create_shipment", new_callable=AsyncMock
+    ) as mock_shipping:
+        mock_payment.return_value = {"payment_id": "pay_123", "transaction_id": "trx_123"}
+        mock_inventory.return_value = {"reservation_id": "res_123"}
+        mock_shipping.return_value = {"shipment_id": "ship_123"}
+        assert client.post("/orders", json=order_request).status_code == 200
+
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    after = response.text
+    assert sample(after, completed) == sample(before, completed) + 1
+    assert sample(after, payment) == sample(before, payment) + 1
+    assert sample(after, "sagas_in_flight") == 0
+    commits = "db_commit_duration_seconds_count"
+    assert sample(after, commits) == sample(before, commits) + 4
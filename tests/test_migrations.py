@@ -0,0 +1,155 @@
+import io
+from datetime import datetime
+from uuid import UUID, uuid4
+
+import pytest
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, select
+
+from app.database import Base
+from app.models import Order, OrderItem, OrderStatus, OrderStep, StepStatus
+from app.queries import (ORDER_DETAIL_QUERY, order_export_query, order_filters,
+                         order_page_query)
+
+
+@pytest.fixture
+def migrated_engine(tmp_path):
+    """A SQLite database built by running the migration chain to head."""
+    url = f"sqlite:///{tmp_path / 'migrated.db'}"
+    config = Config("alembic.ini")
+    config.set_main_option("sqlalchemy.url", url)
+    command.upgrade(config, "head")
+
+    engine = create_engine(url)
+    yield engine
+    engine.dispose()
+
+
+def query_plan(engine, statement, params=None):
+    """Return SQLite's query plan for ``statement`` as one string."""
+    compiled = statement.compile(engine, compile_kwargs={"render_postcompile": True})
+    values = compiled.construct_params(params)
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(
+            f"EXPLAIN QUERY PLAN {compiled}",
+            tuple(values[name] for name in compiled.positiontup),
+        ).fetchall()
+    return "\n".join(row[-1] for row in rows)
+
+
+def test_migrations_match_models(migrated_engine):
+    """The migration chain produces exactly the schema the models declare."""
+    with migrated_engine.connect() as conn:
+        diff = compare_metadata(MigrationContext.configure(conn), Base.metadata)
+    assert diff == []
+
+
+def test_order_detail_uses_child_indexes(migrated_engine):
+    plan = query_plan(migrated_engine, ORDER_DETAIL_QUERY, {"order_id": "order1"})
+    assert "ix_order_items_order_id" in plan
+
+    steps = (
+        select(OrderStep)
+        .where(OrderStep.order_id.in_(["order1"]))
+        .order_by(OrderStep.order_id, OrderStep.execution_order)
+    )
+    assert "ix_order_steps_order_id_execution_order" in query_plan(migrated_engine, steps)
+
+
+def test_customer_history_uses_covering_index(migrated_engine):
+    history = (
+        select(Order.id)
+        .where(Order.customer_id == "cust123")
+        .order_by(Order.created_at.desc(), Order.id.desc())
+    )
+    plan = query_plan(migrated_engine, history)
+    assert "COVERING INDEX ix_orders_customer_id_created_at" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_order_listing_seeks_into_indexes(migrated_engine):
+    after = (datetime.utcnow(), str(uuid4()))
+    by_customer = order_page_query(order_filters(customer_id="cust123"), after, 50)
+    plan = query_plan(migrated_engine, by_customer)
+    assert "INDEX ix_orders_customer_id_created_at (customer_id=? AND " in plan
+    assert "TEMP B-TREE" not in plan
+
+    by_status = order_page_query(order_filters(status=OrderStatus.FAILED), after, 50)
+    plan = query_plan(migrated_engine, by_status)
+    assert "INDEX ix_orders_status_created_at (status=? AND " in plan
+    assert "TEMP B-TREE" not in plan
+
+    everything = order_page_query(order_filters(), after, 50)
+    plan = query_plan(migrated_engine, everything)
+    assert "INDEX ix_orders_created_at (" in plan
+    assert "TEMP B-TREE" not in plan
+
+    export = order_export_query(order_filters(since=datetime.utcnow()), 1000)
+    plan = query_plan(migrated_engine, export)
+    assert "INDEX ix_orders_created_at (created_at>?)" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_stale_saga_scan_uses_covering_index(migrated_engine):
+    stale = (
+        select(Order.id)
+        .where(Order.status == OrderStatus.PROCESSING, Order.updated_at < datetime.utcnow())
+        .order_by(Order.updated_at)
+    )
+    plan = query_plan(migrated_engine, stale)
+    assert "COVERING INDEX ix_orders_status_updated_at" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_string_ids_are_converted_to_binary(tmp_path):
+    """Rows written with string ids survive the move to binary keys and back."""
+    url = f"sqlite:///{tmp_path / 'legacy.db'}"
+    config = Config("alembic.ini")
+    config.set_main_option("sqlalchemy.url", url)
+    command.upgrade(config, "0002")
+
+    order_id, step_id = str(uuid4()), str(uuid4())
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO orders (id, customer_id, status) VALUES (?, 'cust123', 'COMPLETED')",
+            (order_id,),
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO order_steps (id, order_id, step_name, status, execution_order) "
+            "VALUES (?, ?, 'payment', 'COMPLETED', 1)",
+            (step_id, order_id),
+        )
+
+    command.upgrade(config, "head")
+    with engine.connect() as conn:
+        stored = conn.exec_driver_sql("SELECT id FROM orders").scalar_one()
+        assert stored == UUID(order_id).bytes
+        row = conn.execute(
+            select(OrderStep.id, OrderStep.status).where(OrderStep.order_id == order_id)
+        ).one()
+    assert row == (step_id, StepStatus.COMPLETED)
+
+    command.downgrade(config, "0002")
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT order_id FROM order_steps").scalar_one() == order_id
+    engine.dispose()
+
+
+def test_ids_are_converted_in_place_on_postgresql():
+    """PostgreSQL keeps its tables, and their constraint names, and alters the columns."""
+    output = io.StringIO()
+    config = Config("alembic.ini", output_buffer=output)
+    config.set_main_option("sqlalchemy.url", "postgresql://localhost/orders")
+    command.upgrade(config, "0002:0003", sql=True)
+
+    sql = output.getvalue()
+    assert "RENAME" not in sql and "CREATE TABLE" not in sql
+    assert "ALTER TABLE orders ALTER COLUMN id TYPE UUID USING id::uuid" in sql
+    assert (
+        "ALTER TABLE order_steps ADD CONSTRAINT order_steps_order_id_fkey "
+        "FOREIGN KEY(order_id) REFERENCES orders (id)"
+    ) in sql
@@ -0,0 +1,99 @@
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from app.ids import new_id
+from app.models import Order, OrderStatus
+from app.queries import encode_cursor
+from tests.conftest import engine
+
+START = datetime(2026, 1, 1)
+
+
+def insert_orders(customer_id, count, status=OrderStatus.COMPLETED, start=START):
+    """Insert ``count`` orders, one minute apart; returns their ids, oldest first."""
+    ids = []
+    with Session(engine) as session:
+        for minute in range(count):
+            created_at = start + timedelta(minutes=minute)
+            order = Order(
+                id=new_id(), customer_id=customer_id, total_amount=10.0, status=status,
+                created_at=created_at, updated_at=created_at,
+            )
+            session.add(order)
+            ids.append(order.id)
+        session.commit()
+    return ids
+
+
+def test_listing_pages_through_a_customer_newest_first(client):
+    ids = insert_orders("cust1", 5)
+    insert_orders("cust2", 2)
+
+    seen, url = [], "/orders?customer_id=cust1&limit=2"
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        seen.extend(order["id"] for order in response.json())
+        link = response.headers.get("link")
+        url = link[1:link.index(">")] if link else None
+
+    assert seen == ids[::-1]
+
+
+def test_listing_pages_through_orders_created_at_the_same_time(client):
+    with Session(engine) as session:
+        orders = [
+            Order(
+                id=new_id(), customer_id="cust1", total_amount=10.0, status=OrderStatus.COMPLETED,
+                created_at=START, updated_at=START,
+            )
+            for _ in range(5)
+        ]
+        session.add_all(orders)
+        session.commit()
+        ids = [order.id for order in orders]
+
+    seen, url = [], "/orders?limit=2"
+    while url:
+        response = client.get(url)
+        seen.extend(order["id"] for order in response.json())
+        link = response.headers.get("link")
+        url = link[1:link.index(">")] if link else None
+
+    assert seen == sorted(ids, reverse=True)
+
+
+def test_listing_filters_by_status_and_creation_time(client):
+    insert_orders("cust1", 3, OrderStatus.FAILED)
+    recent = insert_orders("cust1", 2, OrderStatus.FAILED, start=START + timedelta(days=1))
+    insert_orders("cust1", 2, OrderStatus.COMPLETED, start=START + timedelta(days=1))
+
+    response = client.get(
+        "/orders", params={"status": "failed", "since": (START + timedelta(days=1)).isoformat()}
+    )
+
+    assert [order["id"] for order in response.json()] == recent[::-1]
+    assert "link" not in response.headers
+
+
+def test_listing_rejects_invalid_cursors(client):
+    assert client.get("/orders?cursor=not-a-cursor").status_code == 400
+    bad_id = encode_cursor(Order(created_at=START, id="not-an-id"))
+    assert client.get(f"/orders?cursor={bad_id}").status_code == 400
+    assert client.get("/orders?limit=0").status_code == 422
+
+
+def test_export_streams_orders_as_ndjson(client, monkeypatch):
+    monkeypatch.setattr("app.main.settings.ORDER_EXPORT_BATCH_SIZE", 2)
+    ids = insert_orders("cust1", 5)
+    insert_orders("cust2", 1)
+
+    response = client.get("/orders/export", params={"customer_id": "cust1"})
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [record["id"] for record in records] == ids
+    assert records[0]["status"] == "completed"
+    assert records[0]["created_at"] == START.isoformat()
@@ -0,0 +1,80 @@
+import shutil
+import time
+
+import pytest
+from sqlalchemy import update
+
+from app.models import Order, OrderStatus
+from app.read_routing import ReadRouter, read_router
+from tests.conftest import engine
+
+
+@pytest.fixture
+def replica(client, db, tmp_path, monkeypatch):
+    """Route reads to a replica, copied from the primary when ``copy()`` is called."""
+    path = tmp_path / "replica.db"
+    router = ReadRouter([f"sqlite:///{path}"], max_staleness=5.0, cookie_name="last_write")
+    for name in ("engines", "session_factories", "lags"):
+        monkeypatch.setattr(read_router, name, getattr(router, name))
+    monkeypatch.setattr(read_router, "session_factory", db)
+
+    def copy():
+        # The copy carries a fresh heartbeat, and the lag check measures it
+        client.portal.call(read_router.write_heartbeat)
+        shutil.copyfile("test.db", path)
+        client.portal.call(read_router.check_lag)
+
+    return copy
+
+
+def test_reads_go_to_the_replica_unless_the_caller_just_wrote(client, replica, insert_order):
+    order_id = insert_order()
+    replica()
+    with engine.begin() as conn:
+        conn.execute(update(Order).where(Order.id == order_id).values(status=OrderStatus.PROCESSING))
+
+    # The replica still has the order as pending
+    assert client.get(f"/orders/{order_id}").json()["status"] == "pending"
+
+    client.cookies.set("last_write", str(time.time()))
+    assert client.get(f"/orders/{order_id}").json()["status"] == "processing"
+
+    client.cookies.set("last_write", str(time.time() - 60))
+    assert client.get(f"/orders/{order_id}").json()["status"] == "pending"
+
+
+def test_replicas_behind_by_more_than_the_staleness_tolerance_are_skipped(
+    client, replica, insert_order, monkeypatch
+):
+    order_id = insert_order()
+    replica()
+    with engine.begin() as conn:
+        conn.execute(update(Order).where(Order.id == order_id).values(status=OrderStatus.PROCESSING))
+    assert client.get(f"/orders/{order_id}").json()["status"] == "pending"
+
+    # The replica stops receiving changes, so its heartbeat grows old
+    monkeypatch.setattr(read_router, "max_staleness", 0.05)
+    time.sleep(0.1)
+    client.portal.call(read_router.check_lag)
+
+    assert read_router.fresh_replicas() == []
+    assert client.get(f"/orders/{order_id}").json()["status"] == "processing"
+
+
+def test_orders_missing_on_the_replica_are_read_from_the_primary(client, replica, insert_order):
+    replica()
+    order_id = insert_order()
+
+    response = client.get(f"/orders/{order_id}")
+
+    assert response.status_code == 200
+    assert response.json()["id"] == order_id
+
+
+def test_writes_set_the_read_your_writes_cookie(client, replica):
+    replica()
+    response = client.post("/orders/batch", json=[{"customer_id": "cust123"}])
+
+    assert response.json()[0]["status"] == "rejected"
+    assert time.time() - float(response.cookies["last_write"]) < 5
+    assert "last_write" not in client.get("/health").headers.get("set-cookie", "")
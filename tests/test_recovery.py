@@ -0,0 +1,171 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.checkout import CHECKOUT_STEPS, checkout_limiter
+from app.models import (Order, OrderItem, OrderStatus, OrderStep, PaymentInfo,
+                        ShippingAddress, StepStatus)
+from app.queries import load_order
+from app.recovery import SagaRecovery
+from app.services.inventory import inventory_service
+from app.services.payment import payment_service
+from app.services.shipping import shipping_service
+from tests.conftest import engine
+
+
+async def create_interrupted_order(session_factory, step_states, updated_at):
+    """Persist a PROCESSING order as a crashed saga would have left it."""
+    async with session_factory() as db:
+        order = Order(
+            customer_id="cust123",
+            total_amount=35.0,
+            status=OrderStatus.PROCESSING,
+            updated_at=updated_at,
+            items=[OrderItem(product_id="product1", name="Product 1", price=10.0, quantity=2)],
+            shipping_address=ShippingAddress(
+                street="123 Main St", city="Cityville", state="Stateland",
+                postal_code="12345", country="Country",
+            ),
+            payment_info=PaymentInfo(payment_method="credit_card"),
+            steps=[
+                OrderStep(step_name=name, execution_order=idx + 1, status=status, reference_id=reference_id)
+                for idx, (name, status, reference_id) in enumerate(step_states)
+            ],
+        )
+        db.add(order)
+        await db.commit()
+        return order.id
+
+
+def make_recovery(session_factory):
+    return SagaRecovery(
+        session_factory, CHECKOUT_STEPS, stale_after=60, interval=60, batch_size=10
+    )
+
+
+@pytest.mark.asyncio
+async def test_recovery_resumes_saga_after_completed_steps(db):
+    """A crash after payment resumes with the remaining steps only."""
+    order_id = await create_interrupted_order(
+        db,
+        [
+            ("payment", StepStatus.COMPLETED, "pay_123"),
+            ("inventory", StepStatus.PENDING, None),
+            ("shipping", StepStatus.PENDING, None),
+        ],
+        updated_at=datetime.utcnow() - timedelta(minutes=5),
+    )
+
+    with patch.object(
+        payment_service, "process_payment", new_callable=AsyncMock
+    ) as mock_payment, patch.object(
+        inventory_service, "reserve_inventory", new_callable=AsyncMock
+    ) as mock_inventory, patch.object(
+        shipping_service, "create_shipment", new_callable=AsyncMock
+    ) as mock_shipping:
+        mock_inventory.return_value = {"reservation_id": "res_123"}
+        mock_shipping.return_value = {"shipment_id": "ship_123"}
+
+        assert await make_recovery(db).run_once() == 1
+
+    mock_payment.assert_not_called()
+    mock_inventory.assert_called_once()
+    mock_shipping.assert_called_once()
+
+    async with db() as session:
+        order = await load_order(session, order_id)
+        assert order.status == OrderStatus.COMPLETED
+        assert {step.step_name: step.status for step in order.steps} == {
+            "payment": StepStatus.COMPLETED,
+            "inventory": StepStatus.COMPLETED,
+            "shipping": StepStatus.COMPLETED,
+        }
+
+
+@pytest.mark.asyncio
+async def test_recovery_compensates_saga_with_failed_step(db):
+    """A crash after a step failed compensates the completed steps."""
+    order_id = await create_interrupted_order(
+        db,
+        [
+            ("payment", StepStatus.COMPLETED, "pay_123"),
+            ("inventory", StepStatus.FAILED, None),
+            ("shipping", StepStatus.PENDING, None),
+        ],
+        updated_at=datetime.utcnow() - timedelta(minutes=5),
+    )
+
+    with patch.object(
+        payment_service, "refund_payment", new_callable=AsyncMock
+    ) as mock_refund, patch.object(
+        shipping_service, "create_shipment", new_callable=AsyncMock
+    ) as mock_shipping:
+        mock_refund.return_value = {"refund_id": "ref_123"}
+
+        assert await make_recovery(db).run_once() == 1
+
+    mock_refund.assert_called_once_with("pay_123")
+    mock_shipping.assert_not_called()
+
+    async with db() as session:
+        order = await load_order(session, order_id)
+        assert order.status == OrderStatus.FAILED
+
+
+@pytest.mark.asyncio
+async def test_recovery_skips_sagas_that_are_still_running(db):
+    """Orders updated recently belong to a live saga and are left alone."""
+    await create_interrupted_order(
+        db,
+        [("payment", StepStatus.PENDING, None)],
+        updated_at=datetime.utcnow(),
+    )
+
+    assert await make_recovery(db).run_once() == 0
+
+
+def test_batch_orders_waiting_for_a_checkout_slot_are_not_recovered(
+    client, db, order_request, monkeypatch
+):
+    """Orders queued behind the saga limit are PENDING, not orphaned sagas."""
+    monkeypatch.setattr(checkout_limiter, "in_flight", checkout_limiter.limit.current)
+    recovery = SagaRecovery(db, CHECKOUT_STEPS, stale_after=0, interval=60, batch_size=10)
+
+    with patch.object(
+        payment_service, "process_payment", new_callable=AsyncMock,
+        return_value={"payment_id": "pay_123", "transaction_id": "trx_123", "status": "completed"},
+    ) as mock_payment, patch.object(
+        inventory_service, "reserve_inventory", new_callable=AsyncMock,
+        return_value={"reservation_id": "res_123", "status": "reserved"},
+    ), patch.object(
+        shipping_service, "create_shipment", new_callable=AsyncMock,
+        return_value={"shipment_id": "ship_123", "tracking_number": "TRK123", "status": "scheduled"},
+    ):
+        responses = []
+        batch = threading.Thread(
+            target=lambda: responses.append(
+                client.post("/orders/batch", json=[order_request, order_request])
+            )
+        )
+        batch.start()
+        deadline = time.monotonic() + 5
+        with Session(engine) as session:
+            while not session.scalar(select(func.count(Order.id))):
+                assert time.monotonic() < deadline
+                time.sleep(0.01)
+
+        recovered = client.portal.call(recovery.run_once)
+
+        client.portal.call(checkout_limiter.release)
+        batch.join(5)
+
+    assert recovered == 0
+    assert [result["status"] for result in responses[0].json()] == ["completed", "completed"]
+    assert mock_payment.await_count == 2
+    with Session(engine) as session:
+        assert session.scalar(select(func.count(OrderStep.id))) == 6
@@ -0,0 +1,199 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.checkout import checkout_limiter
+from app.services.payment import PaymentService, payment_service
+from app.services.resilience import (AdaptiveLimiter, AIMDLimit, BulkheadFullError, CircuitBreaker,
+                                     Overloaded)
+
+
+def payment_client(handler):
+    """Payment client whose requests are answered by ``handler``."""
+    service = PaymentService()
+    service._client = httpx.AsyncClient(
+        transport=httpx.MockTransport(handler), base_url="http://payment"
+    )
+    return service
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_fails_fast_until_probe_succeeds():
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.path)
+        if len(calls) <= 5:
+            return httpx.Response(503, text="Service unavailable")
+        return httpx.Response(200, json={"payment_id": "pay_123", "status": "refunded"})
+
+    service = payment_client(handler)
+    service.breaker = CircuitBreaker("payment", failure_threshold=5, recovery_timeout=0.05)
+
+    for _ in range(5):
+        with pytest.raises(HTTPException) as error:
+            await service.get_payment("pay_123")
+        assert error.value.status_code == 503
+
+    # Open: rejected without a request
+    with pytest.raises(HTTPException) as error:
+        await service.get_payment("pay_123")
+    assert error.value.status_code == 500
+    assert "Circuit open" in error.value.detail
+    assert len(calls) == 5
+
+    # Compensations are still attempted while the circuit is open
+    assert (await service.refund_payment("pay_123"))["status"] == "refunded"
+
+    await asyncio.sleep(0.05)
+    assert (await service.get_payment("pay_123"))["payment_id"] == "pay_123"
+    assert service.stats()["state"] == "closed"
+    assert service.stats()["trips"] == 1
+    assert service.stats()["rejected"] == 1
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_timeout_adapts_to_observed_latency():
+    async def handler(request):
+        return httpx.Response(200, json={"payment_id": "pay_123"})
+
+    service = payment_client(handler)
+    assert service.adaptive_timeout.current == service.timeout
+
+    for _ in range(service.latency.min_samples):
+        await service.get_payment("pay_123")
+
+    # Fast responses bring the timeout down to the floor
+    assert service.adaptive_timeout.current == service.adaptive_timeout.floor
+    assert service.adaptive_timeout.current < service.timeout
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_slow_reads_are_hedged():
+    calls = 0
+
+    async def handler(request):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(1)
+        return httpx.Response(200, json={"payment_id": "pay_123", "attempt": calls})
+
+    service = payment_client(handler)
+    for _ in range(service.latency.min_samples):
+        service.latency.record(0.01)
+
+    result = await service.get_payment("pay_123")
+
+    # The second attempt answered while the first was still waiting
+    assert result["attempt"] == 2
+    assert service.stats()["hedges"] == 1
+    await service.close()
+
+
+def fixed_limiter(limit, queue_size, queue_timeout=0.05):
+    return AdaptiveLimiter(
+        "test",
+        AIMDLimit(initial=limit, min_limit=limit, max_limit=limit, latency_target=1.0, backoff=0.5),
+        queue_size=queue_size,
+        queue_timeout=queue_timeout,
+    )
+
+
+def test_aimd_limit_grows_while_used_and_backs_off_once_per_window():
+    limit = AIMDLimit(initial=10, min_limit=2, max_limit=12, latency_target=0.1, backoff=0.5)
+
+    limit.record(0.01, in_flight=2)
+    assert limit.current == 10
+    for _ in range(3):
+        limit.record(0.01, in_flight=8)
+    assert limit.current == 12
+
+    # Calls that were in flight together slow down together; that is one signal
+    limit.record(1.0, in_flight=12)
+    limit.record(1.0, in_flight=12)
+    limit.record(0.01, in_flight=0, dropped=True)
+    assert limit.current == 6
+
+
+@pytest.mark.asyncio
+async def test_limiter_queues_then_sheds_excess_callers():
+    limiter = fixed_limiter(1, queue_size=1)
+    await limiter.acquire()
+    waiting = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+
+    # The queue is full
+    with pytest.raises(Overloaded):
+        await limiter.acquire()
+
+    # The released slot goes to the queued caller
+    limiter.release(0.01)
+    await waiting
+    assert limiter.in_flight == 1
+
+    # Waited in the queue for too long
+    with pytest.raises(Overloaded) as error:
+        await limiter.acquire()
+    assert error.value.retry_after == 1
+    assert limiter.stats() == {"limit": 1, "in_flight": 1, "queued": 0, "shed": 2}
+
+
+def test_full_bulkhead_fails_fast_but_lets_compensations_through(
+    client, order_request, monkeypatch
+):
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(200, json={"payment_id": "pay_123", "status": "refunded"})
+
+    service = payment_client(handler)
+    service.bulkhead = fixed_limiter(1, queue_size=0)
+    client.portal.call(service.bulkhead.acquire)
+
+    with pytest.raises(BulkheadFullError) as error:
+        client.portal.call(service.get_payment, "pay_123")
+    assert "Too many concurrent calls" in str(error.value)
+    assert error.value.retry_after == 1
+    assert calls == []
+
+    assert client.portal.call(service.refund_payment, "pay_123")["status"] == "refunded"
+    assert service.stats()["bulkhead"]["shed"] == 1
+    client.portal.call(service.close)
+
+    # A checkout shed before any step completed is answered like an
+    # overloaded orchestrator, and its order is kept pending, not failed
+    monkeypatch.setattr(payment_service, "bulkhead", service.bulkhead)
+    response = client.post("/orders", json=order_request)
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    order_id = client.get("/orders").json()[0]["id"]
+    order = client.get(f"/orders/{order_id}").json()
+    assert order["status"] == "pending"
+    assert {step["step_name"]: step["status"] for step in order["steps"]} == {
+        "payment": "pending", "inventory": "pending", "shipping": "pending",
+    }
+
+
+def test_checkouts_over_the_saga_limit_are_shed(client, monkeypatch):
+    monkeypatch.setattr(checkout_limiter, "in_flight", checkout_limiter.limit.current)
+    monkeypatch.setattr(checkout_limiter, "queue_timeout", 0.01)
+
+    response = client.post("/orders", json={
+        "customer_id": "cust123",
+        "items": [{"product_id": "product1", "name": "Product 1", "price": 10.0, "quantity": 1}],
+        "shipping_address": {
+            "street": "123 Main St", "city": "Cityville", "state": "Stateland",
+            "postal_code": "12345", "country": "Country",
+        },
+    })
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert client.get("/orders").json() == []
@@ -0,0 +1,90 @@
+import os
+import re
+import signal
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+
+import run_services
+from run_services import Worker, backoff_delay, services, worker_count
+
+BASE_PORT = 18400
+
+
+def read_until(process, pattern, timeout=60.0):
+    """Read the supervisor's output until a line matches ``pattern``."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        line = process.stdout.readline()
+        if not line:
+            break
+        match = re.search(pattern, line)
+        if match:
+            return match
+    raise AssertionError(f"no output matching {pattern!r}")
+
+
+def test_backoff_grows_exponentially_up_to_a_limit():
+    assert [backoff_delay(n) for n in range(5)] == [0.0, 0.5, 1.0, 2.0, 4.0]
+    assert backoff_delay(20) == 30.0
+
+
+def test_only_the_main_application_runs_several_workers(monkeypatch):
+    monkeypatch.setattr(run_services, "SHARED_SOCKETS", True)
+    assert {service["name"]: worker_count(service, 4) for service in services} == {
+        "Payment Service": 1,
+        "Inventory Service": 1,
+        "Shipping Service": 1,
+        "Main Application": 4,
+    }
+
+
+def test_without_shared_sockets_each_service_binds_its_own_port(monkeypatch):
+    monkeypatch.setattr(run_services, "SHARED_SOCKETS", False)
+    main = services[-1]
+    assert worker_count(main, 4) == 1
+
+    command = Worker(main, 1, None, {}, "127.0.0.1", "info").command()
+    assert command[command.index("--port") + 1] == str(main["port"])
+    assert "--fd" not in command
+
+
+@pytest.mark.skipif(os.name == "nt", reason="shared sockets and POSIX signals")
+def test_supervisor_restarts_crashed_workers(tmp_path):
+    env = {
+        **os.environ,
+        "PYTHONUNBUFFERED": "1",
+        "DATABASE_URL": f"sqlite:///{tmp_path / 'supervised.db'}",
+        "DB_CREATE_ALL": "true",
+        "SAGA_RECOVERY_ENABLED": "false",
+    }
+    process = subprocess.Popen(
+        [sys.executable, "run_services.py", "--supervise", "--workers", "2",
+         "--host", "127.0.0.1", "--base-port", str(BASE_PORT), "--log-level", "warning"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        env=env,
+    )
+    try:
+        pid = int(read_until(process, r"Main Application #1 started with PID (\d+)").group(1))
+        read_until(process, "All services are running")
+        for port in range(BASE_PORT, BASE_PORT + 4):
+            assert httpx.get(f"http://127.0.0.1:{port}/health").json() == {"status": "healthy"}
+
+        os.kill(pid, signal.SIGKILL)
+        read_until(process, r"Restarting Main Application #1")
+        read_until(process, r"Main Application #1 started with PID")
+        # The second worker keeps serving the shared socket meanwhile
+        assert httpx.get(f"http://127.0.0.1:{BASE_PORT}/health").status_code == 200
+
+        process.send_signal(signal.SIGTERM)
+        read_until(process, "All services stopped")
+        assert process.wait(timeout=30) == 0
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
@@ -0,0 +1,53 @@
+import httpx
+import pytest
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.config import settings
+from app.main import app
+from app.metrics import registry
+from app.services.payment import PaymentService
+from app.startup import start_up
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("create_all", [False, True])
+async def test_startup_creates_schema_only_when_configured(tmp_path, monkeypatch, create_all):
+    monkeypatch.setattr(settings, "DB_CREATE_ALL", create_all)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'startup.db'}")
+
+    timer = await start_up(app, engine, [])
+    total = timer.finish()
+
+    async with engine.connect() as conn:
+        tables = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_table_names())
+    await engine.dispose()
+    assert ("orders" in tables) == create_all
+    expected = ["schema"] * create_all + ["mappers", "openapi", "connections"]
+    assert list(timer.phases) == expected
+    assert total >= sum(timer.phases.values())
+    assert 'startup_duration_seconds{phase="openapi"}' in registry.render()
+
+
+@pytest.mark.asyncio
+async def test_unreachable_service_does_not_fail_startup(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DB_CREATE_ALL", False)
+    requests = []
+
+    async def handler(request):
+        requests.append(request.url.path)
+        raise httpx.ConnectError("Connection refused", request=request)
+
+    payment = PaymentService()
+    payment._client = httpx.AsyncClient(
+        transport=httpx.MockTransport(handler), base_url="http://payment"
+    )
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'startup.db'}")
+
+    await start_up(app, engine, [payment])
+
+    await engine.dispose()
+    await payment.close()
+    assert requests == ["/health"]
+    assert payment.breaker.failures == 0
+    assert not payment.latency.samples
@@ -0,0 +1,128 @@
+import json
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+
+from app.services.inventory import inventory_service
+from app.services.payment import payment_service
+from app.services.shipping import shipping_service
+from app.tracing import BatchSpanExporter, NDJSONFileSink, SpanSink, Tracer, tracer
+
+
+class MemorySink(SpanSink):
+    def __init__(self):
+        self.records = []
+
+    def write(self, records):
+        self.records.extend(records)
+
+
+def memory_exporter():
+    return BatchSpanExporter(MemorySink(), batch_size=1000, flush_interval=60, max_queue_size=1000)
+
+
+@pytest.fixture
+def traced(monkeypatch):
+    """Trace every request of the app into an in-memory exporter."""
+    exporter = memory_exporter()
+    monkeypatch.setattr(tracer, "exporter", exporter)
+    monkeypatch.setattr(tracer, "enabled", True)
+    monkeypatch.setattr(tracer, "sample_rate", 1.0)
+    return exporter
+
+
+def test_checkout_spans_form_one_trace(traced, client, monkeypatch):
+    order_request = {
+        "customer_id": "cust123",
+        "items": [{"product_id": "product1", "name": "Product 1", "price": 10.0, "quantity": 2}],
+        "shipping_address": {
+            "street": "123 Main St",
+            "city": "Cityville",
+            "state": "Stateland",
+            "postal_code": "12345",
+            "country": "Country",
+        },
+    }
+    traceparents = []
+
+    async def handler(request):
+        traceparents.append(request.headers.get("traceparent"))
+        return httpx.Response(200, json={"payment_id": "pay_123", "transaction_id": "trx_123"})
+
+    monkeypatch.setattr(payment_service, "_client", httpx.AsyncClient(
+        transport=httpx.MockTransport(handler), base_url="http://payment"
+    ))
+    with patch.object(
+        inventory_service, "reserve_inventory", new_callable=AsyncMock
+    ) as mock_inventory, patch.object(
+        shipping_service, "create_shipment", new_callable=AsyncMock
+    ) as mock_shipping:
+        mock_inventory.return_value = {"reservation_id": "res_123"}
+        mock_shipping.return_value = {"shipment_id": "ship_123"}
+        assert client.post("/orders", json=order_request).status_code == 200
+
+    spans = list(traced.queue)
+    by_name = {}
+    for span in spans:
+        by_name.setdefault(span.name, []).append(span)
+
+    assert {span.trace_id for span in spans} == {by_name["http.request"][0].trace_id}
+    request_span = by_name["http.request"][0]
+    assert request_span.parent_id is None
+    assert request_span.attributes["status_code"] == 200
+
+    saga_span = by_name["saga.execute"][0]
+    assert saga_span.parent_id == request_span.span_id
+    steps = {span.attributes["step"]: span for span in by_name["step.execute"]}
+    assert set(steps) == {"payment", "inventory", "shipping"}
+    assert all(span.parent_id == saga_span.span_id for span in steps.values())
+    assert by_name["db.flush"]
+
+    (client_span,) = by_name["http.client"]
+    assert client_span.parent_id == steps["payment"].span_id
+    assert client_span.attributes["status_code"] == 200
+    assert traceparents == [f"00-{client_span.trace_id}-{client_span.span_id}-01"]
+
+
+@pytest.mark.asyncio
+async def test_sampling_is_decided_at_the_root():
+    exporter = memory_exporter()
+    unsampled = Tracer(exporter, sample_rate=0.0, enabled=True)
+
+    with unsampled.span("root") as root:
+        with unsampled.span("child") as child:
+            assert child.trace_id == root.trace_id
+            assert child.traceparent.endswith("-00")
+    assert not exporter.queue
+
+    # A sampled caller's decision is followed regardless of the local rate
+    remote = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+    with unsampled.span("request", traceparent=remote) as span:
+        with pytest.raises(ValueError):
+            with unsampled.span("failing"):
+                raise ValueError("boom")
+    assert span.trace_id == "0af7651916cd43dd8448eb211c80319c"
+    assert span.parent_id == "b7ad6b7169203331"
+    failing, request = exporter.queue
+    assert (failing.name, failing.status, failing.error) == ("failing", "error", "ValueError: boom")
+    assert request.status == "ok"
+
+
+@pytest.mark.asyncio
+async def test_spans_are_written_as_ndjson(tmp_path):
+    path = tmp_path / "traces.ndjson"
+    exporter = BatchSpanExporter(
+        NDJSONFileSink(str(path)), batch_size=2, flush_interval=60, max_queue_size=3
+    )
+    sampled = Tracer(exporter, sample_rate=1.0, enabled=True)
+
+    for i in range(4):
+        with sampled.span("work", index=i):
+            pass
+    await exporter.flush()
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [record["attributes"]["index"] for record in records] == [0, 1, 2]
+    assert exporter.exported == 3
+    assert exporter.dropped == 1